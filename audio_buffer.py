@@ -0,0 +1,114 @@
+"""Per-call buffers for inbound call audio.
+
+``FrameAssembler`` turns arbitrarily sized media chunks into fixed-size frames
+and ``UtteranceBuffer`` collects voiced frames for STT. Both hand out
+memoryview slices of storage that is reused for the whole call, so neither
+the frame split nor a growing utterance copies the pending audio on every
+packet. ``UtteranceBuffer`` starts small and doubles up to its cap: most
+utterances are a few seconds, and a full-length buffer per idle call adds up
+at thousands of calls.
+"""
+
+
+class FrameAssembler:
+    """Split a stream of chunks into fixed-size frames.
+
+    Frames are memoryviews into the assembler's own storage and stay valid
+    only until the next ``feed``; consume (or copy) them before then.
+    """
+
+    __slots__ = ("frame_size", "_buf", "_mv", "_start", "_end")
+
+    def __init__(self, frame_size, max_chunk=None):
+        self.frame_size = frame_size
+        self._buf = bytearray(frame_size + (max_chunk or frame_size * 2))
+        self._mv = memoryview(self._buf)
+        self._start = self._end = 0
+
+    @property
+    def pending(self):
+        return self._end - self._start
+
+    def _make_room(self, n):
+        pending = self._end - self._start
+        if self._start and len(self._buf) - self._end < n:
+            self._mv[:pending] = self._mv[self._start:self._end]
+            self._start, self._end = 0, pending
+        if len(self._buf) - self._end < n:
+            # Oversized chunk or a backlog of unconsumed frames: grow once.
+            buf = bytearray(max(len(self._buf) * 2, pending + n))
+            buf[:pending] = self._mv[self._start:self._end]
+            self._buf, self._mv = buf, memoryview(buf)
+            self._start, self._end = 0, pending
+
+    def feed(self, chunk):
+        """Append ``chunk`` and return an iterator over the complete frames.
+
+        Frames left unconsumed when the caller stops iterating early are
+        yielded first on the next call.
+        """
+        chunk = memoryview(chunk).cast("B")
+        n = len(chunk)
+        if n:
+            self._make_room(n)
+            self._mv[self._end:self._end + n] = chunk
+            self._end += n
+        return self._frames()
+
+    def _frames(self):
+        fs = self.frame_size
+        while self._end - self._start >= fs:
+            frame = self._mv[self._start:self._start + fs]
+            self._start += fs
+            yield frame
+
+    def reset(self):
+        self._start = self._end = 0
+
+
+class UtteranceBuffer:
+    """Capped buffer for one utterance of PCM.
+
+    ``append`` refuses audio past ``max_bytes`` so a caller who never pauses
+    cannot grow memory without bound; check ``full`` to force a flush.
+    Storage starts at ``initial_bytes`` and doubles as needed.
+    """
+
+    __slots__ = ("max_bytes", "_buf", "_mv", "_len")
+
+    def __init__(self, max_bytes, initial_bytes=64000):
+        self.max_bytes = max_bytes
+        self._buf = bytearray(min(max_bytes, initial_bytes))
+        self._mv = memoryview(self._buf)
+        self._len = 0
+
+    @property
+    def capacity(self):
+        return len(self._buf)
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def full(self):
+        return self._len >= self.max_bytes
+
+    def append(self, frame):
+        """Copy ``frame`` in; returns False if it was truncated by the cap."""
+        frame = memoryview(frame).cast("B")
+        n = min(len(frame), self.max_bytes - self._len)
+        if self._len + n > len(self._buf):
+            # Views handed out earlier keep the old storage alive and intact.
+            buf = bytearray(min(self.max_bytes, max(2 * len(self._buf), self._len + n)))
+            buf[:self._len] = self._mv[:self._len]
+            self._buf, self._mv = buf, memoryview(buf)
+        self._mv[self._len:self._len + n] = frame[:n]
+        self._len += n
+        return n == len(frame)
+
+    def view(self):
+        """Contiguous view of the utterance, valid until it is refilled after ``clear``."""
+        return self._mv[:self._len]
+
+    def clear(self):
+        self._len = 0
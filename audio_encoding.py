@@ -0,0 +1,103 @@
+"""WAV and multipart encoding for STT uploads, without tempfiles or copies.
+
+The 44-byte WAV header is built once per sample rate and only its two size
+fields are patched per utterance. ``MultipartBody`` streams the form fields,
+the header and a memoryview of the PCM straight to the HTTP client, so the
+utterance is never concatenated into a second buffer. ``wav_to_pcm`` goes
+the other way for TTS responses, which arrive as WAV files.
+"""
+import io
+import os
+import struct
+import wave
+from functools import lru_cache
+
+SUPPORTED_RATES = (8000, 16000)
+
+
+@lru_cache(maxsize=None)
+def _header_template(sample_rate, channels=1, sample_width=2):
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 0, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate,
+        sample_rate * channels * sample_width, channels * sample_width, sample_width * 8,
+        b"data", 0,
+    )
+
+
+def wav_header(data_len, sample_rate):
+    """Header for ``data_len`` bytes of 16-bit mono PCM at ``sample_rate``."""
+    if sample_rate not in SUPPORTED_RATES:
+        raise ValueError(f"unsupported sample rate {sample_rate}, expected one of {SUPPORTED_RATES}")
+    header = bytearray(_header_template(sample_rate))
+    struct.pack_into("<I", header, 4, 36 + data_len)
+    struct.pack_into("<I", header, 40, data_len)
+    return bytes(header)
+
+
+def wav_parts(pcm, sample_rate):
+    """(header, pcm view) pair whose concatenation is a complete WAV file."""
+    pcm = memoryview(pcm).cast("B")
+    return wav_header(len(pcm), sample_rate), pcm
+
+
+def pcm_to_wav(pcm, sample_rate):
+    """Complete WAV file as bytes, for callers that need one buffer."""
+    header, data = wav_parts(pcm, sample_rate)
+    return header + data
+
+
+def wav_to_pcm(data, sample_rate=None):
+    """The 16-bit mono PCM frames of WAV file ``data``, without its header.
+
+    Raises ValueError if the audio is in another format or, when
+    ``sample_rate`` is given, at another rate.
+    """
+    try:
+        with wave.open(io.BytesIO(data)) as w:
+            if w.getsampwidth() != 2 or w.getnchannels() != 1:
+                raise ValueError(f"expected 16-bit mono WAV, got {w.getsampwidth() * 8}-bit "
+                                 f"{w.getnchannels()}-channel")
+            if sample_rate is not None and w.getframerate() != sample_rate:
+                raise ValueError(f"expected {sample_rate} Hz WAV, got {w.getframerate()} Hz")
+            return w.readframes(w.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"not a WAV file: {e}") from e
+
+
+class MultipartBody:
+    """Re-iterable multipart/form-data body built from byte-like parts.
+
+    Pass it as ``content=`` together with ``headers``; it can be replayed,
+    so retries work, and it carries an exact Content-Length.
+    """
+
+    def __init__(self, fields, file_field, filename, file_type, file_parts, boundary=None):
+        self.boundary = boundary or os.urandom(16).hex()
+        b = self.boundary.encode()
+        head = bytearray()
+        for name, value in fields.items():
+            head += (b"--" + b + b"\r\nContent-Disposition: form-data; name=\"" + name.encode()
+                     + b"\"\r\n\r\n" + str(value).encode() + b"\r\n")
+        head += (b"--" + b + b"\r\nContent-Disposition: form-data; name=\"" + file_field.encode()
+                 + b"\"; filename=\"" + filename.encode() + b"\"\r\nContent-Type: "
+                 + file_type.encode() + b"\r\n\r\n")
+        self._chunks = [bytes(head), *file_parts, b"\r\n--" + b + b"--\r\n"]
+        self.content_length = sum(len(c) for c in self._chunks)
+
+    @property
+    def headers(self):
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(self.content_length),
+        }
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+def wav_upload(pcm, sample_rate, fields, file_field="file", filename="audio.wav"):
+    """Multipart body carrying ``pcm`` as a WAV file plus ``fields``."""
+    return MultipartBody(fields, file_field, filename, "audio/wav", wav_parts(pcm, sample_rate))
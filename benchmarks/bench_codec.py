@@ -0,0 +1,62 @@
+"""G.711 and resampler throughput against the ``g711`` package.
+
+Run from the repo root: ``python -m benchmarks.bench_codec``
+(``pip install g711`` to include the comparison rows).
+"""
+import time
+import numpy as np
+import codec
+
+try:
+    import g711
+except ImportError:
+    g711 = None
+
+PACKET = 160  # 20 ms of 8 kHz μ-law, Exotel's packet size
+
+
+def rate(fn, arg, min_time=1.0):
+    done, start = 0, time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        for _ in range(1000):
+            fn(arg)
+        done += 1000
+    return done / (time.perf_counter() - start)
+
+
+def main():
+    rng = np.random.default_rng(3)
+    ulaw = rng.integers(0, 256, PACKET, dtype=np.uint8).tobytes()
+    pcm8 = codec.ulaw_decode(ulaw)
+    pcm16 = codec.Resampler(8000, 16000).process(pcm8)
+    floats = np.frombuffer(pcm8, np.int16).astype(np.float32) / 32768
+
+    rows = [
+        ("codec.ulaw_decode", rate(codec.ulaw_decode, ulaw)),
+        ("codec.ulaw_encode", rate(codec.ulaw_encode, pcm8)),
+        ("codec.alaw_decode", rate(codec.alaw_decode, ulaw)),
+        ("codec.alaw_encode", rate(codec.alaw_encode, pcm8)),
+    ]
+    if g711 is not None:
+        rows += [
+            ("g711.decode_ulaw (float32)", rate(g711.decode_ulaw, ulaw)),
+            ("g711.decode_ulaw + to int16",
+             rate(lambda p: (g711.decode_ulaw(p) * 32767).astype("<i2").tobytes(), ulaw)),
+            ("g711.encode_ulaw", rate(g711.encode_ulaw, floats)),
+        ]
+    rows += [
+        ("Resampler 8k→16k", rate(codec.Resampler(8000, 16000).process, pcm8)),
+        ("Resampler 16k→8k", rate(codec.Resampler(16000, 8000).process, pcm16)),
+        ("CallCodec.inbound (μ-law→16k)", rate(codec.CallCodec().inbound, ulaw)),
+        ("CallCodec.outbound (16k→μ-law)", rate(codec.CallCodec().outbound, pcm16)),
+    ]
+
+    print(f"{'operation':<34}{'packets/sec':>14}{'calls @50pps':>14}")
+    for name, pps in rows:
+        print(f"{name:<34}{pps:>14,.0f}{pps / 50:>14,.0f}")
+    if g711 is None:
+        print("(g711 not installed; comparison rows skipped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Memory per active call and dispatch cost per turn: dict sessions vs the compiled dialogue.
+
+Run from the repo root: ``python -m benchmarks.bench_dialogue --sessions 1000 10000``
+
+For each count, that many calls are held at once in each design and
+``tracemalloc`` reports the bytes allocated per call. Two independent
+changes are measured on separate rows:
+
+* ``session`` (dialogue table): the per-call state container with a live
+  call's values. The old design used a 20-key dict, built here as
+  ``ws_handler`` used to build it. The new design is ``server.Session``
+  (``__slots__``).
+* ``buffer`` (utterance buffer): the old buffer preallocated
+  ``MAX_UTTERANCE_SEC`` of PCM. The new one starts at 2 s and grows.
+* ``objects``: the rest of what the handler owns per call (codec,
+  prefetcher, VAD, endpointer, frame assembler). It is the same in both
+  designs and is measured once.
+
+Dispatch times one classified turn through the old ``if intent == ...``
+chain (reproduced below) and through ``Dialogue.step``.
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+SEED_INTENTS = ["YES", "FAQ", "NEXT", "REPEAT", "PREVIOUS", "NEXT", "DONE", "NEUTRAL",
+                "PARTIAL", "UNKNOWN", "LLM", "GREETING"]
+
+
+def legacy_session(server, owned=True):
+    """The per-call dict ``ws_handler`` built before the dialogue table."""
+    return {
+        "phase": "PITCH",
+        "step": 0,
+        "failures": 0,
+        "silence_prompts": 0,
+        "handoff_asked": False,
+        "bot_speaking": False,
+        "closing": False,
+        "reply": None,
+        "stream_sid": None,
+        "codec": server.CallCodec(server.CODEC_LAWS["ulaw"]) if owned else None,
+        "started": False,
+        "last_fail_ts": 0,
+        "early_intent": None,
+        "call_id": None,
+        "turns": 0,
+        "trace": None,
+        "rec": None,
+        "started_at": None,
+        "prefetch": server.Prefetcher(server.tts_cache, server.tts_key, server.tts_timed,
+                                      server.prefetch_budget, server.PREFETCH_PER_CALL) if owned else None,
+    }
+
+
+def legacy_step(session, intent, meta, reply, prompts, faqs, steps):
+    """The old per-turn branch chain, returning ``(texts, end)`` instead of speaking."""
+    if intent in ["FAQ", "NEXT", "PREVIOUS", "REPEAT", "GREETING", "NEUTRAL"]:
+        session["failures"] = 0
+        session["handoff_asked"] = False
+    if intent == "PARTIAL":
+        return (), False
+    if intent == "FAQ":
+        return (faqs[meta], prompts["MENU"]), False
+    if session["phase"] == "PITCH":
+        if intent == "YES":
+            session["phase"] = "STEPS"
+            return (steps[0],), False
+        if intent == "NO":
+            return (prompts["GOODBYE"],), True
+    if intent == "NEXT":
+        session["step"] += 1
+        if session["step"] >= len(steps):
+            session["step"] = len(steps) - 1  # the call would have ended here
+            return (prompts["COMPLETE"],), True
+        return (steps[session["step"]],), False
+    if intent == "PREVIOUS":
+        session["step"] = max(0, session["step"] - 1)
+        return (steps[session["step"]],), False
+    if intent == "REPEAT":
+        return (steps[session["step"]],), False
+    if intent == "HUMAN":
+        return (prompts["HANDOFF"],), True
+    if intent == "LLM":
+        return (reply,), False
+    now = time.time()
+    if now - session["last_fail_ts"] > 8:
+        session["failures"] += 1
+        session["last_fail_ts"] = now
+        if session["failures"] >= 3 and not session["handoff_asked"]:
+            session["handoff_asked"] = True
+            return (prompts["HANDOFF_OFFER"],), False
+        return (prompts["FALLBACK"],), False
+    return (), False
+
+
+def start(session, i, dict_based):
+    """Fill in what a connected call has set by its third turn."""
+    fields = {"stream_sid": f"sid-{i:06d}", "call_id": f"sid-{i:06d}", "started": True,
+              "started_at": time.time(), "turns": 3}
+    for k, v in fields.items():
+        if dict_based:
+            session[k] = v
+        else:
+            setattr(session, k, v)
+
+
+def per_call_bytes(build, n):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [build(i) for i in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return (after - before) / n
+
+
+def utterance_buffer(server, preallocated):
+    from audio_buffer import UtteranceBuffer
+
+    max_bytes = server.MAX_UTTERANCE_SEC * server.SAMPLE_RATE * 2
+    return UtteranceBuffer(max_bytes, max_bytes) if preallocated else UtteranceBuffer(max_bytes)
+
+
+def call_objects(server):
+    from audio_buffer import FrameAssembler
+    from endpoint import Endpointer
+    from vad import VAD
+
+    vad = VAD(server.MIN_CHUNK_SIZE, server.SPEECH_THRESHOLD)
+    prefetch = server.Prefetcher(server.tts_cache, server.tts_key, server.tts_timed,
+                                 server.prefetch_budget, server.PREFETCH_PER_CALL)
+    return (server.CallCodec(server.CODEC_LAWS["ulaw"]), prefetch, vad, Endpointer(vad, server.FRAME_SEC),
+            FrameAssembler(server.MIN_CHUNK_SIZE))
+
+
+def report_memory(args, server):
+    def old_state(i):
+        s = legacy_session(server, owned=False)
+        start(s, i, True)
+        return s
+
+    def new_state(i):
+        s = server.Session()
+        s.codec = s.prefetch = None  # counted under objects
+        start(s, i, False)
+        return s
+
+    print(f"{'sessions':>9}{'part':>9}{'old B/call':>13}{'new B/call':>14}{'saved':>8}")
+    for n in args.sessions:
+        objects = per_call_bytes(lambda i: call_objects(server), n)
+        rows = [("session", per_call_bytes(old_state, n), per_call_bytes(new_state, n)),
+                ("buffer", per_call_bytes(lambda i: utterance_buffer(server, True), n),
+                 per_call_bytes(lambda i: utterance_buffer(server, False), n)),
+                ("objects", objects, objects)]
+        rows.append(("total", sum(r[1] for r in rows), sum(r[2] for r in rows)))
+        for part, old, new in rows:
+            print(f"{n:>9}{part:>9}{old:>13,.0f}{new:>14,.0f}{1 - new / old:>8.0%}")
+        (_, session_old, session_new), (_, buffer_old, buffer_new), _, (_, total_old, total_new) = rows
+        print(f"{'':>9}{'':>9}{total_old * n / 2**20:>11,.1f}MB{total_new * n / 2**20:>12,.1f}MB")
+        print(f"{'':>9} of the {total_old - total_new:,.0f} B/call saved: dialogue table "
+              f"{session_old - session_new:,.0f} B, utterance buffer {buffer_old - buffer_new:,.0f} B")
+
+
+def report_dispatch(args, server):
+    dialogue, faqs = server.dialogue, server.FAQS
+    prompts = dialogue.prompts
+    steps = [prompts[f"STEP_{i}"] for i in (1, 2, 3)]
+    rng = random.Random(0)
+    turns = [(intent, rng.choice(list(faqs)) if intent == "FAQ" else None)
+             for intent in rng.choices(SEED_INTENTS, k=args.turns)]
+
+    legacy = legacy_session(server)
+    t0 = time.perf_counter()
+    for intent, meta in turns:
+        legacy_step(legacy, intent, meta, "A reply.", prompts, faqs, steps)
+    old = (time.perf_counter() - t0) / len(turns)
+
+    state = dialogue.new_state()
+    step = dialogue.step
+    t0 = time.perf_counter()
+    for intent, meta in turns:
+        if step(state, intent, meta, "A reply.")[1]:
+            state.phase = dialogue.start  # the call would have ended here
+    new = (time.perf_counter() - t0) / len(turns)
+    print(f"\ndispatch per turn: if-chain {old * 1e9:.0f} ns | table {new * 1e9:.0f} ns "
+          f"({dialogue.width} intents x {len(dialogue.phases)} phases)")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--sessions", type=int, nargs="+", default=[1000, 10000])
+    p.add_argument("--turns", type=int, default=200000)
+    args = p.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(TTS_CACHE_DIR=tmp, RECORDING_DIR="", MEDIA_ENCODING="ulaw")
+        import server  # reads the environment at import
+
+        report_memory(args, server)
+        report_dispatch(args, server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Per-frame cost of outbound media framing and inbound message parsing.
+
+Run from the repo root: ``python -m benchmarks.bench_framing``
+Outbound compares building each media message at send time (codec, base64,
+``json.dumps``) against iterating messages pre-encoded by ``FrameCache``.
+Inbound compares ``json.loads`` with ``framing.loads`` (orjson if installed)
+on a typical Exotel media frame.
+"""
+import base64
+import json
+import time
+
+import numpy as np
+
+from codec import CallCodec
+from framing import EncodedAudio, loads
+
+FRAME_BYTES = 3200  # 100 ms of 16 kHz PCM, as server.py plays it
+BYTES_PER_SEC = 32000
+
+
+def _per_frame(fn, frames, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - t0) / (rounds * frames) * 1e6
+
+
+def main(rounds=200, encoding="ulaw"):
+    pcm = (np.sin(np.arange(16000 * 3) / 8) * 8000).astype("<i2").tobytes()
+    frames = [pcm[i:i + FRAME_BYTES] for i in range(0, len(pcm), FRAME_BYTES)]
+
+    def per_send():
+        codec = CallCodec("ulaw")
+        for frame in frames:
+            json.dumps({"event": "media", "media": {"payload": base64.b64encode(codec.outbound(frame)).decode()}})
+
+    audio = EncodedAudio.encode(pcm, encoding, FRAME_BYTES, BYTES_PER_SEC)
+
+    def pre_encoded():
+        for message, sec in audio.frames():
+            pass
+
+    built = _per_frame(per_send, len(frames), rounds)
+    cached = _per_frame(pre_encoded, len(frames), rounds)
+    print(f"outbound {encoding}, per frame: built at send {built:.1f} µs | pre-encoded {cached:.2f} µs")
+
+    inbound = json.dumps({"event": "media", "stream_sid": "S1", "media": {
+        "payload": base64.b64encode(bytes(160)).decode(), "chunk": "1", "timestamp": "20"}})
+    n = 100_000
+    std = _per_frame(lambda: [json.loads(inbound) for _ in range(n)], n, 1)
+    fast = _per_frame(lambda: [loads(inbound) for _ in range(n)], n, 1)
+    print(f"inbound media frame: json.loads {std:.2f} µs | framing.loads {fast:.2f} µs "
+          f"({'orjson' if loads is not json.loads else 'stdlib'})")
+
+
+if __name__ == "__main__":
+    main()
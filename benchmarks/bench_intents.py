@@ -0,0 +1,101 @@
+"""Throughput and accuracy of the compiled intent engine vs the original
+``server.classify`` substring scans.
+
+Run from the repo root: ``python -m benchmarks.bench_intents [corpus.jsonl]``
+The corpus is JSON lines of ``{"text", "intent", "faq"}``. The bundled
+``transcripts.jsonl`` is a regression corpus: hand-written utterances,
+many written alongside the rules in ``intents.json``, so its accuracy shows
+the rules still do what they were written for, not how they fare on unseen
+calls. Pass held-out real transcripts to estimate that.
+"""
+import json
+import os
+import sys
+import time
+from intents import IntentEngine
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcripts.jsonl")
+
+NEUTRAL_WORDS = ["okay", "ok", "right", "nice", "thanks", "thank you", "fine"]
+PARTIAL_QUESTIONS = ["what is", "what", "rate", "interest", "emi", "amount"]
+LEGACY_FAQS = [
+    (["emi", "monthly"], "emi"),
+    (["interest", "roi"], "interest"),
+    (["limit", "amount"], "limit"),
+    (["processing", "fee"], "processing"),
+]
+
+
+def legacy_classify(text):
+    t = text.lower().strip()
+    if not t:
+        return "EMPTY", None
+    if any(x in t for x in NEUTRAL_WORDS):
+        return "NEUTRAL", None
+    if any(t.startswith(p) for p in PARTIAL_QUESTIONS):
+        return "PARTIAL", None
+    if any(x in t for x in ["hello", "hi", "hey"]):
+        return "GREETING", None
+    if any(x in t for x in ["yes", "interested", "sure"]):
+        return "YES", None
+    if any(x in t for x in ["no", "not interested"]):
+        return "NO", None
+    if any(x in t for x in ["next"]):
+        return "NEXT", None
+    if any(x in t for x in ["previous", "back"]):
+        return "PREVIOUS", None
+    if any(x in t for x in ["repeat"]):
+        return "REPEAT", None
+    if any(x in t for x in ["done", "complete"]):
+        return "DONE", None
+    if any(x in t for x in ["agent", "human", "representative"]):
+        return "HUMAN", None
+    for keys, key in LEGACY_FAQS:
+        if any(k in t for k in keys):
+            return "FAQ", key
+    return "UNKNOWN", None
+
+
+def evaluate(fn, corpus):
+    correct, misses = 0, []
+    for row in corpus:
+        got = fn(row["text"])
+        if got == (row["intent"], row["faq"]):
+            correct += 1
+        else:
+            misses.append((row["text"], got[0], row["intent"]))
+    return correct / len(corpus), misses
+
+
+def throughput(fn, texts, min_time=1.0):
+    done, start = 0, time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        for t in texts:
+            fn(t)
+        done += len(texts)
+    return done / (time.perf_counter() - start)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else CORPUS
+    with open(path, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    texts = [row["text"] for row in corpus]
+    engine = IntentEngine.from_file()
+
+    kind = "regression corpus, not held out" if path == CORPUS else "held out"
+    print(f"corpus: {len(corpus)} utterances from {path} ({kind})\n")
+    print(f"{'classifier':<20}{'accuracy':>10}{'texts/sec':>14}")
+    results = {}
+    for name, fn in [("legacy classify", legacy_classify), ("IntentEngine", engine.classify)]:
+        acc, misses = evaluate(fn, corpus)
+        results[name] = misses
+        print(f"{name:<20}{acc:>10.1%}{throughput(fn, texts):>14,.0f}")
+    for name, misses in results.items():
+        print(f"\n{name} misclassified {len(misses)}:")
+        for text, got, want in misses:
+            print(f"  {text!r:<44} got {got:<9} want {want}")
+
+
+if __name__ == "__main__":
+    main()
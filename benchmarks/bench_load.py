@@ -0,0 +1,225 @@
+"""How many simultaneous calls one box handles: a closed-loop load test.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_load --target server --concurrency 5 10 20 40
+    python -m benchmarks.bench_load --target config --via dial --concurrency 5 10
+
+The target (``python server.py`` or ``uvicorn config:app``) runs as a
+subprocess with Sarvam and Exotel pointed at ``mock_vendors``, served from
+this process with the latencies and error rate given on the command line.
+At each concurrency level that many ``sim_caller`` calls start over
+``--ramp-sec`` and each plays the target's script. With ``--via dial`` the
+calls are placed through the target's ``POST /dial`` instead, and the mock
+Exotel answers them.
+
+Each level reports p50/p95/p99 turn latency and time to first audio, the
+target's CPU time per call-second (from /proc, Linux only) and how busy it
+kept one core. The highest level that completed every call with p95 turn
+latency under ``--slo-ms`` is the max sustainable concurrency. The callers
+share this process and the mocks, so on a small host the harness competes
+with the target for CPU. Read absolute numbers on a host with spare cores.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import uvicorn
+
+from benchmarks.mock_vendors import MockVendors, VendorProfile, recording
+from benchmarks.sim_caller import ENCODINGS, Caller, frames_of
+
+# What each caller says, in order. server.py ends the call itself after the
+# third "next"; config.py answers anything and is hung up on.
+SCRIPTS = {
+    "server": ["yes", "interest rate", "next", "next", "next"],
+    "config": ["yes", "interest rate", "bye"],
+}
+CONFIG_TURN_FRAMES = 80  # config.py transcribes every 80 media frames
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _cpu_sec(pid):
+    """User + system CPU seconds of ``pid`` and its children, or None off Linux."""
+    tick = os.sysconf("SC_CLK_TCK")
+    total, found = 0, False
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(entry) == pid or int(fields[1]) == pid:  # fields[1] is the ppid
+            total += int(fields[11]) + int(fields[12])
+            found = True
+    return total / tick if found else None
+
+
+def _pct(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+
+def target_env(port, mock_url, encoding, tmp):
+    """Environment for a target on ``port`` talking to the mocks at ``mock_url``."""
+    return {**os.environ, "PORT": str(port), "SARVAM_BASE_URL": mock_url, "SARVAM_API_KEY": "mock",
+            "EXOTEL_BASE_URL": mock_url, "EXOTEL_SID": "mock", "EXOTEL_API_KEY": "mock",
+            "EXOTEL_API_TOKEN": "mock", "EXOTEL_FROM_NUMBER": "+910000000000",
+            "PUBLIC_HOSTNAME": f"http://127.0.0.1:{port}", "MEDIA_ENCODING": encoding,
+            "TTS_CACHE_DIR": os.path.join(tmp, "tts"), "CAMPAIGN_DIR": os.path.join(tmp, "campaigns"),
+            "RECORDING_DIR": os.path.join(tmp, "recordings"),
+            "GEMINI_API_KEY": ""}
+
+
+def start_target(target, port, mock_url, encoding, tmp):
+    env = target_env(port, mock_url, encoding, tmp)
+    if target == "server":
+        cmd = [sys.executable, "server.py"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "config:app", "--port", str(port), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(300):
+        if proc.poll() is not None:
+            raise RuntimeError(f"{target} exited with {proc.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/stats", timeout=0.5).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"{target} did not come up on port {port}")
+
+
+async def run_level(args, n, port, mocks, lines, level_id):
+    results = []
+    turn_frames = CONFIG_TURN_FRAMES if args.target == "config" else None
+
+    def caller(url, sid, custom_parameters=None):
+        return Caller(url, lines, args.encoding, stream_sid=sid, custom_parameters=custom_parameters,
+                      think_sec=args.think_sec, reply_timeout=args.reply_timeout, turn_frames=turn_frames)
+
+    async def on_call(stream_url, custom_parameters):
+        results.append(await caller(stream_url, f"dial-{len(results)}", custom_parameters).run())
+
+    async def direct(i):
+        await asyncio.sleep(args.ramp_sec * i / n)
+        results.append(await caller(f"ws://127.0.0.1:{port}/ws", f"L{level_id}-{i}").run())
+
+    async def dial(client, i):
+        await asyncio.sleep(args.ramp_sec * i / n)
+        r = await client.post(f"http://127.0.0.1:{port}/dial", json={"to": f"+9198{i:08d}"})
+        return r.status_code == 200
+
+    mocks.on_call = on_call
+    if args.via == "dial":
+        async with httpx.AsyncClient(timeout=30) as client:
+            await asyncio.gather(*(dial(client, i) for i in range(n)))
+        while mocks.calls:  # a failed dial never gets here, so it shows up as not done
+            await asyncio.sleep(0.1)
+    else:
+        await asyncio.gather(*(direct(i) for i in range(n)))
+    return results
+
+
+async def main_async(args):
+    script = SCRIPTS[args.target]
+    utterances = list(dict.fromkeys(script))
+    rate = ENCODINGS[args.encoding][0]
+    recordings = {text: frames_of(recording(i, len(text.split()), rate), args.encoding)
+                  for i, text in enumerate(utterances)}
+    lines = [recordings[text] for text in script]
+
+    mocks = MockVendors(
+        utterances,
+        stt=VendorProfile(args.stt_ms, error_rate=args.error_rate),
+        tts=VendorProfile(args.tts_ms, error_rate=args.error_rate),
+        exotel=VendorProfile(args.exotel_ms, error_rate=args.error_rate),
+        ms_per_char=args.ms_per_char,
+    )
+    mock_port, port = _free_port(), _free_port()
+    mock_server = uvicorn.Server(uvicorn.Config(mocks.app, host="127.0.0.1", port=mock_port,
+                                                log_level="warning"))
+    mock_task = asyncio.create_task(mock_server.serve())
+    while not mock_server.started:
+        await asyncio.sleep(0.05)
+
+    print(f"target: {args.target} via {args.via} | {args.encoding} | script {script}")
+    print(f"mocks: stt {args.stt_ms:.0f}ms tts {args.tts_ms:.0f}ms exotel {args.exotel_ms:.0f}ms "
+          f"errors {args.error_rate:.0%} | host cores: {os.cpu_count()}\n")
+    print(f"{'calls':>6}{'done':>6}{'cut-in':>7}{'turn p50':>10}{'p95':>8}{'p99':>8}"
+          f"{'ttfa p50':>10}{'p95':>8}{'p99':>8}{'cpu ms/call-s':>15}{'cpu %':>7}")
+
+    sustainable = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = await asyncio.to_thread(start_target, args.target, port,
+                                       f"http://127.0.0.1:{mock_port}", args.encoding, tmp)
+        try:
+            for level_id, n in enumerate(args.concurrency):
+                cpu0, t0 = _cpu_sec(proc.pid), time.perf_counter()
+                results = await run_level(args, n, port, mocks, lines, level_id)
+                cpu1, wall = _cpu_sec(proc.pid), time.perf_counter() - t0
+
+                turns = [t for r in results for t in r.turns]
+                ttfa = [r.ttfa for r in results if r.ttfa is not None]
+                done = sum(r.completed for r in results)
+                call_sec = sum(r.duration for r in results)
+                cpu = cpu1 - cpu0 if cpu0 is not None and cpu1 is not None else None
+                cpu_col = f"{cpu / call_sec * 1000:>15.1f}{cpu / wall:>7.0%}" if cpu is not None else f"{'-':>15}{'-':>7}"
+                print(f"{n:>6}{done:>6}{sum(r.cut_ins for r in results):>7}"
+                      f"{_pct(turns, 50):>10.0f}{_pct(turns, 95):>8.0f}{_pct(turns, 99):>8.0f}"
+                      f"{_pct(ttfa, 50):>10.0f}{_pct(ttfa, 95):>8.0f}{_pct(ttfa, 99):>8.0f}{cpu_col}")
+                errors = [r.error for r in results if r.error]
+                if errors:
+                    print(f"{'':>6}errors: {dict((e, errors.count(e)) for e in set(errors))}")
+                if done == n and turns and _pct(turns, 95) <= args.slo_ms:
+                    sustainable = n
+        finally:
+            proc.terminate()
+            proc.wait()
+            mock_server.should_exit = True
+            await mock_task
+
+    print(f"\nmax sustainable concurrency (all calls done, p95 turn <= {args.slo_ms:.0f}ms): {sustainable}")
+    print(f"mock traffic: {mocks.stats.requests} | injected errors: {mocks.stats.errors}")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--target", choices=sorted(SCRIPTS), default="server")
+    p.add_argument("--via", choices=("ws", "dial"), default="ws",
+                   help="dial: place calls through the target's /dial (config.py)")
+    p.add_argument("--encoding", choices=sorted(ENCODINGS), default="ulaw")
+    p.add_argument("--concurrency", type=int, nargs="+", default=[5, 10, 20, 40])
+    p.add_argument("--ramp-sec", type=float, default=2.0)
+    p.add_argument("--think-sec", type=float, default=0.3)
+    p.add_argument("--reply-timeout", type=float, default=15.0)
+    p.add_argument("--stt-ms", type=float, default=300.0)
+    p.add_argument("--tts-ms", type=float, default=250.0)
+    p.add_argument("--exotel-ms", type=float, default=150.0)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--ms-per-char", type=float, default=30.0, help="length of mock TTS audio")
+    p.add_argument("--slo-ms", type=float, default=1500.0)
+    args = p.parse_args()
+    if args.target == "config":
+        args.encoding = "ulaw"  # config.py decodes μ-law only
+    if args.via == "dial" and args.target != "config":
+        p.error("--via dial needs --target config (server.py has no /dial)")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
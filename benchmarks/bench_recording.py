@@ -0,0 +1,78 @@
+"""Recording overhead on the event loop and writer throughput.
+
+Run from the repo root: ``python -m benchmarks.bench_recording --calls 200 --seconds 10``
+Simulates ``--calls`` calls each receiving and sending a 20 ms μ-law frame
+per tick, in real time (``--fast``: as fast as the loop allows, which
+overruns the writer and shows the drop policy). It reports the enqueue cost
+per frame on the loop, the worst loop lag seen while the writer thread
+compresses and writes, how much was stored and how much was dropped.
+"""
+import argparse
+import asyncio
+import base64
+import tempfile
+import time
+
+import numpy as np
+
+from codec import ulaw_encode
+from framing import media_message
+from loop_monitor import LoopLagMonitor
+from recording import Recorder, RecordingIndex
+
+
+async def run(args, root):
+    recorder = Recorder(root, max_pending_bytes=args.max_pending_mb << 20)
+    recorder.start()
+    monitor = LoopLagMonitor(interval=0.01, threshold=1.0)
+    monitor.start()
+    rng = np.random.default_rng(0)
+    speech = [ulaw_encode((rng.normal(0, 2000, 160)).astype("<i2").tobytes()) for _ in range(50)]
+    inbound = [base64.b64encode(f).decode() for f in speech]
+    outbound = [media_message(f) for f in speech]
+    calls = [recorder.open(f"CA{i:05d}", "ulaw") for i in range(args.calls)]
+
+    ticks = int(args.seconds / 0.02)
+    enqueue = 0.0
+    t0 = time.perf_counter()
+    for tick in range(ticks):
+        s = time.perf_counter()
+        for rec in calls:
+            rec.audio_in(inbound[tick % 50])
+            rec.audio_out(outbound[tick % 50])
+        enqueue += time.perf_counter() - s
+        if tick % 50 == 0:
+            for rec in calls:
+                rec.event("turn", outcome="complete", ms={"first_frame": 600.0})
+        await asyncio.sleep(0 if args.fast else max(0.0, t0 + (tick + 1) * 0.02 - time.perf_counter()))
+    for rec in calls:
+        rec.close()
+    await recorder.close()
+    wall = time.perf_counter() - t0
+    monitor.stop()
+
+    frames = ticks * args.calls * 2
+    raw = frames * 160
+    stats = recorder.stats()
+    print(f"{args.calls} calls x {args.seconds:.0f}s of audio ({raw / 1e6:.1f} MB wire audio) in {wall:.1f}s")
+    print(f"enqueue per frame: {enqueue / frames * 1e6:.2f} µs | max loop lag: {monitor.max_lag * 1000:.1f} ms")
+    print(f"stored: {stats['stored_bytes'] / 1e6:.2f} MB | dropped payloads: {stats['dropped']}")
+    t = time.perf_counter()
+    rec = RecordingIndex(root).get(f"CA{args.calls - 1:05d}")
+    pcm, rate = rec.pcm("in")
+    print(f"lookup + decode one call: {(time.perf_counter() - t) * 1000:.1f} ms ({len(pcm) / 2 / rate:.1f}s of audio)")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--calls", type=int, default=200)
+    p.add_argument("--seconds", type=float, default=10.0)
+    p.add_argument("--max-pending-mb", type=int, default=32)
+    p.add_argument("--fast", action="store_true")
+    args = p.parse_args()
+    with tempfile.TemporaryDirectory() as root:
+        asyncio.run(run(args, root))
+
+
+if __name__ == "__main__":
+    main()
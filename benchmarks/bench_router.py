@@ -0,0 +1,63 @@
+"""Tier mix and latency of ``ResponseRouter`` over call transcripts.
+
+Run from the repo root: ``python -m benchmarks.bench_router [corpus.jsonl]``
+The LLM tier is a ``StubModel`` streaming at ``--token-ms`` per word, so the
+run needs no network; the point is how rarely a turn gets that far.
+"""
+import argparse
+import asyncio
+import json
+
+from intents import IntentEngine
+from llm_service import GeminiService, StubModel
+from router import FAQIndex, ResponseRouter
+from benchmarks.bench_intents import CORPUS
+
+# FAQ questions phrased without any of the rule keywords.
+PARAPHRASES = [
+    ("how much will i have to pay each month", "emi"),
+    ("can i pay back early", "emi"),
+    ("is it totally free", "interest"),
+    ("what happens if i am late paying", "interest"),
+    ("tell me the rate", "interest"),
+    ("what's the max loan", "limit"),
+    ("how big a loan will i get", "limit"),
+    ("any upfront deductions", "processing"),
+    ("do you cut something before sending the money", "processing"),
+]
+
+
+async def run(corpus, token_ms, deadline):
+    llm = GeminiService(StubModel(token_delay=token_ms / 1000))
+    router = ResponseRouter(IntentEngine.from_file(), FAQIndex.from_file(), llm, deadline)
+    semantic_right = 0
+    for row in corpus:
+        route = await router.route(row["text"])
+        if route.tier == "llm":
+            await route.text.aclose()  # only the time to the first sentence is measured
+        if row.get("paraphrase") and route.meta == row["faq"]:
+            semantic_right += 1
+    return router.stats(), semantic_right
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("corpus", nargs="?", default=CORPUS)
+    p.add_argument("--token-ms", type=float, default=60.0)
+    p.add_argument("--deadline", type=float, default=1.5)
+    args = p.parse_args()
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    corpus += [{"text": t, "intent": "FAQ", "faq": k, "paraphrase": True} for t, k in PARAPHRASES]
+
+    stats, semantic_right = asyncio.run(run(corpus, args.token_ms, args.deadline))
+    print(f"corpus: {len(corpus)} utterances ({len(PARAPHRASES)} keyword-free FAQ paraphrases)\n")
+    print(f"{'tier':<10}{'hits':>6}{'hit rate':>10}{'mean ms':>10}{'max ms':>10}")
+    for tier in ("rules", "semantic", "llm", "fallback"):
+        t = stats[tier]
+        print(f"{tier:<10}{t['hits']:>6}{t['hit_rate']:>10.1%}{t['mean_ms']:>10.2f}{t['max_ms']:>10.2f}")
+    print(f"\nparaphrases answered with the right FAQ: {semantic_right}/{len(PARAPHRASES)}")
+
+
+if __name__ == "__main__":
+    main()
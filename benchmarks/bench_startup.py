@@ -0,0 +1,153 @@
+"""Cold start: import time and time until a fresh worker is ready for a call.
+
+Run from the repo root: ``python -m benchmarks.bench_startup --runs 3``
+
+Imports: each module is imported ``--runs`` times in a new interpreter under
+``-X importtime``. The median cumulative import time is reported together
+with its heaviest dependencies, and whether ``google.genai`` was loaded.
+
+Readiness: ``python server.py`` is started against ``mock_vendors``. The
+clock runs from process spawn until the first answer on any route
+(listening) and then until ``GET /ready`` returns 200. One call is then
+placed, and its time to first audio and its first-turn latency are
+reported, as is the TTS traffic the call itself caused. The first run
+starts with an empty TTS disk cache, as on a new instance without a volume.
+Later runs reuse that disk cache.
+The mocks cost no TLS handshake and the LLM is off (no key), so pool
+warm-up and the ``google.genai`` import only show against real vendors.
+"""
+import argparse
+import asyncio
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks.bench_load import SCRIPTS, _free_port, target_env
+from benchmarks.mock_vendors import MockVendors, VendorProfile, recording
+from benchmarks.sim_caller import ENCODINGS, Caller, frames_of
+
+MODULES = ("server", "config", "llm_service")
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(module, env):
+    """``{name: (self_us, cumulative_us, depth)}`` for one cold import of ``module``."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         env=env, capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(f"import {module} failed:\n{out.stderr[-2000:]}")
+    profile = {}
+    for line in out.stderr.splitlines():
+        m = IMPORT_LINE.match(line)
+        if m:
+            profile.setdefault(m[4], (int(m[1]), int(m[2]), len(m[3]) // 2))
+    return profile
+
+
+def report_imports(args, env):
+    print(f"{'module':<14}{'import ms':>10}{'genai':>7}  heaviest dependencies (cumulative ms)")
+    for module in MODULES:
+        runs = [import_profile(module, env) for _ in range(args.runs)]
+        total = statistics.median(p[module][1] for p in runs) / 1000
+        last = runs[-1]
+        deps = sorted(((cum, name) for name, (_, cum, depth) in last.items()
+                       if depth == 1 and name != module), reverse=True)[:args.top]
+        genai = "yes" if "google.genai" in last else "no"
+        print(f"{module:<14}{total:>10.1f}{genai:>7}  "
+              + ", ".join(f"{name} {cum / 1000:.0f}" for cum, name in deps))
+    genai = statistics.median(import_profile("google.genai", env)["google.genai"][1]
+                              for _ in range(args.runs)) / 1000
+    print(f"{'google.genai':<14}{genai:>10.1f}{'':>7}  (deferred to startup warm-up)")
+
+
+async def wait_ready(port, proc, timeout=60.0):
+    """Seconds from now until the target answers at all, and until /ready is 200."""
+    t0 = time.perf_counter()
+    listening = None
+    async with httpx.AsyncClient(timeout=1.0) as client:
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with {proc.returncode}")
+            try:
+                r = await client.get(f"http://127.0.0.1:{port}/ready")
+            except httpx.HTTPError:
+                await asyncio.sleep(0.01)
+                continue
+            if listening is None:
+                listening = time.perf_counter() - t0
+            if r.status_code == 200:
+                return listening, time.perf_counter() - t0
+            await asyncio.sleep(0.01)
+    raise RuntimeError(f"not ready after {timeout:.0f}s")
+
+
+async def cold_start(args, mocks, mock_url, lines, tmp, run):
+    port = _free_port()
+    env = target_env(port, mock_url, args.encoding, tmp)
+    proc = subprocess.Popen([sys.executable, "server.py"], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        listening, ready = await wait_ready(port, proc)
+        tts_before = mocks.stats.requests["tts"]
+        result = await Caller(f"ws://127.0.0.1:{port}/ws", lines, args.encoding,
+                              stream_sid=f"cold-{run}", reply_timeout=15.0).run()
+        tts_calls = mocks.stats.requests["tts"] - tts_before
+    finally:
+        proc.terminate()
+        proc.wait()
+    ttfa = f"{result.ttfa * 1000:.0f}" if result.ttfa is not None else "-"
+    turn = f"{result.turns[0] * 1000:.0f}" if result.turns else "-"
+    print(f"{run:>4}{'cold' if run == 1 else 'disk':>7}{listening * 1000:>11.0f}{ready * 1000:>9.0f}"
+          f"{ttfa:>10}{turn:>11}{tts_calls:>11}"
+          + (f"  error: {result.error}" if result.error else ""))
+
+
+async def report_ready(args):
+    script = SCRIPTS["server"]
+    utterances = list(dict.fromkeys(script))
+    rate = ENCODINGS[args.encoding][0]
+    recordings = {text: frames_of(recording(i, len(text.split()), rate), args.encoding)
+                  for i, text in enumerate(utterances)}
+    lines = [recordings[text] for text in script[:2]]
+    mocks = MockVendors(utterances, stt=VendorProfile(args.stt_ms), tts=VendorProfile(args.tts_ms))
+    mock_port = _free_port()
+    mock_server = uvicorn.Server(uvicorn.Config(mocks.app, host="127.0.0.1", port=mock_port,
+                                                log_level="warning"))
+    mock_task = asyncio.create_task(mock_server.serve())
+    while not mock_server.started:
+        await asyncio.sleep(0.05)
+    print(f"\nmocks: stt {args.stt_ms:.0f}ms tts {args.tts_ms:.0f}ms | {args.encoding}")
+    print(f"{'run':>4}{'cache':>7}{'listen ms':>11}{'ready ms':>9}{'ttfa ms':>10}{'turn 1 ms':>11}"
+          f"{'call tts':>11}")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for run in range(1, args.runs + 1):
+                await cold_start(args, mocks, f"http://127.0.0.1:{mock_port}", lines, tmp, run)
+    finally:
+        mock_server.should_exit = True
+        await mock_task
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--top", type=int, default=4, help="dependencies listed per module")
+    p.add_argument("--encoding", choices=sorted(ENCODINGS), default="ulaw")
+    p.add_argument("--stt-ms", type=float, default=300.0)
+    p.add_argument("--tts-ms", type=float, default=250.0)
+    args = p.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = target_env(0, "http://127.0.0.1:9", args.encoding, tmp)
+        env["GEMINI_API_KEY"] = "unused"  # configured as in production; nothing is sent
+        report_imports(args, env)
+    asyncio.run(report_ready(args))
+
+
+if __name__ == "__main__":
+    main()
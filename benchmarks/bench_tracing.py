@@ -0,0 +1,35 @@
+"""Cost of tracing one turn, so it can stay on in production.
+
+Run from the repo root: ``python -m benchmarks.bench_tracing``
+A turn is every stage mark, 20 outbound frames, the histogram updates on
+``finish`` and, separately, a ``/metrics`` render of the result.
+"""
+import time
+
+from metrics import Registry
+from tracing import STAGES, Tracer
+
+
+def main(turns=100_000, frames=20):
+    registry = Registry()
+    tracer = Tracer(registry)
+    t0 = time.perf_counter()
+    for i in range(turns):
+        trace = tracer.turn("bench")
+        for stage in STAGES[1:5]:
+            trace.mark(stage)
+        for _ in range(frames):
+            trace.frame()
+        tracer.finish(trace, "complete")
+    per_turn = (time.perf_counter() - t0) / turns
+
+    t0 = time.perf_counter()
+    for _ in range(100):
+        text = registry.render()
+    render = (time.perf_counter() - t0) / 100
+    print(f"per traced turn ({frames} frames): {per_turn * 1e6:.1f} µs")
+    print(f"/metrics render: {render * 1e3:.2f} ms for {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Concurrent-call capacity of ``server.py`` as worker processes are added.
+
+Run from the repo root: ``python -m benchmarks.bench_workers --workers 1 2 4``
+
+For each worker count the server is started with ``WORKERS=N REUSE_PORT=1``
+and a shared SQLite ``STATE_STORE``. Callers then open /ws, send a start
+event and push μ-law media frames as fast as the server takes them. This is
+the per-call CPU path: JSON, base64, G.711 decode, resampling and VAD. The
+frames are quiet, so no STT or TTS request is ever made. Sarvam points at a
+closed port, so the greeting TTS fails fast instead of reaching the network.
+
+Throughput is timed until every worker has reported every call ended through
+the shared store's ``metric:calls_ended``. Capacity is that throughput in
+real-time calls at 50 frames per second each. Scaling should be close to
+linear up to ``os.cpu_count()`` workers. On a host with fewer cores than
+workers, the extra processes only time-slice, and the table shows that.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import websockets
+
+from state_store import open_store
+
+FRAME_BYTES = 160  # 20 ms of 8 kHz μ-law
+FRAMES_PER_SEC = 50
+QUIET = b"\xff" * FRAME_BYTES  # μ-law near-silence
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _caller(port, n, frames):
+    media = json.dumps({"event": "media", "media": {"payload": base64.b64encode(QUIET).decode()}})
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws", max_queue=None) as ws:
+        await ws.send(json.dumps({"event": "start", "start": {"stream_sid": f"bench-{os.getpid()}-{n}"}}))
+        for _ in range(frames):
+            await ws.send(media)
+        await ws.send(json.dumps({"event": "stop"}))
+
+
+def _client(port, calls, frames):
+    async def run():
+        await asyncio.gather(*(_caller(port, n, frames) for n in range(calls)))
+    asyncio.run(run())
+
+
+async def _wait_ended(store, expected, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if (await store.get("metric:calls_ended") or 0) >= expected:
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+def measure(workers, calls, frames, clients):
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "state.db")
+        env = {**os.environ, "PORT": str(port), "WORKERS": str(workers), "REUSE_PORT": "1",
+               "STATE_STORE": f"sqlite:///{db}", "MEDIA_ENCODING": "ulaw",
+               "SARVAM_BASE_URL": "http://127.0.0.1:9", "TTS_CACHE_DIR": os.path.join(tmp, "tts"),
+               "STT_MODE": "batch"}
+        server = subprocess.Popen([sys.executable, "server.py"], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(200):
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            time.sleep(1.0 + 0.5 * workers)  # let every worker finish starting up
+            store = open_store(f"sqlite:///{db}")
+
+            t0 = time.perf_counter()
+            procs = [multiprocessing.Process(target=_client, args=(port, calls // clients, frames))
+                     for _ in range(clients)]
+            for p in procs:
+                p.start()
+            for p in procs:
+                p.join()
+            total = calls // clients * clients
+            done = asyncio.run(_wait_ended(store, total, timeout=120))
+            elapsed = time.perf_counter() - t0
+            asyncio.run(store.close())
+        finally:
+            server.terminate()
+            server.wait()
+    fps = total * frames / elapsed
+    return {"workers": workers, "calls": total, "frames_per_sec": fps,
+            "capacity": fps / FRAMES_PER_SEC, "complete": done}
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    p.add_argument("--calls", type=int, default=40)
+    p.add_argument("--frames", type=int, default=1500, help="frames per call (30 s of audio)")
+    p.add_argument("--clients", type=int, default=2, help="load generator processes")
+    args = p.parse_args()
+
+    print(f"host cores: {os.cpu_count()} | {args.calls} calls x {args.frames} frames\n")
+    print(f"{'workers':>8}{'frames/s':>12}{'capacity':>10}{'speedup':>9}")
+    base = None
+    for n in args.workers:
+        r = measure(n, args.calls, args.frames, args.clients)
+        base = base or r["capacity"]
+        note = "" if r["complete"] else "  (timed out)"
+        print(f"{n:>8}{r['frames_per_sec']:>12.0f}{r['capacity']:>10.0f}{r['capacity'] / base:>8.2f}x{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Local stand-ins for Sarvam and Exotel, for load tests without the network.
+
+One FastAPI app serves all three APIs, so a target is pointed at it with
+``SARVAM_BASE_URL`` and ``EXOTEL_BASE_URL``:
+
+* ``POST /speech-to-text``: recognizes the harness's own recordings (see
+  ``recording``). Each scripted utterance is voiced at its own pitch, and
+  the transcript is the utterance whose pitch is nearest the upload's
+  dominant frequency. That survives G.711, resampling and partial uploads.
+* ``POST /text-to-speech``: a WAV of quiet tone, ``ms_per_char`` long per
+  character, at the requested sample rate. It accepts both the
+  ``{"text"}`` body of tts_api.py and the ``{"inputs": [...]}`` body of
+  config.py.
+* ``POST /v1/Accounts/{sid}/Calls/connect.json``: answers with a call sid.
+  It then plays the callee: it fetches the ExoML ``Url`` with the call's
+  ``CustomField``, as Exotel does, and hands the stream URL and the
+  stream's ``<Parameter>`` values to ``on_call``, which runs a simulated
+  caller. When that returns, it posts the ``StatusCallback``.
+
+Every endpoint waits ``latency_ms`` ± ``jitter`` and fails with a 503 at
+``error_rate``, set per vendor with ``VendorProfile``.
+"""
+import asyncio
+import base64
+import html
+import io
+import random
+import re
+import uuid
+import wave
+from dataclasses import dataclass, field
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from audio_encoding import pcm_to_wav
+
+BASE_PITCH_HZ = 300.0
+PITCH_STEP_HZ = 120.0  # wide enough apart to survive μ-law and resampling
+SILENCE_RMS = 200.0  # quieter uploads transcribe to ""
+
+
+@dataclass
+class VendorProfile:
+    latency_ms: float = 0.0
+    jitter: float = 0.2  # fraction of latency_ms, uniform either side
+    error_rate: float = 0.0
+
+    async def delay(self):
+        if self.latency_ms:
+            spread = self.latency_ms * self.jitter
+            await asyncio.sleep(max(0.0, random.uniform(self.latency_ms - spread,
+                                                        self.latency_ms + spread)) / 1000)
+
+    def fails(self):
+        return random.random() < self.error_rate
+
+
+@dataclass
+class VendorStats:
+    requests: dict = field(default_factory=lambda: {"stt": 0, "tts": 0, "exotel": 0})
+    errors: dict = field(default_factory=lambda: {"stt": 0, "tts": 0, "exotel": 0})
+
+
+def pitch_hz(index):
+    return BASE_PITCH_HZ + PITCH_STEP_HZ * index
+
+
+def recording(index, words, sample_rate=8000, sec_per_word=0.3):
+    """Int16 PCM 'speech' for utterance ``index``: its pitch, syllable-modulated."""
+    t = np.arange(int(sample_rate * max(0.4, sec_per_word * words))) / sample_rate
+    envelope = 0.65 + 0.35 * np.sin(2 * np.pi * 4.0 * t)  # ~4 syllables per second
+    return (6000 * envelope * np.sin(2 * np.pi * pitch_hz(index) * t)).astype("<i2")
+
+
+def dominant_hz(pcm, sample_rate):
+    x = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+    if x.size < 64 or np.sqrt(np.mean(x * x)) < SILENCE_RMS:
+        return None
+    spectrum = np.abs(np.fft.rfft(x * np.hanning(x.size)))
+    return float(np.argmax(spectrum[1:]) + 1) * sample_rate / x.size
+
+
+def _read_wav(data):
+    with wave.open(io.BytesIO(data)) as w:
+        return w.readframes(w.getnframes()), w.getframerate()
+
+
+class MockVendors:
+    def __init__(self, utterances, stt=None, tts=None, exotel=None, ms_per_char=30.0,
+                 on_call=None):
+        self.utterances = list(utterances)
+        self.stt = stt or VendorProfile()
+        self.tts = tts or VendorProfile()
+        self.exotel = exotel or VendorProfile()
+        self.ms_per_char = ms_per_char
+        self.on_call = on_call  # async (stream_url, custom_parameters) -> None
+        self.stats = VendorStats()
+        self.calls = set()
+        self.app = self._build()
+
+    def transcribe(self, pcm, sample_rate):
+        hz = dominant_hz(pcm, sample_rate)
+        if hz is None or not self.utterances:
+            return ""
+        index = int(round((hz - BASE_PITCH_HZ) / PITCH_STEP_HZ))
+        return self.utterances[index] if 0 <= index < len(self.utterances) else ""
+
+    def speech(self, text, sample_rate):
+        t = np.arange(int(sample_rate * len(text) * self.ms_per_char / 1000)) / sample_rate
+        return (800 * np.sin(2 * np.pi * 220 * t)).astype("<i2").tobytes()
+
+    async def _gate(self, name, profile):
+        self.stats.requests[name] += 1
+        await profile.delay()
+        if profile.fails():
+            self.stats.errors[name] += 1
+            return JSONResponse({"error": "mock failure"}, status_code=503)
+        return None
+
+    async def _answer(self, sid, url, status_callback, custom_field):
+        status = "completed"
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                exoml = (await client.post(url, data={"CallSid": sid, "CustomField": custom_field or ""})).text
+                stream = re.search(r'<Stream url="([^"]+)"', exoml).group(1)
+                params = {html.unescape(k): html.unescape(v)
+                          for k, v in re.findall(r'<Parameter name="([^"]*)" value="([^"]*)"', exoml)}
+                await self.on_call(re.sub(r"^wss://", "ws://", stream), params)
+        except Exception:
+            status = "failed"
+        try:
+            if status_callback:
+                async with httpx.AsyncClient(timeout=10) as client:
+                    await client.post(status_callback, data={"CallSid": sid, "Status": status})
+        except httpx.HTTPError:
+            pass
+        finally:
+            self.calls.discard(asyncio.current_task())
+
+    def _build(self):
+        app = FastAPI()
+
+        @app.post("/speech-to-text")
+        async def stt(request: Request):
+            if (failed := await self._gate("stt", self.stt)) is not None:
+                return failed
+            form = await request.form()
+            pcm, rate = _read_wav(await form["file"].read())
+            return {"transcript": self.transcribe(pcm, rate)}
+
+        @app.post("/text-to-speech")
+        async def tts(request: Request):
+            if (failed := await self._gate("tts", self.tts)) is not None:
+                return failed
+            body = await request.json()
+            text = body.get("text") or (body.get("inputs") or [""])[0]
+            rate = int(body.get("speech_sample_rate", 16000))
+            return {"audios": [base64.b64encode(pcm_to_wav(self.speech(text, rate), rate)).decode()]}
+
+        @app.post("/v1/Accounts/{sid}/Calls/connect.json")
+        async def connect(sid: str, request: Request):
+            if (failed := await self._gate("exotel", self.exotel)) is not None:
+                return failed
+            form = await request.form()
+            call_sid = uuid.uuid4().hex
+            if self.on_call is not None:
+                task = asyncio.create_task(self._answer(
+                    call_sid, form["Url"], form.get("StatusCallback"), form.get("CustomField")))
+                self.calls.add(task)
+            return {"Call": {"Sid": call_sid, "To": form.get("To"), "Status": "in-progress"}}
+
+        return app
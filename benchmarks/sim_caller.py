@@ -0,0 +1,200 @@
+"""A simulated Exotel caller: one /ws call that follows a script.
+
+The caller sends a ``start`` event and then one ``media`` frame every 20 ms
+of wall-clock time, as a phone line does: silence, or the next frames of an
+utterance when it is the caller's turn. Bot audio is "heard" at real-time
+speed: the caller waits until what it received would have finished playing
+and then ``think_sec`` more before saying the next line of its script.
+
+Per call it records time to first audio (``start`` to the first bot frame)
+and, for each line, the turn latency: the time from the caller's last voiced
+frame to the first frame of the reply. A reply that starts before the line
+has been fully sent counts as a cut-in, not a latency sample.
+
+``turn_frames`` is for targets that cut the stream into fixed-size windows
+(config.py transcribes every 80 frames). Each line is delayed so that it
+ends on a window boundary.
+"""
+import asyncio
+import base64
+import io
+import json
+import time
+import wave
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import websockets
+
+from codec import alaw_encode, ulaw_encode
+
+FRAME_SEC = 0.02
+
+# Wire encodings: (sample rate, bytes per second, encoder from PCM bytes)
+ENCODINGS = {
+    "ulaw": (8000, 8000, ulaw_encode),
+    "alaw": (8000, 8000, alaw_encode),
+    "pcm8": (8000, 16000, bytes),
+    "pcm16": (16000, 32000, bytes),
+}
+
+
+@dataclass
+class CallResult:
+    ttfa: Optional[float] = None
+    turns: List[float] = field(default_factory=list)
+    cut_ins: int = 0
+    error: Optional[str] = None
+    completed: bool = False
+    duration: float = 0.0
+
+
+def frames_of(pcm, encoding):
+    """Base64 payloads of 20 ms frames of int16 ``pcm`` at the encoding's rate."""
+    rate, _, encode = ENCODINGS[encoding]
+    n = int(rate * FRAME_SEC)
+    pcm = np.concatenate([pcm, np.zeros(-len(pcm) % n, dtype=pcm.dtype)])
+    return [base64.b64encode(encode(pcm[i:i + n].tobytes())).decode() for i in range(0, len(pcm), n)]
+
+
+def audio_sec(payload, bytes_per_sec):
+    """Play length of a received media payload: a WAV file or raw wire audio."""
+    data = base64.b64decode(payload)
+    if data[:4] == b"RIFF":
+        with wave.open(io.BytesIO(data)) as w:
+            return w.getnframes() / w.getframerate()
+    return len(data) / bytes_per_sec
+
+
+class Caller:
+    def __init__(self, url, lines, encoding="ulaw", stream_sid="sim", custom_parameters=None,
+                 think_sec=0.3, reply_timeout=15.0, turn_frames=None):
+        """``lines`` is the script: a list of frame payload lists, from ``frames_of``."""
+        self.url = url
+        self.lines = lines
+        self.encoding = encoding
+        self.stream_sid = stream_sid
+        self.custom_parameters = custom_parameters
+        self.think_sec = think_sec
+        self.reply_timeout = reply_timeout
+        self.turn_frames = turn_frames
+        self.bytes_per_sec = ENCODINGS[encoding][1]
+        self.silence = frames_of(np.zeros(int(ENCODINGS[encoding][0] * FRAME_SEC), dtype="<i2"),
+                                 encoding)[0]
+        self._outbox = []  # frames of the line being said
+        self._said = None  # future: time the last frame of the line was sent
+        self._sent = 0
+        self._heard = asyncio.Event()
+        self._first_heard = None
+        self._last_heard = 0.0
+        self._playing_until = 0.0
+        self._closed = False
+
+    def _media(self, payload):
+        return ('{"event": "media", "stream_sid": "%s", "media": {"payload": "%s"}}'
+                % (self.stream_sid, payload))
+
+    async def _send_loop(self, ws):
+        t0 = time.perf_counter()
+        try:
+            while True:
+                if self._outbox:
+                    payload = self._outbox.pop(0)
+                    await ws.send(self._media(payload))
+                    if not self._outbox:
+                        self._said.set_result(time.perf_counter())
+                else:
+                    await ws.send(self._media(self.silence))
+                self._sent += 1
+                delay = t0 + self._sent * FRAME_SEC - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        except websockets.ConnectionClosed:
+            self._closed = True
+            if self._said is not None and not self._said.done():
+                self._said.set_exception(ConnectionError("call closed mid-line"))
+
+    async def _recv_loop(self, ws):
+        try:
+            async for msg in ws:
+                data = json.loads(msg)
+                if data.get("event") != "media":
+                    continue
+                now = time.perf_counter()
+                if self._first_heard is None:
+                    self._first_heard = now
+                    self._heard.set()
+                self._last_heard = now
+                self._playing_until = max(self._playing_until, now) + audio_sec(
+                    data["media"]["payload"], self.bytes_per_sec)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._closed = True
+            self._heard.set()
+
+    async def _hear_reply(self):
+        """Arrival time of the first bot frame since the last call."""
+        await asyncio.wait_for(self._heard.wait(), self.reply_timeout)
+        if self._first_heard is None:
+            raise ConnectionError("call closed before the bot replied")
+        first, self._first_heard = self._first_heard, None
+        self._heard.clear()
+        return first
+
+    async def _until_quiet(self, gap=0.4):
+        while not self._closed:
+            now = time.perf_counter()
+            if now >= self._playing_until and now - self._last_heard >= gap:
+                return
+            await asyncio.sleep(max(self._playing_until - now, 0.05))
+
+    async def _say(self, frames):
+        if self.turn_frames:
+            # Start so the line's last frame closes a server window.
+            while (self._sent + len(self._outbox) + len(frames)) % self.turn_frames:
+                await asyncio.sleep(FRAME_SEC / 2)
+        self._said = asyncio.get_running_loop().create_future()
+        self._heard.clear()
+        self._first_heard = None
+        self._outbox = list(frames)
+        return await self._said
+
+    async def run(self):
+        result = CallResult()
+        t0 = time.perf_counter()
+        tasks = []
+        try:
+            async with websockets.connect(self.url, max_queue=None, open_timeout=10) as ws:
+                start = {"stream_sid": self.stream_sid}
+                if self.custom_parameters:
+                    start["custom_parameters"] = self.custom_parameters
+                await ws.send(json.dumps({"event": "start", "stream_sid": self.stream_sid, "start": start}))
+                started = time.perf_counter()
+                tasks = [asyncio.create_task(self._send_loop(ws)), asyncio.create_task(self._recv_loop(ws))]
+                result.ttfa = await self._hear_reply() - started
+                for frames in self.lines:
+                    await self._until_quiet()
+                    if self._closed:
+                        raise ConnectionError("call closed mid-script")
+                    await asyncio.sleep(self.think_sec)
+                    said = await self._say(frames)
+                    latency = await self._hear_reply() - said
+                    if latency < 0:
+                        result.cut_ins += 1
+                    else:
+                        result.turns.append(latency)
+                await self._until_quiet()
+                result.completed = True
+                if not self._closed:
+                    await ws.send(json.dumps({"event": "stop", "stream_sid": self.stream_sid}))
+        except asyncio.TimeoutError:
+            result.error = "no reply"
+        except (OSError, websockets.WebSocketException, ConnectionError) as e:
+            result.error = type(e).__name__
+        finally:
+            for task in tasks:
+                task.cancel()
+            result.duration = time.perf_counter() - t0
+        return result
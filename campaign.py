@@ -0,0 +1,529 @@
+"""Bulk outbound campaigns from a ``phone_number,pitch[,slot...]`` CSV.
+
+The upload is streamed to ``<state_dir>/<id>.csv`` and read back in batches
+of lines off the event loop, so a 100k-row file is never held in memory.
+``Campaign.run`` dials the rows in order. Pacing and the live-call cap are
+global: a ``DialPacer`` and a ``CallLimit``, shared by every campaign of a
+``CampaignManager`` and kept in the state store, so all campaigns on all
+workers together dial at most ``cps`` calls a second and hold at most
+``max_active`` live calls. A slot is freed when Exotel's status callback
+reports the call finished (``call_ended``) or after ``call_timeout`` if it
+never does. The optional ``prerender`` hook gets the
+remaining rows in batches from a background pass that runs ahead of the
+dialer, e.g. to synthesize each row's pitch before its call connects. The
+optional ``admit`` hook is asked before every dial. It returns None, or the
+reason the process cannot take another call (see ``capacity.py``); dialing
+pauses until it returns None again.
+
+Progress lives in the shared state store under ``campaign:<id>``: the byte
+offset of the first row not yet settled, plus the offsets of rows beyond it
+that already settled. It is flushed about once a second. Exactly one worker
+dials a campaign, the one holding its ``campaign-owner:<id>`` lease. When a
+worker stops or dies, the lease lapses and ``resume_all`` on any worker picks
+the campaign back up from its last flush. Rows that were being dialed at that
+moment are dialed again, so delivery is at-least-once.
+
+Exotel's status callback may reach a worker that does not own the call's
+campaign; that worker leaves a ``call-ended:<sid>`` marker for the owner to
+collect.
+"""
+import asyncio
+import csv
+import logging
+import os
+import random
+import re
+import shutil
+import time
+import uuid
+
+import httpx
+
+from capacity import CircuitOpen
+from http_client import RETRY_STATUSES
+
+log = logging.getLogger("voicebot")
+
+_NON_DIGIT = re.compile(r"\D")
+
+OWNER_TTL = 30.0  # seconds a dead worker's campaigns wait before another adopts them
+ENDED_TTL = 3600.0
+UNFINISHED = ("pending", "running", "paused")
+READ_BATCH = 256  # CSV lines read per trip to a worker thread
+
+
+def normalize_number(raw, country_code="91"):
+    """E.164 form of an Indian mobile number, or None if it is not one."""
+    digits = _NON_DIGIT.sub("", raw)
+    if len(digits) == 11 and digits.startswith("0"):
+        digits = digits[1:]
+    elif len(digits) == 12 and digits.startswith(country_code):
+        digits = digits[len(country_code):]
+    if len(digits) != 10 or digits[0] not in "6789":
+        return None
+    return f"+{country_code}{digits}"
+
+
+def _retryable(exc):
+    if isinstance(exc, CircuitOpen):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRY_STATUSES
+    return isinstance(exc, httpx.TransportError)
+
+
+class DialPacer:
+    """At most ``cps`` dials a second across every process sharing ``store``.
+
+    Time is cut into slots of ``1 / cps`` seconds, and a dial waits for a
+    slot it can claim with ``set_nx``, so each slot starts one dial in the
+    whole fleet. Slot keys are reused round-robin and expire well before
+    their reuse.
+    """
+
+    SLOTS = 256
+
+    def __init__(self, store, cps=1.0):
+        self.store = store
+        self.interval = 1.0 / cps
+        self._next = 0
+
+    async def wait(self):
+        while True:
+            now = time.time()
+            slot = max(int(now / self.interval), self._next)
+            self._next = slot + 1
+            delay = slot * self.interval - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if await self.store.set_nx(f"dial-slot:{slot % self.SLOTS}", slot,
+                                       ttl=self.SLOTS / 2 * self.interval):
+                return
+
+
+class CallLimit:
+    """At most ``max_active`` live campaign calls across every process sharing ``store``.
+
+    ``campaign-active`` counts the live calls; ``acquire`` increments it and
+    backs out while that would pass the cap. Each owner also counts its own
+    share under ``campaign-held:<owner>``, so ``reap`` can hand back the
+    share of an owner that died with calls open.
+    """
+
+    def __init__(self, store, owner, max_active=50, poll=0.2):
+        self.store = store
+        self.owner = owner
+        self.max_active = max_active
+        self.poll = poll
+        self.held = 0
+        self._writes = set()
+
+    @property
+    def held_key(self):
+        return f"campaign-held:{self.owner}"
+
+    async def acquire(self):
+        while True:
+            if await self.store.incr("campaign-active") <= self.max_active:
+                self.held += 1
+                await self.store.incr(self.held_key)
+                return
+            await self.store.incr("campaign-active", -1)
+            await asyncio.sleep(self.poll)
+
+    def release(self):
+        """Free one call; the store is updated in the background."""
+        self.held -= 1
+        task = asyncio.create_task(self._release())
+        self._writes.add(task)
+        task.add_done_callback(self._released)
+
+    async def _release(self):
+        await self.store.incr("campaign-active", -1)
+        await self.store.incr(self.held_key, -1)
+
+    def _released(self, task):
+        self._writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.warning(f"⚠️ Campaign call limit: state store: {task.exception()}")
+
+    async def reap(self, owner):
+        """Return the calls held by ``owner``, whose lease has lapsed."""
+        if not await self.store.set_nx(f"campaign-reap:{owner}", self.owner, ttl=OWNER_TTL):
+            return 0
+        held = await self.store.get(f"campaign-held:{owner}") or 0
+        if held:
+            await self.store.incr("campaign-active", -held)
+        await self.store.delete(f"campaign-held:{owner}")
+        return held
+
+    async def active(self):
+        return await self.store.get("campaign-active") or 0
+
+
+class Campaign:
+    def __init__(self, campaign_id, state_dir, dial, store, owner, cps=1.0, max_active=50,
+                 max_attempts=4, backoff=2.0, call_timeout=600.0, prerender=None, admit=None,
+                 pacer=None, limit=None):
+        """``pacer`` and ``limit`` are shared by a ``CampaignManager``'s campaigns;
+        a campaign built on its own gets ones from ``cps`` and ``max_active``."""
+        self.id = campaign_id
+        self.csv_path = os.path.join(state_dir, f"{campaign_id}.csv")
+        self.dial = dial
+        self.store = store
+        self.owner = owner
+        self.prerender = prerender
+        self.admit = admit
+        self.throttled = None  # why dialing is paused, if it is
+        self.pacer = pacer or DialPacer(store, cps)
+        self.limit = limit or CallLimit(store, owner, max_active)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.call_timeout = call_timeout
+        self.status = "pending"
+        self.cursor = 0
+        self.counts = {"invalid": 0, "duplicates": 0, "dialed": 0,
+                       "failed": 0, "retries": 0, "completed": 0}
+        self._settled = set()  # settled row offsets >= cursor
+        self._pending = set()  # row offsets being dialed
+        self._read_pos = 0
+        self._seen = set()
+        self._live = {}  # call sid -> timeout handle
+        self._dirty = True
+        self._task = None
+
+    @classmethod
+    async def create(cls, upload, state_dir, dial, store, owner, **kwargs):
+        """Stream the uploaded file object to disk and return a new campaign."""
+        os.makedirs(state_dir, exist_ok=True)
+        campaign = cls(uuid.uuid4().hex[:12], state_dir, dial, store, owner, **kwargs)
+
+        def copy():
+            with open(campaign.csv_path, "wb") as dst:
+                shutil.copyfileobj(upload, dst, 1 << 20)
+
+        await asyncio.to_thread(copy)
+        await store.set(campaign.owner_key, owner, ttl=OWNER_TTL)
+        await campaign._flush()
+        return campaign
+
+    @classmethod
+    def from_state(cls, state, state_dir, dial, store, owner, **kwargs):
+        campaign = cls(state["id"], state_dir, dial, store, owner, **kwargs)
+        campaign.status = state["status"]
+        campaign.cursor = state["cursor"]
+        campaign.counts.update(state["counts"])
+        campaign._settled = set(state["settled"])
+        return campaign
+
+    @property
+    def key(self):
+        return f"campaign:{self.id}"
+
+    @property
+    def owner_key(self):
+        return f"campaign-owner:{self.id}"
+
+    # ---- progress ----
+
+    def state(self):
+        return {"id": self.id, "status": self.status, "cursor": self.cursor,
+                "settled": sorted(self._settled), "counts": self.counts,
+                "owner": self.owner, "active": len(self._live), "throttled": self.throttled}
+
+    @staticmethod
+    def summary(state):
+        return {"id": state["id"], "status": state["status"], "cursor": state["cursor"],
+                "owner": state["owner"], "active": state["active"],
+                "throttled": state.get("throttled"), **state["counts"]}
+
+    def _save(self):
+        self._dirty = True
+
+    async def _flush(self):
+        if self._dirty:
+            self._dirty = False
+            await self.store.set(self.key, self.state())
+
+    async def _sync(self, every=1.0):
+        """Flush progress, keep the lease and collect calls ended on other workers."""
+        while True:
+            await asyncio.sleep(every)
+            try:
+                await self._flush()
+                await self.store.set(self.owner_key, self.owner, ttl=OWNER_TTL)
+                sids = list(self._live)
+                ended = await self.store.get_many([f"call-ended:{sid}" for sid in sids])
+                for sid, mark in zip(sids, ended):
+                    if mark is not None:
+                        self.call_ended(sid)
+                        await self.store.delete(f"call-ended:{sid}")
+            except Exception as e:
+                self._dirty = True
+                log.warning(f"⚠️ Campaign {self.id}: state store: {e}")
+
+    def _settle(self, offset):
+        self._pending.discard(offset)
+        self._settled.add(offset)
+        cursor = min(self._pending, default=self._read_pos)
+        self._settled = {o for o in self._settled if o >= cursor}
+        self.cursor = cursor
+        self._save()
+
+    # ---- rows ----
+
+    @staticmethod
+    def _read_batch(f):
+        """Up to ``READ_BATCH`` ``(offset, line)`` pairs; run in a worker thread."""
+        batch = []
+        for _ in range(READ_BATCH):
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            batch.append((offset, line))
+        return batch
+
+    async def _lines(self, f, track=True):
+        """Yield ``(offset, number field, {column: value})`` for each data line.
+
+        A first line starting with ``phone_number`` names the columns;
+        without one they are ``phone_number,pitch``.
+        """
+        columns = ["pitch"]
+        while True:
+            batch = await asyncio.to_thread(self._read_batch, f)
+            if not batch:
+                return
+            for offset, line in batch:
+                if track:
+                    self._read_pos = offset + len(line)
+                fields = [v.strip() for v in next(csv.reader([line.decode("utf-8-sig", "replace")]), [])]
+                if not fields:
+                    continue
+                if offset == 0 and fields[0].lower() == "phone_number":
+                    columns = [c.lower() for c in fields[1:]]
+                    continue
+                yield offset, fields[0], dict(zip(columns, fields[1:]))
+
+    async def _rows(self, f):
+        """Yield ``(offset, number, row)`` for each new, valid, unique row."""
+        async for offset, raw, row in self._lines(f):
+            number = normalize_number(raw)
+            replay = offset < self.cursor or offset in self._settled
+            if number is None or number in self._seen:
+                if not replay:
+                    self.counts["invalid" if number is None else "duplicates"] += 1
+                    self._settle(offset)
+                continue
+            self._seen.add(number)
+            if replay:
+                continue
+            self._pending.add(offset)
+            yield offset, number, row
+
+    async def _prerender(self, batch=256):
+        """Hand rows not yet dialed to ``prerender`` in batches, ahead of the dialer."""
+        rows = []
+        with open(self.csv_path, "rb") as f:
+            async for offset, _, row in self._lines(f, track=False):
+                if offset >= self.cursor and offset not in self._settled:
+                    rows.append(row)
+                if len(rows) >= batch:
+                    await self.prerender(rows)
+                    rows = []
+        if rows:
+            await self.prerender(rows)
+        log.info(f"🎙 Campaign {self.id} pre-rendered")
+
+    # ---- dialing ----
+
+    async def _admitted(self, poll=1.0):
+        """Wait until ``admit`` reports room for another call."""
+        reason = self.admit() if self.admit is not None else None
+        if reason is None:
+            return
+        log.warning(f"⏸ Campaign {self.id} throttled: {reason}")
+        while reason is not None:
+            if reason != self.throttled:
+                self.throttled = reason
+                self._save()
+            await asyncio.sleep(poll)
+            reason = self.admit()
+        self.throttled = None
+        self._save()
+        log.info(f"▶️ Campaign {self.id} dialing again")
+
+    async def _call(self, offset, number, row):
+        sid = None
+        try:
+            for attempt in range(self.max_attempts):
+                try:
+                    sid = await self.dial(number, row)
+                    self.counts["dialed"] += 1
+                    break
+                except Exception as e:
+                    if not _retryable(e) or attempt + 1 >= self.max_attempts:
+                        self.counts["failed"] += 1
+                        log.error(f"❌ Campaign {self.id}: dialing {number} failed: {e}")
+                        break
+                    self.counts["retries"] += 1
+                    delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    log.warning(f"↻ Campaign {self.id}: retry {number} in {delay:.1f}s ({e})")
+                    await asyncio.sleep(delay)
+                    await self.pacer.wait()
+        except asyncio.CancelledError:
+            # Left pending, so the row is dialed again on resume.
+            self.limit.release()
+            raise
+        if sid:
+            self._live[sid] = asyncio.get_running_loop().call_later(self.call_timeout, self.call_ended, sid)
+        else:
+            self.limit.release()
+        self._settle(offset)
+
+    def call_ended(self, sid):
+        """Free the slot held by ``sid``; unknown sids are ignored."""
+        handle = self._live.pop(sid, None)
+        if handle is None:
+            return False
+        handle.cancel()
+        self.counts["completed"] += 1
+        self.limit.release()
+        self._save()
+        return True
+
+    async def run(self):
+        self.status = "running"
+        self._save()
+        await self._flush()
+        log.info(f"📣 Campaign {self.id} running from byte {self.cursor} on {self.owner}")
+        tasks = set()
+        sync = asyncio.create_task(self._sync())
+        prerender = asyncio.create_task(self._prerender()) if self.prerender else None
+        try:
+            with open(self.csv_path, "rb") as f:
+                async for offset, number, row in self._rows(f):
+                    await self.limit.acquire()
+                    try:
+                        await self._admitted()
+                        await self.pacer.wait()
+                    except BaseException:
+                        self.limit.release()
+                        raise
+                    task = asyncio.create_task(self._call(offset, number, row))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                if tasks:
+                    await asyncio.gather(*tasks)
+            self.cursor = self._read_pos
+            self._settled.clear()
+            self.status = "done"
+            log.info(f"✅ Campaign {self.id} done | {self.counts}")
+        except asyncio.CancelledError:
+            self.status = "paused"
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            sync.cancel()
+            if prerender is not None:
+                prerender.cancel()
+            self._save()
+            await self._flush()
+            await self.store.delete(self.owner_key)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self):
+        return self.summary(self.state())
+
+
+class CampaignManager:
+    """The campaigns this worker owns, keyed by id, and adoption of orphaned ones.
+
+    Every campaign shares the manager's ``DialPacer`` and ``CallLimit``, so
+    ``cps`` and ``max_active`` bound all campaigns on all workers together.
+    """
+
+    def __init__(self, store, owner, state_dir, dial, cps=1.0, max_active=50, **campaign_kwargs):
+        self.store = store
+        self.owner = owner
+        self.state_dir = state_dir
+        self.dial = dial
+        self.pacer = DialPacer(store, cps)
+        self.limit = CallLimit(store, owner, max_active)
+        self.campaign_kwargs = {**campaign_kwargs, "pacer": self.pacer, "limit": self.limit}
+        self.campaigns = {}
+        self._watch = None
+
+    async def create(self, upload):
+        campaign = await Campaign.create(upload, self.state_dir, self.dial, self.store,
+                                         self.owner, **self.campaign_kwargs)
+        self.campaigns[campaign.id] = campaign
+        campaign.start()
+        return campaign
+
+    async def resume_all(self):
+        """Take over every unfinished campaign whose owner's lease has lapsed,
+        and return the call slots dead managers still held."""
+        await self.store.set(f"campaign-manager:{self.owner}", True, ttl=OWNER_TTL)
+        alive = await self.store.scan("campaign-manager:")
+        for key in await self.store.scan("campaign-held:"):
+            owner = key.removeprefix("campaign-held:")
+            if f"campaign-manager:{owner}" not in alive:
+                held = await self.limit.reap(owner)
+                if held:
+                    log.info(f"♻️ Campaign calls: returned {held} slots held by {owner}")
+        for state in (await self.store.scan("campaign:")).values():
+            local = self.campaigns.get(state["id"])
+            if state["status"] not in UNFINISHED or (local and local.status == "running"):
+                continue
+            if not await self.store.set_nx(f"campaign-owner:{state['id']}", self.owner, ttl=OWNER_TTL):
+                continue
+            campaign = Campaign.from_state(state, self.state_dir, self.dial, self.store,
+                                           self.owner, **self.campaign_kwargs)
+            self.campaigns[campaign.id] = campaign
+            campaign.start()
+
+    async def _adopt(self):
+        while True:
+            try:
+                await self.resume_all()
+            except Exception as e:
+                log.warning(f"⚠️ Campaign adoption: state store: {e}")
+            await asyncio.sleep(OWNER_TTL / 2)
+
+    def start(self):
+        """Resume campaigns now, then keep adopting those left by dead workers."""
+        self._watch = asyncio.create_task(self._adopt())
+
+    async def status(self, campaign_id):
+        """Progress of any campaign, owned here or by another worker."""
+        campaign = self.campaigns.get(campaign_id)
+        if campaign is not None and campaign.status == "running":
+            return campaign.stats()
+        state = await self.store.get(f"campaign:{campaign_id}")
+        return Campaign.summary(state) if state is not None else None
+
+    async def call_ended(self, sid):
+        """Free the slot held by ``sid``, here or, via the store, on its owner."""
+        if any(c.call_ended(sid) for c in self.campaigns.values()):
+            return True
+        await self.store.set(f"call-ended:{sid}", True, ttl=ENDED_TTL)
+        return False
+
+    async def stop_all(self):
+        if self._watch is not None:
+            self._watch.cancel()
+        tasks = [c._task for c in self.campaigns.values() if c._task is not None]
+        for campaign in self.campaigns.values():
+            campaign.stop()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,216 @@
+"""Per-vendor circuit breakers and call admission.
+
+Every ``http_client.Upstream`` owns a ``Breaker``. The breaker sees each
+request's latency and outcome. It opens when at least ``max_bad_ratio`` of
+the last ``window`` requests failed or took longer than ``slow_sec``. While
+it is open, requests fail at once with ``CircuitOpen`` instead of queueing
+behind a vendor that is down or drowning. Callers fall back to cached or
+canned audio meanwhile. After ``cooldown`` seconds the breaker half-opens:
+one probe request per ``probe_interval`` is let through. The first good
+probe closes the breaker and a bad one re-opens it.
+
+``CapacityManager`` answers whether this process should take on another
+call. The dialers (``POST /dial``, campaigns) ask it before placing a call,
+so new load stops before live calls start to suffer. It refuses when:
+
+* the active-call cap is reached;
+* a vendor's breaker is open (half-open admits one probe call per
+  ``probe_call_sec``, so the breaker can close again);
+* a vendor's concurrency slots are nearly all busy or requests queue for them;
+* the event loop is lagging;
+* with a ``WorkerFleet``, none of the call-taking workers is accepting.
+
+A dialer whose calls are answered by other processes (config.py dialing
+for the server.py workers) passes a ``WorkerFleet``: it counts the live
+calls those workers publish under ``worker:*`` in the state store, so the
+cap covers the calls actually running rather than the dialer's own.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+log = logging.getLogger("voicebot")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    """A request was refused because its vendor's breaker is open."""
+
+    def __init__(self, name):
+        super().__init__(f"{name} circuit open")
+        self.name = name
+
+
+class Breaker:
+    def __init__(self, name, slow_sec=3.0, window=20, min_requests=10, max_bad_ratio=0.5,
+                 cooldown=10.0, probe_interval=1.0):
+        self.name = name
+        self.slow_sec = slow_sec
+        self.min_requests = min_requests
+        self.max_bad_ratio = max_bad_ratio
+        self.cooldown = cooldown
+        self.probe_interval = probe_interval
+        self.state = CLOSED
+        self.latency = 0.0  # EMA of request latency, seconds
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opens = 0
+        self._bad = deque(maxlen=window)  # True: failed or slow
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+
+    def current_state(self):
+        """``state``, after moving OPEN to HALF_OPEN once the cooldown has passed."""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self._probe_at = 0.0
+        return self.state
+
+    def allow(self):
+        """Whether a request may be sent now; counts a rejection if not."""
+        if self.current_state() == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == HALF_OPEN and now - self._probe_at >= self.probe_interval:
+            self._probe_at = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, latency, ok):
+        self.requests += 1
+        self.failures += not ok
+        self.latency += 0.2 * (latency - self.latency) if self.requests > 1 else latency
+        bad = not ok or latency > self.slow_sec
+        if self.state == HALF_OPEN:
+            if bad:
+                self._open()
+            else:
+                self.state = CLOSED
+                self._bad.clear()
+                log.info(f"✅ {self.name} circuit closed")
+            return
+        if self.state == OPEN:
+            return  # sent before the breaker opened
+        self._bad.append(bad)
+        if len(self._bad) >= self.min_requests and sum(self._bad) >= self.max_bad_ratio * len(self._bad):
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opens += 1
+        self._opened_at = time.monotonic()
+        self._bad.clear()
+        log.warning(f"⛔ {self.name} circuit open for {self.cooldown:.0f}s "
+                    f"(latency {self.latency * 1000:.0f}ms)")
+
+    def stats(self):
+        return {"state": self.current_state(), "latency_ms": round(self.latency * 1000, 1),
+                "requests": self.requests, "failures": self.failures,
+                "rejected": self.rejected, "opens": self.opens}
+
+
+class WorkerFleet:
+    """The heartbeats server.py workers publish under ``worker:*``.
+
+    ``watch`` re-reads them every ``interval`` seconds, so admission stays
+    synchronous. A worker that stops publishing drops out when its key
+    expires. If the store cannot be read the snapshot is emptied, and calls
+    are refused until the fleet is visible again.
+    """
+
+    def __init__(self, store, interval=5.0):
+        self.store = store
+        self.interval = interval
+        self.workers = {}  # worker id -> last heartbeat
+
+    async def refresh(self):
+        try:
+            nodes = await self.store.scan("worker:")
+        except Exception as e:
+            log.warning(f"⚠️ Worker fleet: state store: {e!r}")
+            nodes = {}
+        self.workers = {k[len("worker:"):]: w for k, w in nodes.items()}
+
+    async def watch(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def active_calls(self):
+        return sum(w["active_calls"] for w in self.workers.values())
+
+    def accepting(self):
+        return [k for k, w in self.workers.items() if w["stats"]["capacity"]["accepting"]]
+
+    def stats(self):
+        return {"workers": len(self.workers), "accepting": len(self.accepting()),
+                "active_calls": self.active_calls()}
+
+
+class CapacityManager:
+    def __init__(self, upstreams, active_calls, max_calls, loop_monitor=None,
+                 max_utilization=0.9, max_loop_lag=0.25, probe_call_sec=5.0, fleet=None):
+        """``active_calls`` is a callable returning the live call count ``max_calls`` caps.
+
+        While a vendor's breaker is half-open, one call per ``probe_call_sec``
+        is admitted; its requests are the probes that close the breaker again.
+        ``fleet`` is the ``WorkerFleet`` that takes the calls, if not this process.
+        """
+        self.upstreams = list(upstreams)
+        self.active_calls = active_calls
+        self.max_calls = max_calls
+        self.loop_monitor = loop_monitor
+        self.max_utilization = max_utilization
+        self.max_loop_lag = max_loop_lag
+        self.probe_call_sec = probe_call_sec
+        self.fleet = fleet
+        self.refused = {}  # reason -> count
+        self._probe_calls = {}  # upstream name -> when the last probe call was admitted
+
+    def _refusal(self, probing):
+        if self.active_calls() >= self.max_calls:
+            return "max calls"
+        if self.fleet is not None and not self.fleet.accepting():
+            return "no worker accepting"
+        now = time.monotonic()
+        for u in self.upstreams:
+            state = u.breaker.current_state()
+            if state == HALF_OPEN and now - self._probe_calls.get(u.name, float("-inf")) >= self.probe_call_sec:
+                probing.append(u.name)
+            elif state != CLOSED:
+                return f"{u.name} circuit {state}"
+            if u.waiting or u.in_flight >= self.max_utilization * u.max_concurrency:
+                return f"{u.name} saturated"
+        if self.loop_monitor is not None and self.loop_monitor.last_lag > self.max_loop_lag:
+            return "event loop lagging"
+        return None
+
+    def check(self):
+        """None if another call can be taken, else the reason it cannot."""
+        return self._refusal([])
+
+    def admit(self):
+        """``check``, counting refusals by reason and the probe calls let through."""
+        probing = []
+        reason = self._refusal(probing)
+        if reason is not None:
+            self.refused[reason] = self.refused.get(reason, 0) + 1
+            return reason
+        now = time.monotonic()
+        for name in probing:
+            self._probe_calls[name] = now
+        return None
+
+    def stats(self):
+        reason = self.check()
+        out = {"accepting": reason is None, "reason": reason,
+               "active_calls": self.active_calls(), "max_calls": self.max_calls,
+               "refused": self.refused,
+               "breakers": {u.name: u.breaker.stats() for u in self.upstreams}}
+        if self.fleet is not None:
+            out["fleet"] = self.fleet.stats()
+        return out
@@ -0,0 +1,159 @@
+"""G.711 μ-law/A-law codecs and an 8k↔16k polyphase resampler.
+
+Decoding is a lookup in a 256-entry int16 table indexed by the payload bytes;
+encoding is a lookup in a 65536-entry table indexed by the raw 16-bit sample.
+Both run as a single NumPy fancy-index over the whole packet. ``Resampler``
+converts between the 8 kHz telephony leg and the 16 kHz STT/TTS pipeline with
+a windowed-sinc FIR split into two polyphase branches, carrying filter state
+across frames so packet boundaries are seamless.
+"""
+import numpy as np
+
+ULAW_BIAS = 0x84
+ULAW_CLIP = 32635  # largest magnitude before the bias would overflow 15 bits
+
+
+def _ulaw_decode_table():
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    magnitude = (((mantissa << 3) + ULAW_BIAS) << exponent) - ULAW_BIAS
+    return np.where(u & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+def _alaw_decode_table():
+    a = np.arange(256, dtype=np.int32) ^ 0x55
+    exponent = (a >> 4) & 0x07
+    mantissa = a & 0x0F
+    magnitude = np.where(exponent == 0, (mantissa << 4) + 8,
+                         ((mantissa << 4) + 0x108) << np.maximum(exponent - 1, 0))
+    return np.where(a & 0x80, magnitude, -magnitude).astype(np.int16)
+
+
+def _ulaw_encode_table():
+    # Sun/ITU reference: work on the 14-bit magnitude, find the segment.
+    x = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(x < 0, 0x7F, 0xFF)
+    mag = np.minimum(np.abs(x), ULAW_CLIP >> 2) + (ULAW_BIAS >> 2)
+    seg = np.searchsorted(np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF]), mag)
+    code = np.where(seg >= 8, 0x7F, (seg << 4) | ((mag >> (np.minimum(seg, 7) + 1)) & 0x0F))
+    return (code ^ mask).astype(np.uint8)
+
+
+def _alaw_encode_table():
+    x = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 3
+    mask = np.where(x >= 0, 0xD5, 0x55)
+    mag = np.where(x >= 0, x, -x - 1)
+    seg = np.searchsorted(np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF]), mag)
+    shift = np.where(seg < 2, 1, np.minimum(seg, 7))
+    code = np.where(seg >= 8, 0x7F, (seg << 4) | ((mag >> shift) & 0x0F))
+    return (code ^ mask).astype(np.uint8)
+
+
+ULAW_DECODE = _ulaw_decode_table()
+ALAW_DECODE = _alaw_decode_table()
+ULAW_ENCODE = _ulaw_encode_table()
+ALAW_ENCODE = _alaw_encode_table()
+
+
+def _codes(payload):
+    return np.frombuffer(payload, dtype=np.uint8)
+
+
+def _pcm(pcm):
+    return np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2).view(np.uint16)
+
+
+def ulaw_decode(payload):
+    """μ-law bytes → 16-bit little-endian PCM bytes."""
+    return ULAW_DECODE[_codes(payload)].tobytes()
+
+
+def alaw_decode(payload):
+    return ALAW_DECODE[_codes(payload)].tobytes()
+
+
+def ulaw_encode(pcm):
+    """16-bit little-endian PCM → μ-law bytes."""
+    return ULAW_ENCODE[_pcm(pcm)].tobytes()
+
+
+def alaw_encode(pcm):
+    return ALAW_ENCODE[_pcm(pcm)].tobytes()
+
+
+def lowpass(taps, cutoff):
+    """Hamming-windowed sinc; ``cutoff`` in cycles/sample, unity DC gain."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return h / h.sum()
+
+
+class Resampler:
+    """Stateful 2x up- or down-sampler for 16-bit mono PCM (8k↔16k)."""
+
+    def __init__(self, src_rate, dst_rate, taps=33):
+        if {src_rate, dst_rate} != {8000, 16000}:
+            raise ValueError(f"unsupported conversion {src_rate} -> {dst_rate}")
+        self.up = dst_rate > src_rate
+        # Pass band up to 3.6 kHz, stop band from 4 kHz, at the 16 kHz rate.
+        # An odd tap count whose delay (taps - 1) / 2 is even keeps the group
+        # delay a whole sample at both rates; pad to even for two branches.
+        h = lowpass(taps, 3600 / 16000) * (2 if self.up else 1)
+        h = np.append(h, np.zeros(len(h) % 2))
+        self.h0, self.h1 = h[0::2], h[1::2]
+        k = len(self.h0)
+        if self.up:
+            self._hist = np.zeros(k - 1)
+        else:
+            self._hist_even = np.zeros(k - 1)
+            self._hist_odd = np.zeros(k)
+            self._carry = np.zeros(0)
+
+    def process(self, pcm):
+        x = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2).astype(np.float64)
+        y = self._up(x) if self.up else self._down(x)
+        return np.clip(np.rint(y), -32768, 32767).astype("<i2").tobytes()
+
+    def _up(self, x):
+        if not len(x):
+            return x  # np.convolve "valid" would swap its arguments
+        ext = np.concatenate((self._hist, x))
+        self._hist = ext[len(ext) - len(self._hist):]
+        y = np.empty(2 * len(x))
+        y[0::2] = np.convolve(ext, self.h0, "valid")
+        y[1::2] = np.convolve(ext, self.h1, "valid")
+        return y
+
+    def _down(self, x):
+        if len(self._carry):
+            x = np.concatenate((self._carry, x))
+        usable = len(x) & ~1
+        self._carry = x[usable:]
+        x = x[:usable]
+        if not usable:
+            return x  # a lone sample waits in the carry
+        even = np.concatenate((self._hist_even, x[0::2]))
+        odd = np.concatenate((self._hist_odd, x[1::2]))
+        self._hist_even = even[len(even) - len(self._hist_even):]
+        self._hist_odd = odd[len(odd) - len(self._hist_odd):]
+        return np.convolve(even, self.h0, "valid") + np.convolve(odd[:-1], self.h1, "valid")
+
+
+class CallCodec:
+    """Per-call bridge between a G.711/PCM 8 kHz leg and the 16 kHz pipeline."""
+
+    def __init__(self, law="ulaw"):
+        self.law = law
+        self._decode = {"ulaw": ulaw_decode, "alaw": alaw_decode, "pcm": bytes}[law]
+        self._encode = {"ulaw": ulaw_encode, "alaw": alaw_encode, "pcm": bytes}[law]
+        self._up = Resampler(8000, 16000)
+        self._down = Resampler(16000, 8000)
+
+    def inbound(self, payload):
+        """Telephony payload → 16 kHz PCM."""
+        return self._up.process(self._decode(payload))
+
+    def outbound(self, pcm16k):
+        """16 kHz PCM → telephony payload."""
+        return self._encode(self._down.process(pcm16k))
@@ -1,23 +1,40 @@
 import os
 import json
 import base64
+import asyncio
 import logging
-import tempfile
-import wave
-import requests
-import g711  # pip install g711
+import socket
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
 from typing import Optional, Dict, Any
-from fastapi import FastAPI, WebSocket, Request, Response
+from fastapi import FastAPI, WebSocket, Request, Response, UploadFile, File
 from fastapi.websockets import WebSocketDisconnect
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from audio_buffer import UtteranceBuffer
+import http_client
+from capacity import CapacityManager, WorkerFleet
+from loop_monitor import LoopLagMonitor
+from audio_encoding import wav_upload
+from codec import ulaw_decode
+from campaign import CampaignManager
+from state_store import open_store
+from tts_cache import TTSCache, disk_tier
+from pitch import PitchRenderer
+from intents import IntentEngine
+from router import FAQIndex, ResponseRouter
+from llm_service import get_llm_client
+import tts_api
 
 # --- Configuration ---
 load_dotenv()
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
 PUBLIC_HOSTNAME = os.getenv("PUBLIC_HOSTNAME")  # e.g. "ai-calling-somil.onrender.com"
+# Host of the server.py workers that take the calls; its /exoml hands
+# Exotel the pitch for each campaign row. Defaults to PUBLIC_HOSTNAME.
+VOICEBOT_HOSTNAME = os.getenv("VOICEBOT_HOSTNAME")
 
 # Exotel Credentials (load from env for security)
 EXOTEL_SID = os.getenv("EXOTEL_SID")
@@ -26,11 +43,57 @@ EXOTEL_API_TOKEN = os.getenv("EXOTEL_API_TOKEN")
 EXOTEL_SUBDOMAIN = os.getenv("EXOTEL_SUBDOMAIN", "api.exotel.com")
 EXOTEL_FROM_NUMBER = os.getenv("EXOTEL_FROM_NUMBER")
 
+# Hard cap on buffered caller audio per utterance
+MAX_UTTERANCE_SEC = 15
+
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", 50))
+
+# Bulk campaigns: pacing is global, the active-call cap is sized to the
+# fleet of /ws workers that will take the calls.
+CAMPAIGN_DIR = os.getenv("CAMPAIGN_DIR", ".campaigns")
+CAMPAIGN_CPS = float(os.getenv("CAMPAIGN_CPS", 1))
+CAMPAIGN_MAX_ACTIVE_CALLS = int(os.getenv("CAMPAIGN_MAX_ACTIVE_CALLS", 50))
+# Campaign progress, shared by every worker process; see state_store.py
+STATE_STORE = os.getenv("STATE_STORE", f"sqlite:///{CAMPAIGN_DIR}/state.db")
+# Live calls past which /dial and campaigns stop placing more. With
+# VOICEBOT_HOSTNAME set these are the calls on every server.py worker.
+MAX_CALLS = int(os.getenv("MAX_CALLS", CAMPAIGN_MAX_ACTIVE_CALLS))
+# Shared with server.py, which plays the pitches pre-rendered into its
+# pitch tier; TTS_CACHE_DISK_MB is for the whole dir (tts_cache.DISK_SHARES)
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")
+TTS_CACHE_DISK_MB = int(os.getenv("TTS_CACHE_DISK_MB", 512))
+
+# Shared settings for dialer.py
+settings = SimpleNamespace(
+    exotel_account_sid=EXOTEL_SID,
+    exotel_api_key=EXOTEL_API_KEY,
+    exotel_api_token=EXOTEL_API_TOKEN,
+    exotel_subdomain=EXOTEL_SUBDOMAIN,
+    public_hostname=PUBLIC_HOSTNAME,
+)
+
 # Setup Logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
 logger = logging.getLogger("voicebot")
 
-app = FastAPI()
+loop_monitor = LoopLagMonitor(threshold=LOOP_LAG_THRESHOLD_MS / 1000)
+
+@asynccontextmanager
+async def lifespan(app):
+    loop_monitor.start()
+    fleet_watch = asyncio.create_task(fleet.watch()) if fleet is not None else None
+    llm_load = asyncio.create_task(load_llm())
+    campaigns.start()
+    yield
+    llm_load.cancel()
+    await campaigns.stop_all()
+    if fleet_watch is not None:
+        fleet_watch.cancel()
+    await store.close()
+    loop_monitor.stop()
+    await http_client.close_all()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -50,14 +113,16 @@ class DialRequest(BaseModel):
 
 # --- Helper Functions ---
 
-def generate_sarvam_tts(text: str) -> str:
+sarvam = http_client.upstream("sarvam")
+exotel = http_client.upstream("exotel")
+
+async def generate_sarvam_tts(text: str) -> str:
     """Generates TTS audio from Sarvam and returns Base64 string."""
     if not SARVAM_API_KEY:
         logger.error("❌ Sarvam API Key missing")
         return None
 
-    url = "https://api.sarvam.ai/text-to-speech"
-    headers = {"api-subscription-key": SARVAM_API_KEY, "Content-Type": "application/json"}
+    headers = {"api-subscription-key": SARVAM_API_KEY}
     payload = {
         "inputs": [text],
         "target_language_code": "en-IN",
@@ -67,7 +132,7 @@ def generate_sarvam_tts(text: str) -> str:
     }
     try:
         logger.info(f"🗣️ TTS: '{text}'")
-        resp = requests.post(url, headers=headers, json=payload, timeout=5)
+        resp = await sarvam.post("/text-to-speech", headers=headers, json=payload, timeout=5)
         resp.raise_for_status()
         data = resp.json()
         if "audios" in data and len(data["audios"]) > 0:
@@ -76,27 +141,15 @@ def generate_sarvam_tts(text: str) -> str:
         logger.error(f"❌ TTS Error: {e}")
     return None
 
-def transcribe_sarvam_stt(audio_bytes: bytes) -> str:
-    """Saves raw PCM bytes to WAV and uploads to Sarvam STT."""
+async def transcribe_sarvam_stt(audio_bytes: bytes) -> str:
+    """Uploads raw 8 kHz PCM to Sarvam STT as an in-memory WAV."""
     if not SARVAM_API_KEY or not audio_bytes:
         return ""
 
-    tmp_filename = None
     try:
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_wav:
-            tmp_filename = tmp_wav.name
-            with wave.open(tmp_filename, "wb") as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)
-                wf.setframerate(8000)
-                wf.writeframes(audio_bytes)
-
-        url = "https://api.sarvam.ai/speech-to-text"
-        headers = {"api-subscription-key": SARVAM_API_KEY}
-        with open(tmp_filename, "rb") as f:
-            files = {'file': ('audio.wav', f, 'audio/wav')}
-            data = {"model": "saarika:v1", "language_code": "en-IN"}
-            resp = requests.post(url, headers=headers, files=files, data=data, timeout=8)
+        body = wav_upload(audio_bytes, 8000, {"model": "saarika:v1", "language_code": "en-IN"})
+        headers = {"api-subscription-key": SARVAM_API_KEY, **body.headers}
+        resp = await sarvam.post("/speech-to-text", headers=headers, content=body, timeout=8)
             
         if resp.status_code == 200:
             return resp.json().get("transcript", "").strip()
@@ -106,9 +159,83 @@ def transcribe_sarvam_stt(audio_bytes: bytes) -> str:
     except Exception as e:
         logger.error(f"❌ STT Exception: {e}")
         return ""
-    finally:
-        if tmp_filename and os.path.exists(tmp_filename):
-            os.remove(tmp_filename)
+
+def public_url(host=None):
+    host = host or PUBLIC_HOSTNAME or "ai-calling-somil.onrender.com"
+    return host if host.startswith("http") else f"https://{host}"
+
+async def place_call(to: str, from_: Optional[str] = None, exoml_url: Optional[str] = None,
+                     custom_field: Optional[str] = None) -> Dict[str, Any]:
+    """Asks Exotel to connect ``to``; raises httpx.HTTPStatusError on rejection."""
+    url = f"/v1/Accounts/{EXOTEL_SID}/Calls/connect.json"
+    payload = {
+        "From": from_ or EXOTEL_FROM_NUMBER,
+        "To": to,
+        "Url": exoml_url or f"{public_url(VOICEBOT_HOSTNAME)}/exoml",
+        "CallType": "trans",
+        "StatusCallback": f"{public_url()}/call-status",
+    }
+    if custom_field:
+        payload["CustomField"] = custom_field
+    resp = await exotel.post(url, data=payload, auth=(EXOTEL_API_KEY, EXOTEL_API_TOKEN), idempotent=False)
+    resp.raise_for_status()
+    return resp.json()
+
+async def dial_campaign_row(number: str, row: Dict[str, str]) -> Optional[str]:
+    """Dials one campaign row; its pitch and slot values ride along as CustomField JSON."""
+    data = await place_call(number, custom_field=json.dumps(row) if row else None)
+    return data.get("Call", {}).get("Sid")
+
+pitch_dir, pitch_disk_bytes = disk_tier(TTS_CACHE_DIR, "pitch", TTS_CACHE_DISK_MB * 2**20)
+pitch_renderer = PitchRenderer(TTSCache(pitch_dir, max_disk_bytes=pitch_disk_bytes),
+                               tts_api.tts_key, tts_api.tts)
+
+async def prerender_rows(rows):
+    await pitch_renderer.prerender([(row["pitch"], row) for row in rows if row.get("pitch")])
+
+live_calls = set()
+store = open_store(STATE_STORE)
+# Calls dialed for VOICEBOT_HOSTNAME run on the server.py workers, so admit
+# on the live calls and accepting flags they publish; otherwise they land on
+# this process's demo socket.
+fleet = WorkerFleet(store) if VOICEBOT_HOSTNAME else None
+capacity = CapacityManager([sarvam, exotel],
+                           lambda: len(live_calls) + (fleet.active_calls() if fleet is not None else 0),
+                           MAX_CALLS, loop_monitor, fleet=fleet)
+campaigns = CampaignManager(store, f"{socket.gethostname()}:{os.getpid()}", CAMPAIGN_DIR,
+                            dial_campaign_row, cps=CAMPAIGN_CPS,
+                            max_active=CAMPAIGN_MAX_ACTIVE_CALLS, prerender=prerender_rows,
+                            admit=capacity.admit)
+
+faq_index = FAQIndex.from_file()
+router = ResponseRouter(IntentEngine.from_file(), faq_index, llm_deadline=1.5)
+
+async def load_llm():
+    """Build the LLM client in a thread (it imports google.genai) without holding up startup.
+
+    Until it is in place the router skips the LLM tier and falls back.
+    """
+    try:
+        router.llm = await asyncio.to_thread(get_llm_client)
+        logger.info("🧠 LLM client loaded")
+    except Exception as e:
+        logger.error(f"❌ LLM client not loaded, replies skip the LLM tier: {e!r}")
+
+DEMO_REPLIES = {
+    "YES": "Great! An agent will call you soon.",
+    "NO": "Goodbye!",
+    "DONE": "Goodbye!",
+}
+
+async def demo_reply(user_text: str, call_id: str) -> str:
+    route = await router.route(user_text, call_id)
+    logger.info(f"🧭 intent={route.intent} tier={route.tier}")
+    if route.intent == "FAQ":
+        return faq_index.answers[route.meta]
+    if route.intent == "LLM":
+        # One TTS request for the demo, so wait for the whole reply.
+        return " ".join([route.text, *[s async for s in route.text.rest]])
+    return DEMO_REPLIES.get(route.intent, "I heard you, but I am just a demo bot.")
 
 # --- Routes ---
 
@@ -116,6 +243,11 @@ def transcribe_sarvam_stt(audio_bytes: bytes) -> str:
 async def health():
     return {"status": "ok", "service": "sarvam-exotel-voicebot-v2"}
 
+@app.get("/stats")
+async def stats():
+    return {"loop_lag": loop_monitor.stats(), "upstreams": http_client.stats(), "router": router.stats(),
+            "capacity": capacity.stats()}
+
 @app.get("/exoml")
 @app.post("/exoml")
 async def get_exoml(request: Request):
@@ -139,46 +271,62 @@ async def dial(request: DialRequest):
     """Triggers the call via Exotel API."""
     if not (EXOTEL_SID and EXOTEL_API_KEY and EXOTEL_API_TOKEN):
         return JSONResponse({"error": "Exotel credentials missing in env"}, status_code=500)
+    busy = capacity.admit()
+    if busy is not None:
+        logger.warning(f"⏸ Not dialing {request.to}: {busy}")
+        return JSONResponse({"status": "busy", "reason": busy}, status_code=503, headers={"Retry-After": "5"})
 
-    url = f"https://{EXOTEL_API_KEY}:{EXOTEL_API_TOKEN}@{EXOTEL_SUBDOMAIN}/v1/Accounts/{EXOTEL_SID}/Calls/connect.json"
-    
-    # Auto-detect callback URL
-    host = PUBLIC_HOSTNAME or "ai-calling-somil.onrender.com"
-    if not host.startswith("http"):
-        host = f"https://{host}"
-    
-    callback_url = request.exoml_url or f"{host}/exoml"
-
-    payload = {
-        "From": request.from_ or EXOTEL_FROM_NUMBER,
-        "To": request.to,
-        "Url": callback_url,
-        "CallType": "trans"
-    }
-    
     logger.info(f"📞 Dialing {request.to}...")
     try:
-        resp = requests.post(url, data=payload)
-        resp.raise_for_status()
-        return {"status": "success", "exotel": resp.json()}
+        return {"status": "success", "exotel": await place_call(request.to, request.from_, request.exoml_url)}
     except Exception as e:
         logger.error(f"Dial Failed: {e}")
         return JSONResponse({"status": "error", "details": str(e)}, status_code=500)
 
+@app.post("/upload-csv")
+async def upload_csv(file: UploadFile = File(...)):
+    """Starts a campaign dialing every ``phone_number,pitch`` row of the upload."""
+    if not (EXOTEL_SID and EXOTEL_API_KEY and EXOTEL_API_TOKEN):
+        return JSONResponse({"error": "Exotel credentials missing in env"}, status_code=500)
+    campaign = await campaigns.create(file.file)
+    logger.info(f"📣 Campaign {campaign.id} created from {file.filename}")
+    return {"status": "started", "campaign": campaign.stats()}
+
+@app.get("/campaigns/{campaign_id}")
+async def campaign_status(campaign_id: str):
+    status = await campaigns.status(campaign_id)
+    if status is None:
+        return JSONResponse({"error": "unknown campaign"}, status_code=404)
+    return status
+
+@app.post("/call-status")
+async def call_status(request: Request):
+    """Exotel StatusCallback: frees the campaign slot of a finished call."""
+    form = await request.form()
+    if form.get("CallSid"):
+        await campaigns.call_ended(form["CallSid"])
+    return {"status": "ok"}
+
 # --- WebSocket ---
 
 @app.websocket("/ws")
 async def ws_handler(ws: WebSocket):
     await ws.accept()
     logger.info("✅ WS Connected")
+    call_id = f"ws-{id(ws)}"
+    live_calls.add(call_id)
     
-    # Initial Greeting
+    # Initial Greeting (in the background, so caller audio is read meanwhile)
     greeting = "Namaste. I am your Rupeek assistant. How can I help you today?"
-    audio_b64 = generate_sarvam_tts(greeting)
-    if audio_b64:
-        await ws.send_json({"event": "media", "media": {"payload": audio_b64, "content_type": "audio/wav"}})
 
-    audio_buffer = bytearray()
+    async def greet():
+        audio_b64 = await generate_sarvam_tts(greeting)
+        if audio_b64:
+            await ws.send_json({"event": "media", "media": {"payload": audio_b64, "content_type": "audio/wav"}})
+
+    greet_task = asyncio.create_task(greet())
+
+    audio_buffer = UtteranceBuffer(MAX_UTTERANCE_SEC * 8000 * 2)
     chunk_count = 0
     BUFFER_LIMIT = 80 # ~1.5 seconds
 
@@ -191,36 +339,25 @@ async def ws_handler(ws: WebSocket):
             if event_type == "media":
                 # Decode & Convert
                 payload = base64.b64decode(data['media']['payload'])
-                pcm_chunk = g711.decode_ulaw(payload)
-                audio_buffer.extend(pcm_chunk)
+                pcm_chunk = ulaw_decode(payload)
+                audio_buffer.append(pcm_chunk)
                 chunk_count += 1
                 
-                if chunk_count >= BUFFER_LIMIT:
+                if chunk_count >= BUFFER_LIMIT or audio_buffer.full:
                     logger.info("⏳ Processing Speech...")
                     await ws.send_json({"event": "clear"}) # Stop playback to listen
                     
-                    user_text = transcribe_sarvam_stt(bytes(audio_buffer))
+                    user_text = await transcribe_sarvam_stt(audio_buffer.view())
                     logger.info(f"🎤 User: {user_text}")
                     
                     if user_text:
-                        # Simple Logic
-                        reply = ""
-                        ut = user_text.lower()
-                        if "loan" in ut or "money" in ut:
-                            reply = "We offer gold loans. Are you interested?"
-                        elif "yes" in ut:
-                            reply = "Great! An agent will call you soon."
-                        elif "bye" in ut:
-                            reply = "Goodbye!"
-                        else:
-                            reply = "I heard you, but I am just a demo bot."
-                            
+                        reply = await demo_reply(user_text, call_id)
                         if reply:
-                            tts_audio = generate_sarvam_tts(reply)
+                            tts_audio = await generate_sarvam_tts(reply)
                             if tts_audio:
                                 await ws.send_json({"event": "media", "media": {"payload": tts_audio, "content_type": "audio/wav"}})
                     
-                    audio_buffer = bytearray()
+                    audio_buffer.clear()
                     chunk_count = 0
 
             elif event_type == "stop":
@@ -231,3 +368,8 @@ async def ws_handler(ws: WebSocket):
         logger.info("🔌 WS Disconnected")
     except Exception as e:
         logger.error(f"🔥 WS Error: {e}")
+    finally:
+        greet_task.cancel()
+        live_calls.discard(call_id)
+        if router.llm is not None:
+            router.llm.end_session(call_id)
@@ -1,13 +1,14 @@
-import requests
-from requests.auth import HTTPBasicAuth
+import asyncio
+import httpx
 from config import settings
+import http_client
 import logging
 
 # Initialize logger
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("voicebot")
 
-def make_outbound_call(
+async def make_outbound_call(
     to_number: str,
     from_number: str,
     exoml_url: str
@@ -18,7 +19,7 @@ def make_outbound_call(
     if not (to_number and from_number and exoml_url):
         raise ValueError("to_number, from_number, and exoml_url are required")
 
-    url = f"https://{settings.exotel_subdomain}/v1/Accounts/{settings.exotel_account_sid}/Calls/connect.json"
+    url = f"/v1/Accounts/{settings.exotel_account_sid}/Calls/connect.json"
     
     payload = {
         "From": to_number,        # The customer number
@@ -29,14 +30,14 @@ def make_outbound_call(
     log.info(f"Initiating Exotel call: URL={url}, Payload={payload}")
 
     try:
-        resp = requests.post(
+        resp = await http_client.upstream("exotel").post(
             url,
             data=payload,
-            auth=HTTPBasicAuth(settings.exotel_api_key, settings.exotel_api_token),
-            timeout=20,
+            auth=httpx.BasicAuth(settings.exotel_api_key, settings.exotel_api_token),
+            idempotent=False,
         )
         
-        if not resp.ok:
+        if not resp.is_success:
             error_msg = f"❌ EXOTEL ERROR: {resp.status_code} - {resp.text}"
             log.error(error_msg)
             print(error_msg)
@@ -66,7 +67,7 @@ if __name__ == "__main__":
     print(f"🔗 Flow URL: {FLOW_URL}")
     
     try:
-        response = make_outbound_call(CUSTOMER_NUMBER, EXOPHONE_NUMBER, FLOW_URL)
+        response = asyncio.run(make_outbound_call(CUSTOMER_NUMBER, EXOPHONE_NUMBER, FLOW_URL))
         print(f"\n✅ SUCCESS! Call SID: {response.get('Call', {}).get('Sid')}")
         print("Call initiated. Exotel will now hit your Render app at /exotel/voicebot")
     except Exception as e:
@@ -0,0 +1,200 @@
+"""Declarative call flow compiled to a (phase, intent) transition table.
+
+The flow is data (``dialogue.json``): the prompts, the phases with the lines
+spoken on entering each, and per phase a map from intent to transition.
+``Dialogue`` resolves every prompt name and phase reference once at load
+and fills a flat table with one cell for every (phase, intent) pair. That
+includes the fallbacks from ``any`` and ``UNKNOWN``. A turn is then two
+lookups: the intent's column, then ``table[phase * width + column]``.
+
+A call's position lives in a ``CallState``, a ``__slots__`` object of a few
+numbers. Callers that keep more per-call fields subclass it with their own
+``__slots__``.
+"""
+import json
+import os
+import time
+
+DIALOGUE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dialogue.json")
+
+UNKNOWN = "UNKNOWN"
+FAQ_ANSWER = "$faq"
+LLM_REPLY = "$reply"
+ACTIONS = ("confused",)
+
+
+class Transition:
+    __slots__ = ("say", "to", "end", "confused", "dynamic")
+
+    def __init__(self, say=(), to=None, end=False, confused=False):
+        self.say = tuple(say)
+        self.to = to
+        self.end = end
+        self.confused = confused
+        self.dynamic = FAQ_ANSWER in self.say or LLM_REPLY in self.say
+
+
+class CallState:
+    __slots__ = ("phase", "failures", "last_fail", "handoff_asked")
+
+    def __init__(self, phase=0):
+        self.phase = phase
+        self.failures = 0
+        self.last_fail = float("-inf")
+        self.handoff_asked = False
+
+
+class Dialogue:
+    def __init__(self, spec, faqs=None):
+        """``faqs`` maps FAQ keys to the answers spoken for ``$faq``."""
+        self.faqs = dict(faqs or {})
+        self.prompts = dict(spec["prompts"])
+        phases = spec["phases"]
+        self.phases = list(phases)
+        self._phase_ids = {name: i for i, name in enumerate(self.phases)}
+        self.start = self._phase_id(spec.get("start", self.phases[0]))
+
+        confusion = spec.get("confusion", {})
+        self.max_confusion = confusion.get("max", 3)
+        self.cooldown = float(confusion.get("cooldown_sec", 8))
+        self.fallback = self._prompt(confusion.get("prompt", "FALLBACK"))
+        self.offer = self._prompt(confusion.get("offer", "HANDOFF_OFFER"))
+
+        shared = spec.get("any", {})
+        reset = set(spec.get("reset", ()))
+        names = {UNKNOWN, *shared, *reset}
+        for phase in phases.values():
+            names.update(phase.get("on", {}))
+        self.intents = sorted(names)
+        self.columns = {name: i for i, name in enumerate(self.intents)}
+        self.width = len(self.intents)
+        self.unknown = self.columns[UNKNOWN]
+        self.resets = bytes(name in reset for name in self.intents)
+
+        self.entry = [self._say(p.get("say", ()), name) for name, p in phases.items()]
+        compiled_shared = {intent: self._transition(t, phases) for intent, t in shared.items()}
+        self.table = []
+        self.reachable = []
+        for name, phase in phases.items():
+            on = {intent: self._transition(t, phases) for intent, t in phase.get("on", {}).items()}
+            default = on.get(UNKNOWN) or compiled_shared.get(UNKNOWN) or Transition(confused=True)
+            self.table.extend(on.get(i) or compiled_shared.get(i) or default for i in self.intents)
+            self.reachable.append(self._reachable(on.values(), compiled_shared.values()))
+
+    @classmethod
+    def from_file(cls, path=DIALOGUE_FILE, faqs=None):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), faqs)
+
+    def _phase_id(self, name):
+        if name not in self._phase_ids:
+            raise ValueError(f"unknown phase {name!r} in dialogue")
+        return self._phase_ids[name]
+
+    def _prompt(self, name):
+        if name not in self.prompts:
+            raise ValueError(f"unknown prompt {name!r} in dialogue")
+        return self.prompts[name]
+
+    def _say(self, names, where):
+        if isinstance(names, str):
+            raise ValueError(f"'say' in {where} must be a list of prompt names")
+        return tuple(n if n in (FAQ_ANSWER, LLM_REPLY) else self._prompt(n) for n in names)
+
+    def _transition(self, spec, phases):
+        if isinstance(spec, str):
+            spec = {"to": spec}
+        action = spec.get("action")
+        if action is not None and action not in ACTIONS:
+            raise ValueError(f"unknown action {action!r} in dialogue")
+        to = self._phase_id(spec["to"]) if "to" in spec else None
+        if "say" in spec:
+            say = self._say(spec["say"], spec)
+        else:
+            say = self.entry[to] if to is not None else ()
+        end = spec.get("end", phases[spec["to"]].get("end", False) if to is not None else False)
+        return Transition(say, to, end, action == "confused")
+
+    def _reachable(self, own, shared):
+        texts = []
+        for t in (*own, *shared):
+            for s in t.say:
+                if s == FAQ_ANSWER:
+                    texts.extend(self.faqs.values())
+                elif s != LLM_REPLY:
+                    texts.append(s)
+            if t.confused:
+                texts += [self.fallback, self.offer]
+        return tuple(dict.fromkeys(texts))
+
+    def _cell(self, state, intent):
+        column = self.columns.get(intent, self.unknown)
+        return column, self.table[state.phase * self.width + column]
+
+    def _texts(self, t, meta, reply):
+        if not t.dynamic:
+            return t.say
+        out = []
+        for s in t.say:
+            if s == FAQ_ANSWER:
+                s = self.faqs.get(meta)
+            elif s == LLM_REPLY:
+                s = reply
+            if s:
+                out.append(s)
+        return tuple(out)
+
+    def new_state(self):
+        return CallState(self.start)
+
+    def opening(self):
+        """Lines spoken when a call connects."""
+        return self.entry[self.start]
+
+    def step(self, state, intent, meta=None, reply=None):
+        """Apply one classified turn to ``state``; returns ``(texts, end)``.
+
+        ``meta`` is the FAQ key for ``FAQ`` and ``reply`` the generated text
+        for ``LLM``. ``texts`` is empty when the bot should stay quiet, e.g.
+        on a partial sentence or a repeat miss inside the cooldown.
+        """
+        column = self.columns.get(intent, self.unknown)
+        t = self.table[state.phase * self.width + column]
+        if self.resets[column]:
+            state.failures = 0
+            state.handoff_asked = False
+        if t.confused:
+            return self._confused(state), False
+        if t.to is not None:
+            state.phase = t.to
+        return self._texts(t, meta, reply), t.end
+
+    def _confused(self, state):
+        now = time.monotonic()
+        if now - state.last_fail <= self.cooldown:
+            return ()
+        state.failures += 1
+        state.last_fail = now
+        if state.failures >= self.max_confusion and not state.handoff_asked:
+            state.handoff_asked = True
+            return (self.offer,)
+        return (self.fallback,)
+
+    def peek(self, state, intent, meta=None):
+        """First line ``step`` would say for ``intent``, without changing ``state``."""
+        _, t = self._cell(state, intent)
+        if t.confused:
+            return None
+        texts = self._texts(t, meta, None)
+        return texts[0] if texts else None
+
+    def next_replies(self, state):
+        """Every fixed line reachable from ``state``'s phase, most likely first."""
+        return self.reachable[state.phase]
+
+    def phase_name(self, state):
+        return self.phases[state.phase]
+
+    def script(self):
+        """Every fixed line, for warming the TTS cache."""
+        return list(dict.fromkeys([*self.prompts.values(), *self.faqs.values()]))
@@ -0,0 +1,118 @@
+"""End-of-speech detection on top of the per-frame VAD decision.
+
+``Endpointer`` decides when a caller has finished a turn, so STT runs once
+per real utterance instead of on every quiet second or noise burst:
+
+* An utterance needs ``min_voiced_sec`` of voiced frames. A shorter burst
+  (a cough, a click, line noise) is dropped without an STT request.
+* The trailing silence that ends a turn adapts per caller. It is twice the
+  average pause between words seen so far, clamped to
+  ``[min_silence_sec, max_silence_sec]``. It is longer on a noisy line,
+  where the VAD drops out mid-word more often.
+* The last ``pre_roll_sec`` of audio before the first voiced frame is kept
+  so soft word onsets are not clipped. Pauses inside an utterance are kept
+  too, but trailing silence is not.
+* While nobody speaks, a ``"silence"`` event fires every ``silence_sec``
+  and ``idle_sec`` counts up, so the caller can reprompt locally.
+
+Frames are copied while they wait in ``pending``; ``take`` hands them over.
+"""
+
+START, SPEECH, END, NOISE, SILENCE = "start", "speech", "end", "noise", "silence"
+
+MIN_VOICED_SEC = 0.3
+MIN_SILENCE_SEC = 0.4
+MAX_SILENCE_SEC = 1.0
+PRE_ROLL_SEC = 0.2
+# Gap average a new caller starts from; gives a 0.6 s window
+INITIAL_GAP_SEC = 0.3
+GAP_ALPHA = 0.3
+# A VAD threshold this far above its minimum means a noisy line
+NOISY_RATIO = 1.5
+NOISY_EXTRA_SEC = 0.2
+
+
+class Endpointer:
+    __slots__ = ("vad", "frame_sec", "min_voiced", "min_window", "max_window", "pre_roll",
+                 "silence_frames", "pending", "voiced", "started", "trailing", "idle", "gap")
+
+    def __init__(self, vad, frame_sec, min_voiced_sec=MIN_VOICED_SEC, min_silence_sec=MIN_SILENCE_SEC,
+                 max_silence_sec=MAX_SILENCE_SEC, pre_roll_sec=PRE_ROLL_SEC, silence_sec=1.0):
+        self.vad = vad
+        self.frame_sec = frame_sec
+        self.min_voiced = max(1, round(min_voiced_sec / frame_sec))
+        self.min_window = max(1, round(min_silence_sec / frame_sec))
+        self.max_window = max(self.min_window, round(max_silence_sec / frame_sec))
+        self.pre_roll = round(pre_roll_sec / frame_sec)
+        self.silence_frames = max(1, round(silence_sec / frame_sec))
+        self.gap = INITIAL_GAP_SEC / frame_sec  # average pause between words, in frames
+        self.pending = []
+        self.reset()
+
+    def reset(self):
+        """Forget the utterance in progress and restart the idle clock."""
+        self.pending.clear()
+        self.voiced = 0
+        self.started = False
+        self.trailing = 0
+        self.idle = 0
+
+    @property
+    def window(self):
+        """Quiet frames that end the current utterance."""
+        frames = 2 * self.gap
+        if self.vad.threshold > self.vad.min_threshold * NOISY_RATIO:
+            frames += NOISY_EXTRA_SEC / self.frame_sec
+        return min(self.max_window, max(self.min_window, round(frames)))
+
+    @property
+    def idle_sec(self):
+        return self.idle * self.frame_sec
+
+    def start(self, voiced):
+        """Treat ``voiced`` frames heard elsewhere (a barge-in) as a started utterance."""
+        self.reset()
+        self.voiced = voiced
+        self.started = True
+
+    def take(self):
+        """Frames to add to the utterance, oldest first."""
+        frames, self.pending = self.pending, []
+        return frames
+
+    def push(self, frame, voiced):
+        """Feed one frame and its VAD decision; returns an event or None.
+
+        ``START`` and ``SPEECH`` leave audio to ``take``. ``END`` means the
+        utterance heard so far is complete. ``NOISE`` means it was too short
+        to transcribe. ``SILENCE`` marks another ``silence_sec`` with no
+        speech at all.
+        """
+        if voiced:
+            if self.trailing:
+                self.gap += GAP_ALPHA * (self.trailing - self.gap)
+            self.trailing = 0
+            self.idle = 0
+            self.voiced += 1
+            self.pending.append(bytes(frame))
+            if self.started:
+                return SPEECH
+            if self.voiced >= self.min_voiced:
+                self.started = True
+                return START
+            return None
+
+        if not self.voiced:
+            self.pending.append(bytes(frame))
+            if len(self.pending) > self.pre_roll:
+                del self.pending[0]
+            self.idle += 1
+            return SILENCE if self.idle % self.silence_frames == 0 else None
+
+        self.trailing += 1
+        if self.trailing < self.window:
+            self.pending.append(bytes(frame))
+            return None
+        event = END if self.started else NOISE
+        self.reset()
+        return event
@@ -0,0 +1,164 @@
+"""Outbound /ws media messages, pre-encoded once per cached utterance.
+
+Every caller hears the same scripted sentences, so the wire messages for
+them are built once: the 16 kHz PCM is cut into frames, converted to the
+call's wire encoding, base64-encoded and spliced into a fixed JSON template.
+The result is the exact text ``json.dumps`` would give. Playing a cached
+sentence then costs one ``send_text`` per frame.
+
+``FrameCache`` keeps these ``EncodedAudio`` objects in a byte-bounded LRU.
+It also writes them as ``<digest>.<encoding>.frames`` files, one message
+per line, in the TTS cache's ``frames`` tier, so a restart does not
+re-encode the script. Those files have their own ``DiskBudget``.
+
+``loads`` is the inbound JSON decoder: orjson when installed, else the
+standard library.
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+
+from codec import CallCodec
+from tts_cache import DiskBudget
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+log = logging.getLogger("voicebot")
+
+MEDIA_PREFIX = '{"event": "media", "media": {"payload": "'
+MEDIA_SUFFIX = '"}}'
+
+# Wire encoding → CallCodec law; anything else is sent as 16 kHz PCM.
+CODEC_LAWS = {"ulaw": "ulaw", "alaw": "alaw", "pcm8": "pcm"}
+
+
+def media_message(payload):
+    """``json.dumps`` of a media event carrying ``payload`` bytes, without json."""
+    return MEDIA_PREFIX + base64.b64encode(payload).decode("ascii") + MEDIA_SUFFIX
+
+
+class EncodedAudio:
+    """Ready-to-send media messages for one utterance, each with its play length."""
+
+    __slots__ = ("messages", "frame_sec", "last_sec", "nbytes")
+
+    def __init__(self, messages, frame_sec, last_sec):
+        self.messages = messages
+        self.frame_sec = frame_sec
+        self.last_sec = last_sec
+        self.nbytes = sum(len(m) for m in messages)
+
+    @classmethod
+    def encode(cls, pcm, encoding, frame_bytes, bytes_per_sec):
+        """Frame 16 kHz ``pcm`` the way ``play`` would and encode it for the wire."""
+        pcm = memoryview(pcm).cast("B")
+        law = CODEC_LAWS.get(encoding)
+        codec = CallCodec(law) if law else None
+        messages = []
+        for off in range(0, len(pcm), frame_bytes):
+            frame = pcm[off:off + frame_bytes]
+            messages.append(media_message(codec.outbound(frame) if codec else frame))
+        last = len(pcm) - frame_bytes * (len(messages) - 1) if messages else 0
+        return cls(messages, frame_bytes / bytes_per_sec, last / bytes_per_sec)
+
+    def frames(self):
+        """``(message, seconds)`` pairs, the shape ``play`` iterates."""
+        n = len(self.messages)
+        for i, message in enumerate(self.messages):
+            yield message, self.frame_sec if i + 1 < n else self.last_sec
+
+
+class FrameCache:
+    def __init__(self, cache_dir=None, max_bytes=64 * 1024 * 1024, max_disk_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._mem = OrderedDict()
+        self._mem_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.encoded = 0
+        self._disk = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk = DiskBudget(cache_dir, ".frames", max_disk_bytes)
+
+    def _path(self, key, encoding):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.{encoding}.frames")
+
+    def _remember(self, mkey, audio):
+        old = self._mem.pop(mkey, None)
+        if old is not None:
+            self._mem_bytes -= old.nbytes
+        self._mem[mkey] = audio
+        self._mem_bytes += audio.nbytes
+        while self._mem_bytes > self.max_bytes and len(self._mem) > 1:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= evicted.nbytes
+
+    def _load(self, key, encoding):
+        if not self.cache_dir:
+            return None
+        path = self._path(key, encoding)
+        try:
+            with open(path, encoding="ascii") as f:
+                data = f.read()
+        except (FileNotFoundError, UnicodeDecodeError):
+            return None
+        self._disk.use(path, len(data), touch=True)
+        header, *messages = data.split("\n")
+        frame_sec, last_sec = map(float, header.split())
+        return EncodedAudio(messages, frame_sec, last_sec)
+
+    def _store(self, key, encoding, audio):
+        path = self._path(key, encoding)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="ascii") as f:
+                f.write(f"{audio.frame_sec!r} {audio.last_sec!r}\n")
+                f.write("\n".join(audio.messages))
+            os.replace(tmp, path)
+            self._disk.use(path, os.path.getsize(path))
+        except OSError as e:
+            log.warning(f"⚠️ Frame cache write failed: {e}")
+
+    def get(self, key, encoding, count=True):
+        """Cached ``EncodedAudio`` for a TTS cache ``key`` or None; ``count=False`` for warm-up."""
+        mkey = (key, encoding)
+        audio = self._mem.get(mkey)
+        if audio is not None:
+            self._mem.move_to_end(mkey)
+            self.hits += count
+            return audio
+        audio = self._load(key, encoding)
+        if audio is not None:
+            self.disk_hits += count
+            self._remember(mkey, audio)
+        return audio
+
+    def put(self, key, encoding, pcm, frame_bytes, bytes_per_sec):
+        """Encode ``pcm`` for ``encoding``, remember it and return it.
+
+        The disk copy is written by the caller (``store``), ideally off the
+        event loop.
+        """
+        audio = EncodedAudio.encode(pcm, encoding, frame_bytes, bytes_per_sec)
+        self.encoded += 1
+        self._remember((key, encoding), audio)
+        return audio
+
+    def store(self, key, encoding, audio):
+        if self.cache_dir:
+            self._store(key, encoding, audio)
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "encoded": self.encoded,
+                "entries": len(self._mem), "bytes": self._mem_bytes,
+                "disk": self._disk.stats() if self._disk is not None else None}
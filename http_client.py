@@ -0,0 +1,187 @@
+"""Shared async HTTP layer for every upstream vendor.
+
+One ``Upstream`` per vendor owns a keep-alive ``httpx.AsyncClient`` (HTTP/2
+when the ``h2`` package is installed), a concurrency limit, default timeouts
+and retry with jittered exponential backoff. Call sites go through
+``upstream(name)`` so connections are reused across turns instead of paying
+a TLS handshake per request.
+
+Each upstream also owns a ``capacity.Breaker`` fed with every request's
+latency and outcome. While it is open, requests raise ``CircuitOpen``
+without touching the network.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from capacity import Breaker, CircuitOpen
+
+log = logging.getLogger("voicebot")
+
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Errors raised before the request reached the server; safe to retry even
+# for calls that must not run twice (e.g. placing a phone call).
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class Upstream:
+    def __init__(self, name, base_url, max_connections=32, max_concurrency=16,
+                 timeout=10.0, connect_timeout=3.0, retries=2, backoff=0.2, slow_sec=3.0):
+        self.name = name
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.in_flight = 0
+        self.waiting = 0  # requests queued for a concurrency slot
+        self.breaker = Breaker(name, slow_sec)
+        self._client = None
+        self._sem = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=HTTP2,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections,
+                                    keepalive_expiry=60),
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def _held(self):
+        if not self.breaker.allow():
+            raise CircuitOpen(self.name)
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._sem.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of this upstream's concurrency slots.
+
+        For SDKs that issue their own requests on ``client`` (e.g. Gemini);
+        an exception inside the block counts as a failed request.
+        """
+        async with self._held():
+            t0 = time.perf_counter()
+            try:
+                yield
+            except Exception:
+                self.breaker.record(time.perf_counter() - t0, False)
+                raise
+            self.breaker.record(time.perf_counter() - t0, True)
+
+    async def request(self, method, url, *, idempotent=True, **kwargs):
+        """Send a request, retrying transient failures.
+
+        ``idempotent=False`` restricts retries to connection errors, where the
+        server never saw the request.
+        """
+        retryable = httpx.TransportError if idempotent else CONNECT_ERRORS
+        attempt = 0
+        while True:
+            try:
+                async with self._held():
+                    t0 = time.perf_counter()
+                    try:
+                        resp = await self.client.request(method, url, **kwargs)
+                    except httpx.HTTPError:
+                        self.breaker.record(time.perf_counter() - t0, False)
+                        raise
+                    self.breaker.record(time.perf_counter() - t0, resp.status_code not in RETRY_STATUSES)
+                if not (idempotent and resp.status_code in RETRY_STATUSES) or attempt >= self.retries:
+                    return resp
+                reason = f"HTTP {resp.status_code}"
+            except retryable as e:
+                if attempt >= self.retries:
+                    raise
+                reason = repr(e)
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            attempt += 1
+            log.warning(f"↻ {self.name} retry {attempt}/{self.retries} in {delay:.2f}s ({reason})")
+            await asyncio.sleep(delay)
+
+    async def connect(self, connections=1):
+        """Open ``connections`` pooled connections before the first real request.
+
+        Each is a ``HEAD /`` sent past the breaker and concurrency limit; any
+        response will do, since the point is the TCP and TLS handshake. Raises
+        ``httpx.HTTPError`` if the vendor cannot be reached.
+        """
+        await asyncio.gather(*(self.client.head("/") for _ in range(connections)))
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "waiting": self.waiting, "max_concurrency": self.max_concurrency,
+                "http2": HTTP2, "circuit": self.breaker.current_state(),
+                "latency_ms": round(self.breaker.latency * 1000, 1)}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_UPSTREAMS = {}
+
+
+def _configure():
+    # Read lazily so values from a .env loaded after import still apply.
+    _UPSTREAMS.update({
+        "sarvam": Upstream("sarvam", os.getenv("SARVAM_BASE_URL", "https://api.sarvam.ai"),
+                           max_concurrency=int(os.getenv("SARVAM_MAX_CONCURRENCY", 32)),
+                           slow_sec=float(os.getenv("SARVAM_SLOW_MS", 3000)) / 1000),
+        "exotel": Upstream("exotel", os.getenv("EXOTEL_BASE_URL")
+                           or f"https://{os.getenv('EXOTEL_SUBDOMAIN', 'api.exotel.com')}",
+                           max_concurrency=int(os.getenv("EXOTEL_MAX_CONCURRENCY", 8)), timeout=20.0,
+                           slow_sec=float(os.getenv("EXOTEL_SLOW_MS", 5000)) / 1000),
+        "gemini": Upstream("gemini", "https://generativelanguage.googleapis.com",
+                           max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", 16)), timeout=15.0,
+                           slow_sec=10.0),
+    })
+
+
+def upstream(name):
+    if not _UPSTREAMS:
+        _configure()
+    return _UPSTREAMS[name]
+
+
+def stats():
+    return {name: u.stats() for name, u in _UPSTREAMS.items()}
+
+
+async def connect(names, connections=1):
+    """Pre-open pooled connections to each named upstream."""
+    await asyncio.gather(*(upstream(name).connect(connections) for name in names))
+
+
+async def close_all():
+    await asyncio.gather(*(u.aclose() for u in _UPSTREAMS.values()))
@@ -0,0 +1,59 @@
+"""Keyword intent matcher compiled from a rules file.
+
+Every phrase of every rule goes into one regex alternation with word
+boundaries, longest phrases first, so a single ``finditer`` pass over the
+transcript finds all matches ("no" no longer fires inside "know", and "not
+interested" is not read as "interested"). The highest-priority rule among
+the matches wins; FAQ rules carry the key of their answer.
+"""
+import json
+import os
+import re
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json")
+
+_NON_WORD = re.compile(r"[^a-z0-9']+")
+
+
+def normalize(text):
+    """Lowercase, with punctuation and whitespace runs collapsed to one space."""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+class IntentEngine:
+    def __init__(self, rules):
+        self.results = []
+        self._phrases = {}
+        for prio, rule in enumerate(rules):
+            self.results.append((rule["intent"], rule.get("key")))
+            kind = rule.get("match", "word")
+            if kind not in ("word", "prefix", "exact"):
+                raise ValueError(f"unknown match kind {kind!r} in rule {rule['intent']}")
+            for phrase in rule["phrases"]:
+                self._phrases.setdefault(normalize(phrase), []).append((prio, kind))
+        alternation = "|".join(re.escape(p) for p in sorted(self._phrases, key=len, reverse=True))
+        self._regex = re.compile(rf"\b(?:{alternation})\b")
+
+    @classmethod
+    def from_file(cls, path=RULES_FILE):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["rules"])
+
+    def classify(self, text):
+        """Return ``(intent, faq_key)``; ``faq_key`` is None for non-FAQ intents."""
+        t = normalize(text)
+        if not t:
+            return "EMPTY", None
+        best = None
+        for m in self._regex.finditer(t):
+            for prio, kind in self._phrases[m.group()]:
+                if best is not None and prio >= best:
+                    continue
+                if kind == "prefix" and m.start():
+                    continue
+                if kind == "exact" and (m.start() or m.end() != len(t)):
+                    continue
+                best = prio
+            if best == 0:
+                break
+        return self.results[best] if best is not None else ("UNKNOWN", None)
@@ -1,37 +1,204 @@
-from google import genai
-from config import settings
+"""Gemini replies with per-session history and a reply cache.
+
+``google.genai`` costs a quarter of a second to import, so it is imported
+when the first ``GeminiModel`` is built, and the shared ``GeminiService`` is
+built on first use of ``get_llm_client()`` (or ``llm_client``). Servers do
+that off the event loop during startup; see ``server.py``'s ``/ready``.
+"""
+import asyncio
+import logging
+import os
+import re
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional
+
+from intents import normalize
+import http_client
+
+log = logging.getLogger("voicebot")
+
+SYSTEM_PROMPT = (
+    "You are a helpful voice assistant for Rupeek, a gold loan company. "
+    "Keep your answers short (1-2 sentences) and conversational because you are speaking on the phone. "
+    "Do not use emojis or bullet points."
+)
+
+OFFLINE_REPLY = "I am sorry, my brain is offline."
+ERROR_REPLY = "I am having trouble connecting to the server."
+
+HISTORY_TOKEN_BUDGET = 1024  # prompt tokens of past turns kept per session
+CACHE_SIZE = 256
+CACHE_MIN_WORDS = 3  # shorter replies ("yes", "ok") depend on context; never cached
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+async def stream_sentences(tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Regroup streamed text into whole sentences, e.g. to feed TTS one at a time.
+
+    Closing the result closes ``tokens``.
+    """
+    buf = ""
+    async with aclosing(tokens):
+        async for token in tokens:
+            buf += token
+            *done, buf = _SENTENCE_END.split(buf)
+            for sentence in done:
+                yield sentence
+    if buf.strip():
+        yield buf.strip()
+
+
+class GeminiModel:
+    """Streams completions from Gemini through the shared keep-alive pool."""
+
+    def __init__(self, api_key: str, model_id: str = "gemini-2.0-flash"):
+        from google import genai
+        from google.genai import types
+
+        self.upstream = http_client.upstream("gemini")
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(httpx_async_client=self.upstream.client),
+        )
+        self.model_id = model_id
+        self.config = types.GenerateContentConfig(system_instruction=SYSTEM_PROMPT)
+
+    async def stream(self, contents: List[dict]) -> AsyncIterator[str]:
+        async with self.upstream.slot():
+            chunks = await self.client.aio.models.generate_content_stream(
+                model=self.model_id, contents=contents, config=self.config
+            )
+            async for chunk in chunks:
+                if chunk.text:
+                    yield chunk.text
+
+
+class StubModel:
+    """Offline stand-in for ``GeminiModel``: streams canned replies word by word."""
+
+    def __init__(self, replies: Optional[Dict[str, str]] = None,
+                 default: str = "Sure, I can help with that.", token_delay: float = 0.0):
+        self.replies = {normalize(k): v for k, v in (replies or {}).items()}
+        self.default = default
+        self.token_delay = token_delay
+        self.calls = 0
+
+    async def stream(self, contents: List[dict]) -> AsyncIterator[str]:
+        self.calls += 1
+        text = self.replies.get(normalize(contents[-1]["parts"][0]["text"]), self.default)
+        for i, word in enumerate(text.split(" ")):
+            await asyncio.sleep(self.token_delay)
+            yield word if i == 0 else " " + word
+
 
 class GeminiService:
-    def __init__(self):
-        if settings.gemini_api_key:
-            self.client = genai.Client(api_key=settings.gemini_api_key)
-            self.model_id = "gemini-2.0-flash"  # Fast and efficient
-        else:
-            self.client = None
-            print("❌ Gemini API Key missing!")
-
-    def get_response(self, user_text: str) -> str:
-        if not self.client:
-            return "I am sorry, my brain is offline."
+    def __init__(self, model=None, history_budget: int = HISTORY_TOKEN_BUDGET,
+                 cache_size: int = CACHE_SIZE):
+        api_key = os.getenv("GEMINI_API_KEY")
+        if model is None and api_key:
+            model = GeminiModel(api_key)
+        elif model is None:
+            log.error("❌ Gemini API Key missing!")
+        self.model = model
+        self.history_budget = history_budget
+        self.cache_size = cache_size
+        self._history: Dict[str, List[dict]] = {}
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _trimmed(self, session_id: Optional[str]) -> List[dict]:
+        turns = self._history.get(session_id, [])
+        total = sum(estimate_tokens(t["parts"][0]["text"]) for t in turns)
+        while turns and total > self.history_budget:
+            # Drop the oldest user/model pair together so roles keep alternating.
+            for t in turns[:2]:
+                total -= estimate_tokens(t["parts"][0]["text"])
+            del turns[:2]
+        return turns
+
+    def _remember(self, session_id: Optional[str], user_text: str, reply: str):
+        if session_id is None:
+            return
+        turns = self._history.setdefault(session_id, [])
+        turns.append({"role": "user", "parts": [{"text": user_text}]})
+        turns.append({"role": "model", "parts": [{"text": reply}]})
 
+    def _cache_key(self, user_text: str) -> Optional[str]:
+        key = normalize(user_text)
+        return key if len(key.split()) >= CACHE_MIN_WORDS else None
+
+    async def stream_response(self, user_text: str, session_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the reply as it is generated; ``session_id`` keeps multi-turn history."""
+        if not self.model:
+            yield OFFLINE_REPLY
+            return
+
+        key = self._cache_key(user_text)
+        if key is not None and key in self._cache:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            reply = self._cache[key]
+            self._remember(session_id, user_text, reply)
+            yield reply
+            return
+        self.cache_misses += 1
+
+        contents = [*self._trimmed(session_id), {"role": "user", "parts": [{"text": user_text}]}]
+        parts = []
         try:
-            # Simple single-turn generation for now. 
-            # For multi-turn, you can pass history.
-            prompt = f"""
-            You are a helpful voice assistant for Rupeek, a gold loan company.
-            Keep your answers short (1-2 sentences) and conversational because you are speaking on the phone.
-            Do not use emojis or bullet points.
-            
-            User said: "{user_text}"
-            """
-            
-            response = self.client.models.generate_content(
-                model=self.model_id, 
-                contents=prompt
-            )
-            return response.text
+            async with aclosing(self.model.stream(contents)) as tokens:
+                async for token in tokens:
+                    parts.append(token)
+                    yield token
         except Exception as e:
-            print(f"Gemini Error: {e}")
-            return "I am having trouble connecting to the server."
+            log.error(f"Gemini Error: {e}")
+            if not parts:
+                yield ERROR_REPLY
+            return
+
+        reply = "".join(parts)
+        self._remember(session_id, user_text, reply)
+        if key is not None:
+            self._cache[key] = reply
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def get_response(self, user_text: str, session_id: Optional[str] = None) -> str:
+        return "".join([t async for t in self.stream_response(user_text, session_id)])
+
+    def is_canned(self, reply: str) -> bool:
+        """Whether ``reply`` is a stand-in for a failed generation."""
+        return reply in (OFFLINE_REPLY, ERROR_REPLY)
+
+    def end_session(self, session_id: str):
+        self._history.pop(session_id, None)
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._history), "cache_entries": len(self._cache),
+                "cache_hits": self.cache_hits, "cache_misses": self.cache_misses}
+
+
+_client: Optional[GeminiService] = None
+
+
+def get_llm_client() -> GeminiService:
+    """The process-wide ``GeminiService``, built on first call."""
+    global _client
+    if _client is None:
+        _client = GeminiService()
+    return _client
+
 
-llm_client = GeminiService()
+def __getattr__(name):
+    # ``from llm_service import llm_client`` still works; it builds the client then.
+    if name == "llm_client":
+        return get_llm_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
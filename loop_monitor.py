@@ -0,0 +1,54 @@
+"""Event-loop lag monitor.
+
+A background task sleeps for ``interval`` and measures how late it wakes up.
+Any lateness above ``threshold`` means some coroutine held the loop, and
+every other call on the worker was frozen for that long; those stalls are
+logged and counted so they can be exported.
+"""
+import asyncio
+import logging
+
+log = logging.getLogger("voicebot")
+
+
+class LoopLagMonitor:
+    def __init__(self, interval=0.1, threshold=0.05):
+        self.interval = interval
+        self.threshold = threshold
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.stalled_sec = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - t0 - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.stalls += 1
+                self.stalled_sec += lag
+                log.warning(f"🐢 Event loop stalled for {lag * 1000:.0f}ms")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        return {
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls": self.stalls,
+            "stalled_sec": round(self.stalled_sec, 3),
+            "threshold_ms": self.threshold * 1000,
+        }
@@ -0,0 +1,125 @@
+"""Local stand-in for Redis, covering the commands ``RedisStore`` uses.
+
+Single process, in memory, no persistence: for development and load tests
+of the multi-worker mode, not production.
+
+    python mini_redis.py --port 6379
+"""
+import argparse
+import asyncio
+import fnmatch
+import logging
+import time
+
+log = logging.getLogger("voicebot")
+
+
+class Status(str):
+    """A RESP simple-string reply such as OK."""
+
+
+class MiniRedis:
+    def __init__(self):
+        self.dbs = {}
+
+    def _db(self, conn):
+        return self.dbs.setdefault(conn["db"], {})
+
+    def _get(self, db, key):
+        item = db.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.time():
+            del db[key]
+            return None
+        return item
+
+    def execute(self, conn, args):
+        cmd, args = args[0].upper(), args[1:]
+        db = self._db(conn)
+        if cmd == "PING":
+            return Status("PONG")
+        if cmd == "SELECT":
+            conn["db"] = int(args[0])
+            return Status("OK")
+        if cmd == "GET":
+            item = self._get(db, args[0])
+            return item[0] if item else None
+        if cmd == "MGET":
+            return [(item[0] if (item := self._get(db, k)) else None) for k in args]
+        if cmd == "SET":
+            key, value, opts = args[0], args[1], [a.upper() for a in args[2:]]
+            expires = None
+            for flag, unit in (("PX", 0.001), ("EX", 1.0)):
+                if flag in opts:
+                    expires = time.time() + int(args[2 + opts.index(flag) + 1]) * unit
+            if "NX" in opts and self._get(db, key) is not None:
+                return None
+            db[key] = (value, expires)
+            return Status("OK")
+        if cmd == "DEL":
+            return sum(db.pop(k, None) is not None for k in args)
+        if cmd in ("INCR", "INCRBY"):
+            item = self._get(db, args[0])
+            value = int(item[0] if item else 0) + (int(args[1]) if cmd == "INCRBY" else 1)
+            db[args[0]] = (str(value), item[1] if item else None)
+            return value
+        if cmd in ("SCAN", "KEYS"):
+            pattern = args[args.index("MATCH") + 1] if "MATCH" in args else (args[0] if cmd == "KEYS" else "*")
+            keys = [k for k in list(db) if fnmatch.fnmatchcase(k, pattern) and self._get(db, k)]
+            return ["0", keys] if cmd == "SCAN" else keys
+        if cmd == "FLUSHALL":
+            self.dbs.clear()
+            return Status("OK")
+        return Exception(f"ERR unknown command '{cmd}'")
+
+    @staticmethod
+    def encode(value):
+        if isinstance(value, Exception):
+            return f"-{value}\r\n".encode()
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(MiniRedis.encode(v) for v in value)
+        if isinstance(value, Status):
+            return f"+{value}\r\n".encode()
+        data = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    async def handle(self, reader, writer):
+        conn = {"db": 0}
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:-2])):
+                    n = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(n + 2))[:-2].decode())
+                writer.write(self.encode(self.execute(conn, args)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=6379):
+        server = await asyncio.start_server(self.handle, host, port)
+        log.info(f"🧰 mini redis on {host}:{port}")
+        return server
+
+
+async def _main(host, port):
+    server = await MiniRedis().serve(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    p = argparse.ArgumentParser()
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=6379)
+    args = p.parse_args()
+    asyncio.run(_main(args.host, args.port))
@@ -0,0 +1,148 @@
+"""Pipelined, real-time paced TTS playback.
+
+Text is split into sentences; sentence N+1 is synthesized while sentence N
+is being sent, and outbound frames are released at the audio's own rate
+(plus a small lead) instead of being dumped onto the socket at once. Time to
+first audio therefore tracks the first sentence only.
+
+``synth`` may return raw PCM, cut here into ``frame_bytes`` frames, or an
+already framed object with a ``frames()`` method yielding ``(frame, seconds)``
+pairs (e.g. ``framing.EncodedAudio``); either way each frame goes to ``send``.
+
+A streamed reply (an LLM's) passes its later sentences as ``more``, an async
+iterator; each is synthesized as soon as it arrives, in the same pipeline.
+"""
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_sentences(text):
+    return [s for s in (p.strip() for p in SENTENCE_END.split(text)) if s]
+
+
+@dataclass
+class SpeakStats:
+    text: str
+    sentences: int = 0
+    audio_sec: float = 0.0
+    ttfa: float = None       # request → first frame on the wire
+    duration: float = 0.0    # request → last frame finished playing
+    interrupted: bool = False
+
+
+@dataclass
+class PlaybackStats:
+    utterances: int = 0
+    interrupted: int = 0
+    ttfa_total: float = 0.0
+    ttfa_max: float = 0.0
+    recent: list = field(default_factory=list)  # ttfa of the last ``keep`` utterances
+
+    def record(self, s, keep=50):
+        self.utterances += 1
+        self.interrupted += s.interrupted
+        if s.ttfa is not None:
+            self.ttfa_total += s.ttfa
+            self.ttfa_max = max(self.ttfa_max, s.ttfa)
+            self.recent = (self.recent + [s.ttfa])[-keep:]
+
+    def summary(self):
+        return {
+            "utterances": self.utterances,
+            "interrupted": self.interrupted,
+            "ttfa_avg": round(self.ttfa_total / self.utterances, 3) if self.utterances else 0.0,
+            "ttfa_max": round(self.ttfa_max, 3),
+            # The lifetime max never recovers from one slow start; this tracks the current tail.
+            "ttfa_recent_p95": round(sorted(self.recent)[-1 - len(self.recent) // 20], 3)
+            if self.recent else 0.0,
+        }
+
+
+def _frames(audio, frame_bytes, bytes_per_sec):
+    if hasattr(audio, "frames"):
+        return audio.frames()
+    return ((audio[off:off + frame_bytes], min(frame_bytes, len(audio) - off) / bytes_per_sec)
+            for off in range(0, len(audio), frame_bytes))
+
+
+def _discard(task):
+    if not task.cancelled():
+        task.exception()
+
+
+async def _sentences(text, more):
+    """``(sentence, streamed)`` for each sentence of ``text``, then of ``more``."""
+    for sentence in split_sentences(text):
+        yield sentence, False
+    if more is not None:
+        async for sentence in more:
+            yield sentence, True
+
+
+async def _synth_next(sentences, synth):
+    """``(sentence, streamed, audio)`` of the next sentence, or None after the last."""
+    item = await anext(sentences, None)
+    if item is None:
+        return None
+    return (*item, await synth(item[0]))
+
+
+async def play(send, text, synth, frame_bytes, bytes_per_sec, lead=0.2, stats=None, more=None):
+    """Speak ``text``, then the sentences ``more`` yields, through ``send(frame)``
+    using ``await synth(sentence)``.
+
+    Fills and returns ``stats`` (a new ``SpeakStats`` by default); streamed
+    sentences are appended to its ``text``. Frames are kept at most ``lead``
+    seconds ahead of real time and the call returns once the last frame has
+    finished playing. Cancelling the task stops playback at the next frame
+    boundary and closes ``more``; ``stats`` is still filled in.
+    """
+    stats = stats or SpeakStats(text)
+    sentences = _sentences(text, more)
+    t0 = time.perf_counter()
+    play_start = None
+    pending = asyncio.ensure_future(_synth_next(sentences, synth))
+    try:
+        while True:
+            item = await pending
+            if item is None:
+                pending = None
+                break
+            pending = asyncio.ensure_future(_synth_next(sentences, synth))
+            sentence, streamed, audio = item
+            if streamed:
+                stats.text = f"{stats.text} {sentence}"
+            stats.sentences += 1
+            for frame, sec in _frames(audio, frame_bytes, bytes_per_sec):
+                await send(frame)
+                now = time.perf_counter()
+                if play_start is None:
+                    play_start = now
+                    stats.ttfa = now - t0
+                stats.audio_sec += sec
+                ahead = play_start + stats.audio_sec - lead - now
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+        if play_start is not None:
+            tail = play_start + stats.audio_sec - time.perf_counter()
+            if tail > 0:
+                await asyncio.sleep(tail)
+    except asyncio.CancelledError:
+        stats.interrupted = True
+        raise
+    finally:
+        if pending is not None and more is not None:
+            # It may be waiting on the stream, which is closed only once it stops.
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+            await sentences.aclose()
+            await more.aclose()
+        elif pending is not None:
+            # Let a prefetched sentence finish; it lands in the TTS cache.
+            pending.add_done_callback(_discard)
+        stats.duration = time.perf_counter() - t0
+    return stats
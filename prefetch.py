@@ -0,0 +1,73 @@
+"""Speculative TTS prefetch for the replies a call can reach next.
+
+While the caller is speaking, ``Prefetcher.prefetch`` starts synthesizing
+every candidate reply that is not cached yet, most likely first, so playback
+can start from the cache as soon as the intent resolves. Prefetches never
+queue: a candidate that would exceed the per-call or the global in-flight
+budget is skipped, which bounds the extra TTS spend under load. Started
+prefetches run to completion even if the call ends, since the cache keeps
+their audio for the next call.
+"""
+import asyncio
+import logging
+
+log = logging.getLogger("voicebot")
+
+
+class PrefetchBudget:
+    """In-flight prefetch limit shared by every call on the worker."""
+
+    def __init__(self, limit=8):
+        self.limit = limit
+        self.in_flight = 0
+        self.started = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def try_acquire(self):
+        if self.in_flight >= self.limit:
+            self.skipped += 1
+            return False
+        self.in_flight += 1
+        self.started += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "limit": self.limit, "started": self.started,
+                "skipped": self.skipped, "failed": self.failed}
+
+
+class Prefetcher:
+    def __init__(self, cache, key, synth, budget, per_call=2):
+        self.cache = cache
+        self.key = key
+        self.synth = synth
+        self.budget = budget
+        self.per_call = per_call
+        self._tasks = set()
+
+    def prefetch(self, texts):
+        """Warm ``texts`` in order until a budget runs out; returns the number started."""
+        started = 0
+        for text in texts:
+            key = self.key(text)
+            if key in self.cache:
+                continue
+            if len(self._tasks) >= self.per_call or not self.budget.try_acquire():
+                break
+            task = asyncio.create_task(self.cache.fetch(key, lambda text=text: self.synth(text),
+                                                       count=False))
+            self._tasks.add(task)
+            task.add_done_callback(self._done)
+            started += 1
+        return started
+
+    def _done(self, task):
+        self._tasks.discard(task)
+        self.budget.release()
+        if not task.cancelled() and task.exception() is not None:
+            self.budget.failed += 1
+            log.warning(f"⚠️ TTS prefetch failed: {task.exception()}")
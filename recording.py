@@ -0,0 +1,385 @@
+"""Call recording: both audio directions plus turn events, written off the hot path.
+
+A call's ``CallRecorder`` only appends ``(time, kind, payload)`` tuples to a
+list. Media payloads are queued as the base64 strings (or the exact outbound
+messages) already in hand, so recording costs no decoding or copying on the
+event loop. Once per ``flush_sec`` the ``Recorder`` takes every call's
+queue. A single writer thread then decodes, frames and gzips each batch, and
+appends it to the call's current segment file as one gzip member:
+
+    <root>/<call id>/<seq>.seg.gz   records: <t f64><kind u8><len u32><body>
+    <root>/index.jsonl              one line per finished segment, one per call end
+
+A segment is finished after ``segment_sec`` of call time or when the call
+ends; its index line is written then, so the index is append-only.
+
+A call id seen again (a reused call SID, or a reconnect) starts a new
+recording in ``<call id>~2``, ``~3``, ... rather than appending to the old
+segments. Directories are claimed with ``mkdir``, so workers sharing the root
+never pick the same one. Index lines name their directory as ``recording``,
+and a lookup by call id returns the latest recording.
+
+Backpressure: queued payloads are counted against ``max_pending_bytes`` for
+the whole process. While the writer is behind and the budget is spent, new
+audio is dropped. The recording keeps a ``dropped`` event marking the gap.
+Events are still kept up to twice the budget, since turn data is small and
+worth more than audio.
+
+``RecordingIndex`` is the reader: it tails ``index.jsonl`` into a dict, so
+looking up a call's ``Recording`` by id is O(1) after the first read.
+"""
+import asyncio
+import base64
+import gzip
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_encoding import pcm_to_wav
+from codec import alaw_decode, ulaw_decode
+from framing import MEDIA_PREFIX, MEDIA_SUFFIX
+
+log = logging.getLogger("voicebot")
+
+IN, OUT, EVENT = 0, 1, 2
+TRACKS = {"in": IN, "out": OUT}
+RECORD = struct.Struct("<dBI")
+INDEX_FILE = "index.jsonl"
+EVENT_SIZE = 256  # what an event counts against the pending budget
+
+# Wire encoding -> (sample rate, decoder to 16-bit PCM)
+WIRE = {"ulaw": (8000, ulaw_decode), "alaw": (8000, alaw_decode),
+        "pcm8": (8000, bytes), "pcm16": (16000, bytes)}
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def _audio_bytes(payload):
+    """Wire audio from a base64 payload, a full media message or raw bytes."""
+    if isinstance(payload, str):
+        if payload.startswith(MEDIA_PREFIX):
+            payload = payload[len(MEDIA_PREFIX):-len(MEDIA_SUFFIX)]
+        return base64.b64decode(payload)
+    return bytes(payload)
+
+
+class CallRecorder:
+    __slots__ = ("recorder", "call_id", "encoding", "t0", "items", "closed", "dropped", "_gap", "_writer")
+
+    def __init__(self, recorder, call_id, encoding):
+        self.recorder = recorder
+        self.call_id = call_id
+        self.encoding = encoding
+        self.t0 = time.monotonic()
+        self.items = []
+        self.closed = False
+        self.dropped = 0
+        self._gap = 0  # audio payloads dropped since the last one kept
+        self._writer = None  # _SegmentWriter, touched only by the writer thread
+
+    def _put(self, kind, payload, size):
+        if self.closed:
+            return
+        r = self.recorder
+        limit = r.max_pending_bytes if kind != EVENT else 2 * r.max_pending_bytes
+        if r.pending_bytes + size > limit:
+            self.dropped += 1
+            self._gap += kind != EVENT
+            r.dropped += 1
+            return
+        t = time.monotonic() - self.t0
+        if self._gap:
+            self.items.append((t, EVENT, {"type": "dropped", "frames": self._gap}))
+            self._gap = 0
+            r.pending_bytes += EVENT_SIZE
+        self.items.append((t, kind, payload))
+        r.pending_bytes += size
+
+    def audio_in(self, payload):
+        """Caller audio as received: the media event's base64 payload."""
+        self._put(IN, payload, len(payload))
+
+    def audio_out(self, payload):
+        """Bot audio as sent: a pre-encoded media message or wire bytes."""
+        self._put(OUT, payload, len(payload))
+
+    def event(self, type, **fields):
+        self._put(EVENT, {"type": type, **fields}, EVENT_SIZE)
+
+    def close(self, **fields):
+        """Record the end of the call; the writer finishes it on its next flush."""
+        self.event("end", **fields)
+        self.closed = True
+
+
+class _SegmentWriter:
+    """Per-call segment state, owned by the writer thread."""
+
+    def __init__(self, root, call_id, encoding, segment_sec, compresslevel):
+        self.dir = self._claim(root, _UNSAFE.sub("_", call_id))
+        self.name = os.path.basename(self.dir)
+        self.root = root
+        self.call_id = call_id
+        self.encoding = encoding
+        self.segment_sec = segment_sec
+        self.compresslevel = compresslevel
+        self.seq = 0
+        self.segments = 0
+        self.total_stored = 0
+        self.buf = bytearray()
+        self._new_segment(0.0)
+
+    @staticmethod
+    def _claim(root, name):
+        """A directory of ``root`` no other recording has used."""
+        os.makedirs(root, exist_ok=True)
+        n = 1
+        while True:
+            path = os.path.join(root, name if n == 1 else f"{name}~{n}")
+            try:
+                os.mkdir(path)
+                return path
+            except FileExistsError:
+                n += 1
+
+    def _new_segment(self, t):
+        self.seq += 1
+        self.t0 = self.t1 = t
+        self.counts = {"in_bytes": 0, "out_bytes": 0, "events": 0}
+        self.stored = 0
+
+    @property
+    def path(self):
+        return os.path.join(self.dir, f"{self.seq:04d}.seg.gz")
+
+    def add(self, t, kind, payload, index):
+        if t - self.t0 >= self.segment_sec and (self.buf or self.stored):
+            self.finish(index)
+            self._new_segment(t)
+        if kind == EVENT:
+            body = json.dumps(payload, separators=(",", ":")).encode()
+            self.counts["events"] += 1
+        else:
+            body = _audio_bytes(payload)
+            self.counts["in_bytes" if kind == IN else "out_bytes"] += len(body)
+        self.buf += RECORD.pack(t, kind, len(body))
+        self.buf += body
+        self.t1 = t
+
+    def write(self):
+        """Append the buffered records to the open segment as one gzip member."""
+        if not self.buf:
+            return
+        member = gzip.compress(bytes(self.buf), self.compresslevel)
+        with open(self.path, "ab") as f:
+            f.write(member)
+        self.buf.clear()
+        self.stored += len(member)
+        self.total_stored += len(member)
+
+    def finish(self, index):
+        """Flush the open segment and append its index line."""
+        self.write()
+        if not self.stored:
+            return
+        self.segments += 1
+        index({"call_id": self.call_id, "recording": self.name, "seq": self.seq,
+               "segment": os.path.relpath(self.path, self.root), "encoding": self.encoding,
+               "t0": round(self.t0, 3), "t1": round(self.t1, 3), "stored_bytes": self.stored,
+               **self.counts})
+
+
+class Recorder:
+    def __init__(self, root, max_pending_bytes=32 * 1024 * 1024, flush_sec=1.0, segment_sec=60.0,
+                 compresslevel=6):
+        self.root = root
+        self.max_pending_bytes = max_pending_bytes
+        self.flush_sec = flush_sec
+        self.segment_sec = segment_sec
+        self.compresslevel = compresslevel
+        self.pending_bytes = 0
+        self.dropped = 0
+        self.stored_bytes = 0
+        self.calls_recorded = 0
+        self._calls = {}  # id() -> CallRecorder with data not yet written; call ids may repeat
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="recorder")
+        self._index_fd = None
+        self._task = None
+
+    def open(self, call_id, encoding, **meta):
+        rec = CallRecorder(self, str(call_id), encoding)
+        self._calls[id(rec)] = rec
+        rec.event("start", encoding=encoding, started_at=time.time(), **meta)
+        return rec
+
+    def start(self):
+        os.makedirs(self.root, exist_ok=True)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_sec)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f"❌ Recording write failed: {e!r}")
+
+    async def flush(self):
+        """Hand every queued item to the writer thread and wait for it."""
+        batches, size = [], 0
+        for key, rec in list(self._calls.items()):
+            if rec.items or rec.closed:
+                items, rec.items = rec.items, []
+                size += sum(EVENT_SIZE if kind == EVENT else len(p) for _, kind, p in items)
+                batches.append((rec, items, rec.closed))
+            if rec.closed:
+                del self._calls[key]
+        if not batches:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, batches)
+        finally:
+            self.pending_bytes -= size
+
+    def _index(self, entry):
+        if self._index_fd is None:
+            self._index_fd = os.open(os.path.join(self.root, INDEX_FILE),
+                                     os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(self._index_fd, (json.dumps(entry, separators=(",", ":")) + "\n").encode())
+
+    def _write(self, batches):
+        for rec, items, closing in batches:
+            w = rec._writer
+            if w is None:
+                w = rec._writer = _SegmentWriter(self.root, rec.call_id, rec.encoding,
+                                                 self.segment_sec, self.compresslevel)
+            stored = w.total_stored
+            for t, kind, payload in items:
+                w.add(t, kind, payload, self._index)
+            if closing:
+                w.finish(self._index)
+                self._index({"call_id": rec.call_id, "recording": w.name, "end": True, "duration": round(w.t1, 3),
+                             "segments": w.segments, "dropped": rec.dropped})
+                self.calls_recorded += 1
+            else:
+                w.write()
+            self.stored_bytes += w.total_stored - stored
+
+    async def close(self):
+        """Finish every open recording and stop the writer."""
+        if self._task is not None:
+            self._task.cancel()
+        for rec in list(self._calls.values()):
+            if not rec.closed:
+                rec.close(reason="shutdown")
+        await self.flush()
+        self._executor.shutdown(wait=True)
+        if self._index_fd is not None:
+            os.close(self._index_fd)
+            self._index_fd = None
+
+    def stats(self):
+        return {"open_calls": sum(not r.closed for r in self._calls.values()),
+                "pending_bytes": self.pending_bytes, "dropped": self.dropped,
+                "stored_bytes": self.stored_bytes, "calls_recorded": self.calls_recorded}
+
+
+def _attempt(name):
+    """1 for ``<call id>``, n for ``<call id>~n``; call ids never contain ``~``."""
+    return int(name.rpartition("~")[2]) if name and "~" in name else 1
+
+
+class Recording:
+    """One call's recording, read from its index entries and segments.
+
+    Of several recordings under one call id, the latest is used.
+    """
+
+    def __init__(self, root, call_id, entries):
+        self.root = root
+        self.call_id = call_id
+        self.name = max((e.get("recording") for e in entries), key=_attempt, default=None)
+        entries = [e for e in entries if e.get("recording") == self.name]
+        self.segments = sorted((e for e in entries if "segment" in e), key=lambda e: e["seq"])
+        self.summary = next((e for e in entries if e.get("end")), None)
+        self.encoding = self.segments[0]["encoding"] if self.segments else None
+
+    def records(self):
+        """``(t, kind, body)`` for every record, oldest first."""
+        for seg in self.segments:
+            with gzip.open(os.path.join(self.root, seg["segment"]), "rb") as f:
+                data = f.read()
+            off = 0
+            while off + RECORD.size <= len(data):
+                t, kind, n = RECORD.unpack_from(data, off)
+                off += RECORD.size
+                yield t, kind, data[off:off + n]
+                off += n
+
+    def events(self):
+        return [{"t": round(t, 3), **json.loads(body)} for t, kind, body in self.records() if kind == EVENT]
+
+    def pcm(self, track="in"):
+        """16-bit PCM of one direction at the wire rate, placed at its recorded times."""
+        kind = TRACKS[track]
+        rate, decode = WIRE[self.encoding]
+        out = bytearray()
+        for t, k, body in self.records():
+            if k != kind:
+                continue
+            pos = int(t * rate) * 2
+            if pos > len(out):
+                out.extend(bytes(pos - len(out)))
+            out += decode(body)
+        return bytes(out), rate
+
+    def wav(self, track="in"):
+        pcm, rate = self.pcm(track)
+        return pcm_to_wav(pcm, rate)
+
+
+class RecordingIndex:
+    """Call id -> index entries, kept current by tailing ``index.jsonl``.
+
+    Lookups run in worker threads (``asyncio.to_thread``), so reading the
+    tail and advancing the offset happen under one lock.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, INDEX_FILE)
+        self._entries = {}
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            try:
+                with open(self.path, "rb") as f:
+                    f.seek(self._offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return
+            end = data.rfind(b"\n") + 1  # a line still being written waits for the next refresh
+            for line in data[:end].splitlines():
+                entry = json.loads(line)
+                self._entries.setdefault(entry["call_id"], []).append(entry)
+            self._offset += end
+
+    def calls(self):
+        self.refresh()
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, call_id):
+        """The ``Recording`` of ``call_id``, or None if nothing of it is indexed yet."""
+        self.refresh()
+        with self._lock:
+            entries = list(self._entries.get(str(call_id), ()))
+        return Recording(self.root, str(call_id), entries) if entries else None
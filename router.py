@@ -0,0 +1,184 @@
+"""Three-tier response routing: rules, semantic FAQ match, then the LLM.
+
+1. ``rules``: the keyword ``IntentEngine``; microseconds, handles most turns.
+2. ``semantic``: cosine nearest neighbour of the utterance against the FAQ
+   bank's example questions, whose embeddings are computed once at load.
+3. ``llm``: a generated reply, only if its first sentence arrives within
+   ``llm_deadline``. The route carries that sentence as an ``LLMReply``,
+   whose ``rest`` streams the following sentences as they are generated,
+   so speech can start before the whole reply is written.
+
+Anything the three tiers cannot answer routes to ``fallback`` (intent
+``UNKNOWN``), so the caller hears the canned reprompt rather than waiting on
+a slow model. Every tier counts its hits and latency for ``/stats``.
+
+The default ``HashingEmbedder`` needs no model or network: it hashes words,
+word pairs and character trigrams into a fixed-size vector, weighted by
+their rarity across the bank so filler words like "what is the" count for
+little. Any object with ``embed(texts) -> (n, dim) float32 array`` of unit
+rows can replace it.
+"""
+import asyncio
+import json
+import os
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from intents import normalize
+from llm_service import stream_sentences
+
+FAQ_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "faqs.json")
+
+TIERS = ("rules", "semantic", "llm", "fallback")
+
+
+class LLMReply(str):
+    """The first sentence of a generated reply; ``rest`` yields the others.
+
+    Whoever takes the route must either consume ``rest`` or ``aclose`` it,
+    which frees the model's concurrency slot.
+    """
+
+    def __new__(cls, first, rest):
+        self = super().__new__(cls, first)
+        self.rest = rest
+        return self
+
+    async def aclose(self):
+        await self.rest.aclose()
+
+
+@dataclass
+class Route:
+    tier: str
+    intent: str
+    meta: Optional[str] = None  # FAQ key
+    text: Optional[str] = None  # LLMReply
+
+
+class HashingEmbedder:
+    def __init__(self, dim=1024):
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    def fit(self, texts):
+        """Weight features by inverse document frequency over ``texts``."""
+        df = (self._counts(texts) > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        return self
+
+    def _features(self, text):
+        words = normalize(text).split()
+        feats = list(words)
+        feats += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for w in words:
+            w = f"<{w}>"
+            feats += [w[i:i + 3] for i in range(len(w) - 2)]
+        return feats
+
+    def _counts(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for f in self._features(text):
+                out[row, zlib.crc32(f.encode()) % self.dim] += 1.0
+        return out
+
+    def embed(self, texts):
+        out = np.sqrt(self._counts(texts)) * self.idf  # damp repeats, favour rare features
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-9)
+
+
+class FAQIndex:
+    def __init__(self, faqs, embedder=None, threshold=0.3):
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.answers = {key: faq["answer"] for key, faq in faqs.items()}
+        self.keys = [key for key, faq in faqs.items() for _ in faq["examples"]]
+        examples = [ex for faq in faqs.values() for ex in faq["examples"]]
+        if embedder is None:
+            self.embedder.fit(examples)
+        self.matrix = self.embedder.embed(examples)
+
+    @classmethod
+    def from_file(cls, path=FAQ_FILE, **kwargs):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["faqs"], **kwargs)
+
+    def nearest(self, text):
+        """``(faq_key, cosine)`` of the closest example question."""
+        scores = self.matrix @ self.embedder.embed([text])[0]
+        i = int(np.argmax(scores))
+        return self.keys[i], float(scores[i])
+
+    def match(self, text):
+        key, score = self.nearest(text)
+        return key if score >= self.threshold else None
+
+
+class TierStats:
+    def __init__(self):
+        self.hits = 0
+        self.total_sec = 0.0
+        self.max_sec = 0.0
+
+    def record(self, sec):
+        self.hits += 1
+        self.total_sec += sec
+        self.max_sec = max(self.max_sec, sec)
+
+
+class ResponseRouter:
+    def __init__(self, engine, faq_index, llm=None, llm_deadline=1.5):
+        self.engine = engine
+        self.faq_index = faq_index
+        self.llm = llm
+        self.llm_deadline = llm_deadline
+        self.tiers = {t: TierStats() for t in TIERS}
+        self.calls = 0
+
+    def _done(self, tier, t0, route):
+        self.tiers[tier].record(time.perf_counter() - t0)
+        return route
+
+    def match(self, text):
+        """The first two tiers only: never waits, never costs anything."""
+        intent, meta = self.engine.classify(text)
+        if intent != "UNKNOWN":
+            return Route("rules", intent, meta)
+        key = self.faq_index.match(text)
+        if key is not None:
+            return Route("semantic", "FAQ", key)
+        return None
+
+    async def route(self, text, session_id=None):
+        self.calls += 1
+        t0 = time.perf_counter()
+        route = self.match(text)
+        if route is not None:
+            return self._done(route.tier, t0, route)
+        if self.llm is not None and self.llm.model is not None:
+            sentences = stream_sentences(self.llm.stream_response(text, session_id))
+            try:
+                first = await asyncio.wait_for(anext(sentences, None), self.llm_deadline)
+            except asyncio.TimeoutError:
+                first = None
+            if first and not self.llm.is_canned(first):
+                return self._done("llm", t0, Route("llm", "LLM", text=LLMReply(first, sentences)))
+            await sentences.aclose()
+        return self._done("fallback", t0, Route("fallback", "UNKNOWN"))
+
+    def stats(self):
+        out = {"calls": self.calls}
+        for name, t in self.tiers.items():
+            out[name] = {
+                "hits": t.hits,
+                "hit_rate": round(t.hits / self.calls, 4) if self.calls else 0.0,
+                "mean_ms": round(t.total_sec / t.hits * 1000, 2) if t.hits else 0.0,
+                "max_ms": round(t.max_sec * 1000, 2),
+            }
+        return out
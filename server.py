@@ -1,26 +1,103 @@
-import os, json, asyncio, logging, sys, base64, requests, io, struct, time
+import os, json, asyncio, logging, sys, base64, time, socket, hmac
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import httpx
+from xml.sax.saxutils import quoteattr
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 import uvicorn
+from vad import VAD
+from audio_buffer import FrameAssembler, UtteranceBuffer
+from endpoint import END, NOISE, SILENCE, SPEECH, START, Endpointer
+from tts_cache import TTSCache, disk_tier
+from tts_api import tts, tts_key
+from pitch import PitchRenderer
+from playback import PlaybackStats, SpeakStats, play, split_sentences
+import http_client
+from capacity import CapacityManager, CircuitOpen
+from loop_monitor import LoopLagMonitor
+from audio_encoding import wav_upload
+from codec import CallCodec
+from framing import CODEC_LAWS, FrameCache, loads, media_message
+from intents import IntentEngine, RULES_FILE
+from dialogue import CallState, Dialogue, DIALOGUE_FILE
+from router import FAQIndex, FAQ_FILE, LLMReply, ResponseRouter
+from llm_service import get_llm_client
+from prefetch import Prefetcher, PrefetchBudget
+from streaming_stt import SpeculativeSTT, StreamingSTT
+from state_store import open_store
+from metrics import Registry
+from tracing import Tracer
+from recording import Recorder, RecordingIndex
+import workers
 
 # ================= ENV =================
 load_dotenv()
 PORT = int(os.getenv("PORT", 10000))
+# Worker processes sharing PORT; REUSE_PORT gives each its own SO_REUSEPORT
+# socket instead of one inherited listener (see workers.py).
+WORKERS = int(os.getenv("WORKERS", 1))
+REUSE_PORT = os.getenv("REUSE_PORT", "0") == "1"
+# Where workers publish calls and stats for /cluster; use sqlite:// or
+# redis:// once WORKERS > 1 (see state_store.py).
+STATE_STORE = os.getenv("STATE_STORE", "memory://")
+WORKER_STATS_SEC = 5
+# Live calls past which GET /capacity tells dialers to hold off
+MAX_CALLS = int(os.getenv("MAX_CALLS", 100))
+# Keep-alive connections opened per vendor before GET /ready turns 200
+WARM_CONNECTIONS = int(os.getenv("WARM_CONNECTIONS", 4))
+
+# Per-call turn traces, written for calls whose slowest turn took at least
+# TRACE_SLOW_MS; unset TRACE_DIR turns dumps off (metrics stay on).
+TRACE_DIR = os.getenv("TRACE_DIR")
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", 0))
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")
+# For the whole cache dir, shared out among its tiers (tts_cache.DISK_SHARES)
+TTS_CACHE_DISK_MB = int(os.getenv("TTS_CACHE_DISK_MB", 512))
+# Per-call audio and turn recordings (recording.py); empty turns them off
+RECORDING_DIR = os.getenv("RECORDING_DIR", ".recordings")
+RECORDING_MAX_PENDING_MB = int(os.getenv("RECORDING_MAX_PENDING_MB", 32))
+# Bearer token for GET /recordings/...; unset keeps those endpoints off
+RECORDINGS_API_TOKEN = os.getenv("RECORDINGS_API_TOKEN")
 
 # ================= AUDIO =================
+# Wire format of /ws media: "pcm16" is 16 kHz linear PCM, used as-is;
+# "ulaw", "alaw" and "pcm8" are 8 kHz telephony audio bridged by CallCodec.
+MEDIA_ENCODING = os.getenv("MEDIA_ENCODING", "pcm16")
 SAMPLE_RATE = 16000
 MIN_CHUNK_SIZE = 3200
-SPEECH_THRESHOLD = 520
-
-SILENCE_CHUNKS = 10
-MIN_SPEECH_CHUNKS = 6
-
-POST_TTS_DELAY = 0.6
-FAIL_COOLDOWN_SEC = 8
-
-MAX_CONFUSION = 3
+SPEECH_THRESHOLD = 520  # floor for the VAD's adaptive noise threshold
+
+FRAME_SEC = MIN_CHUNK_SIZE / (SAMPLE_RATE * 2)
+
+# End of speech (endpoint.py): MIN_SPEECH_SEC of voice, then a per-caller
+# trailing silence between the two bounds; PRE_ROLL_SEC before the first
+# voiced frame is kept for the word onset.
+MIN_SPEECH_SEC = float(os.getenv("MIN_SPEECH_SEC", 0.3))
+ENDPOINT_MIN_SILENCE_SEC = float(os.getenv("ENDPOINT_MIN_SILENCE_SEC", 0.4))
+ENDPOINT_MAX_SILENCE_SEC = float(os.getenv("ENDPOINT_MAX_SILENCE_SEC", 1.0))
+PRE_ROLL_SEC = 0.2
+BARGE_IN_CHUNKS = 3  # consecutive voiced frames that interrupt the bot
+MAX_UTTERANCE_SEC = 15
+
+# "batch" sends one request at end of speech. "speculative" re-sends the
+# whole growing utterance every SPECULATIVE_STT_SEC while the caller talks,
+# trading STT spend for earlier intents. "streaming" needs a real backend
+# registered in STREAMING_BACKENDS; none is bundled, so it refuses to start.
+STT_MODE = os.getenv("STT_MODE", "batch")
+STT_STREAMING_BACKEND = os.getenv("STT_STREAMING_BACKEND", "")
+SPECULATIVE_STT_SEC = float(os.getenv("SPECULATIVE_STT_SEC", 0.6))
+
+PLAYBACK_LEAD = 0.2  # seconds of audio kept queued ahead of real time
+
+LLM_DEADLINE_SEC = float(os.getenv("LLM_DEADLINE_SEC", 1.5))  # else the canned reprompt
 MAX_SILENCE_PROMPTS = 2
+SILENCE_REPROMPT_SEC = float(os.getenv("SILENCE_REPROMPT_SEC", 8))  # caller silence before a reprompt
+
+# Speculative TTS for the replies reachable from the current state
+PREFETCH_PER_CALL = int(os.getenv("PREFETCH_PER_CALL", 2))
+PREFETCH_GLOBAL = int(os.getenv("PREFETCH_GLOBAL", 8))
 
 # ================= LOGGING =================
 logging.basicConfig(
@@ -32,255 +109,769 @@ logging.basicConfig(
 log = logging.getLogger("voicebot")
 
 # ================= APP =================
-app = FastAPI()
+BOOT = time.monotonic()
+loop_monitor = LoopLagMonitor()
+
+@asynccontextmanager
+async def lifespan(app):
+    loop_monitor.start()
+    if recorder is not None:
+        recorder.start()
+    warm = asyncio.create_task(warm_start())
+    heartbeat = asyncio.create_task(publish_worker())
+    yield
+    warm.cancel()
+    heartbeat.cancel()
+    await asyncio.gather(heartbeat, return_exceptions=True)
+    await store.delete(f"worker:{WORKER_ID}")
+    await store.close()
+    if recorder is not None:
+        await recorder.close()
+    loop_monitor.stop()
+    await http_client.close_all()
+
+app = FastAPI(lifespan=lifespan)
+
+# ================= METRICS =================
+registry = Registry()
+tracer = Tracer(registry, TRACE_DIR, TRACE_SLOW_MS / 1000)
+upstream_latency = registry.histogram("voicebot_upstream_seconds", "STT/TTS vendor request latency", ("op",))
+upstream_errors = registry.counter("voicebot_upstream_errors_total", "Failed STT/TTS vendor requests", ("op",))
+registry.gauge("voicebot_active_calls", "Calls connected to this worker", lambda: len(live_calls))
+registry.gauge("voicebot_loop_lag_seconds", "Last measured event-loop lag", lambda: loop_monitor.last_lag)
+registry.gauge("voicebot_loop_stalls", "Event-loop stalls over the threshold so far", lambda: loop_monitor.stalls)
+registry.gauge("voicebot_upstream_in_flight", "Requests in flight per upstream pool",
+               lambda: {(n,): u["in_flight"] for n, u in http_client.stats().items()}, ("upstream",))
+registry.gauge("voicebot_upstream_utilization", "In-flight requests over the pool's concurrency limit",
+               lambda: {(n,): u["in_flight"] / u["max_concurrency"] for n, u in http_client.stats().items()},
+               ("upstream",))
+registry.gauge("voicebot_upstream_circuit_open", "1 while the upstream's circuit breaker is not closed",
+               lambda: {(n,): int(u["circuit"] != "closed") for n, u in http_client.stats().items()},
+               ("upstream",))
+degraded = registry.counter("voicebot_degraded_total", "Turns answered with canned audio after a vendor failure", ("op",))
+registry.gauge("voicebot_tts_cache_hit_ratio", "TTS cache hits over lookups", lambda: tts_cache.stats()["hit_rate"])
 
 # ================= SCRIPT =================
-PITCH_1 = (
-    "Hi, my name is Neeraja, calling from Rupeek. "
-    "You have a pre approved personal loan at zero interest."
-)
-
-PITCH_2 = (
-    "The process is completely digital with no paperwork. "
-    "You can receive instant disbursal in sixty seconds. "
-    "With timely repayments you can improve your CIBIL score. "
-    "This is a limited time offer. Are you interested?"
-)
-
-STEPS = [
-    "Step one. Download the Rupeek app from the Play Store. Say next once done.",
-    "Step two. Complete your KYC using Aadhaar. Say next once completed.",
-    "Step three. Select your loan amount and confirm disbursal. Say done to finish."
-]
-
-FAQS = [
-    (["emi", "monthly"], "The EMI depends on the tenure you select. The app shows the exact EMI amount."),
-    (["interest", "roi"], "If repayment is missed, the loan converts into EMI with interest as shown in the app."),
-    (["limit", "amount"], "Your approved loan amount is visible inside the Rupeek app."),
-    (["processing", "fee"], "The processing fee is a one time charge for instant digital disbursal.")
-]
-
-NEUTRAL_WORDS = ["okay", "ok", "right", "nice", "thanks", "thank you", "fine"]
-PARTIAL_QUESTIONS = ["what is", "what", "rate", "interest", "emi", "amount"]
+# Answers keyed by the FAQ rule keys in intents.json, with the example
+# questions the semantic tier matches against
+faq_index = FAQIndex.from_file(os.getenv("FAQ_FILE", FAQ_FILE))
+FAQS = faq_index.answers
+
+# The call flow and every fixed line it speaks (dialogue.json)
+dialogue = Dialogue.from_file(os.getenv("DIALOGUE_FILE", DIALOGUE_FILE), FAQS)
+GOODBYE = dialogue.prompts["GOODBYE"]
+SILENCE_PROMPT = dialogue.prompts["SILENCE"]
+# Played from cache when STT or TTS fails; each must stay one sentence
+STT_RETRY_PROMPT = dialogue.prompts["STT_RETRY"]
+BUSY_PROMPT = dialogue.prompts["BUSY"]
+
+# Every fixed utterance; synthesized once and served from the TTS cache.
+SCRIPT = dialogue.script()
 
 # ================= INTENT =================
-def classify(text):
-    t = text.lower().strip()
-
-    if not t:
-        return "EMPTY", None
-
-    if any(x in t for x in NEUTRAL_WORDS):
-        return "NEUTRAL", None
-
-    if any(t.startswith(p) for p in PARTIAL_QUESTIONS):
-        return "PARTIAL", None
-
-    if any(x in t for x in ["hello", "hi", "hey"]):
-        return "GREETING", None
+intent_engine = IntentEngine.from_file(os.getenv("INTENTS_FILE", RULES_FILE))
 
-    if any(x in t for x in ["yes", "interested", "sure"]):
-        return "YES", None
-
-    if any(x in t for x in ["no", "not interested"]):
-        return "NO", None
-
-    if any(x in t for x in ["next"]):
-        return "NEXT", None
-
-    if any(x in t for x in ["previous", "back"]):
-        return "PREVIOUS", None
-
-    if any(x in t for x in ["repeat"]):
-        return "REPEAT", None
-
-    if any(x in t for x in ["done", "complete"]):
-        return "DONE", None
-
-    if any(x in t for x in ["agent", "human", "representative"]):
-        return "HUMAN", None
-
-    for keys, _ in FAQS:
-        if any(k in t for k in keys):
-            return "FAQ", keys
+def classify(text):
+    return intent_engine.classify(text)
 
-    return "UNKNOWN", None
+# The LLM client is attached by warm_start, so importing google.genai
+# stays off the startup path; until then replies skip the LLM tier.
+router = ResponseRouter(intent_engine, faq_index, None, LLM_DEADLINE_SEC)
 
 # ================= AUDIO =================
-def is_speech(pcm):
-    energy = sum(abs(int.from_bytes(pcm[i:i+2], "little", signed=True))
-                 for i in range(0, len(pcm)-1, 2))
-    return (energy / max(len(pcm)//2, 1)) > SPEECH_THRESHOLD
-
-def pcm_to_wav(pcm):
-    buf = io.BytesIO()
-    buf.write(b"RIFF")
-    buf.write(struct.pack("<I", 36 + len(pcm)))
-    buf.write(b"WAVEfmt ")
-    buf.write(struct.pack("<IHHIIHH", 16, 1, 1, SAMPLE_RATE,
-                           SAMPLE_RATE*2, 2, 16))
-    buf.write(b"data")
-    buf.write(struct.pack("<I", len(pcm)))
-    buf.write(pcm)
-    return buf.getvalue()
-
-def stt_safe(pcm):
+sarvam = http_client.upstream("sarvam")
+
+async def stt_safe(pcm):
+    """Transcript of ``pcm``: "" when nothing was said, None when STT failed."""
+    body = wav_upload(pcm, SAMPLE_RATE, {"language_code": "en-IN"})
+    t0 = time.perf_counter()
     try:
-        r = requests.post(
-            "https://api.sarvam.ai/speech-to-text",
-            headers={"api-subscription-key": SARVAM_API_KEY},
-            files={"file": ("audio.wav", pcm_to_wav(pcm), "audio/wav")},
-            data={"language_code": "en-IN"},
-            timeout=10
+        r = await sarvam.post(
+            "/speech-to-text",
+            headers={"api-subscription-key": SARVAM_API_KEY or "", **body.headers},
+            content=body,
         )
-        return r.json().get("transcript", "").strip() if r.status_code == 200 else ""
-    except:
-        return ""
-
-def tts(text):
-    r = requests.post(
-        "https://api.sarvam.ai/text-to-speech",
-        headers={"api-subscription-key": SARVAM_API_KEY, "Content-Type": "application/json"},
-        json={"text": text, "target_language_code": "en-IN", "speech_sample_rate": "16000"},
-        timeout=10
-    )
-    r.raise_for_status()
-    return base64.b64decode(r.json()["audios"][0])
-
-async def speak(ws, text, session):
+    except CircuitOpen:
+        return None
+    except httpx.HTTPError as e:
+        upstream_latency.observe(time.perf_counter() - t0, "stt")
+        upstream_errors.inc("stt")
+        log.error(f"❌ STT error: {e!r}")
+        return None
+    upstream_latency.observe(time.perf_counter() - t0, "stt")
+    if r.status_code != 200:
+        upstream_errors.inc("stt")
+        log.error(f"❌ STT HTTP {r.status_code}: {r.text[:200]}")
+        return None
+    return r.json().get("transcript", "").strip()
+
+async def tts_timed(text):
+    t0 = time.perf_counter()
+    try:
+        pcm = await tts(text)
+    except CircuitOpen:
+        raise  # never sent
+    except Exception:
+        upstream_latency.observe(time.perf_counter() - t0, "tts")
+        upstream_errors.inc("tts")
+        raise
+    upstream_latency.observe(time.perf_counter() - t0, "tts")
+    return pcm
+
+# ================= TTS CACHE =================
+# Script lines, their encoded frames and pitch segments each get a
+# subdirectory of TTS_CACHE_DIR and a share of TTS_CACHE_DISK_MB.
+def cache_tier(name):
+    cache_dir, max_disk_bytes = disk_tier(TTS_CACHE_DIR, name, TTS_CACHE_DISK_MB * 2**20)
+    return {"cache_dir": cache_dir, "max_disk_bytes": max_disk_bytes}
+
+tts_cache = TTSCache(**cache_tier("script"))
+
+async def tts_cached(text, count=True):
+    return await tts_cache.fetch(tts_key(text), lambda: tts_timed(text), count)
+
+# Wire-ready media messages for cached sentences.
+frame_cache = FrameCache(**cache_tier("frames"))
+
+async def tts_framed(text, count=True):
+    """``text`` as pre-encoded MEDIA_ENCODING messages; encoded once, then reused.
+
+    ``count=False`` keeps warm-up out of the caches' hit rates.
+    """
+    key = tts_key(text)
+    audio = frame_cache.get(key, MEDIA_ENCODING, count)
+    if audio is None:
+        pcm = await tts_cached(text, count)
+        audio = frame_cache.put(key, MEDIA_ENCODING, pcm, MIN_CHUNK_SIZE, SAMPLE_RATE * 2)
+        asyncio.get_running_loop().run_in_executor(None, frame_cache.store, key, MEDIA_ENCODING, audio)
+    return audio
+
+# Generated replies seldom repeat across calls, so their audio is kept in a
+# small memory-only LRU instead of beside the script's files on disk.
+dynamic_tts_cache = TTSCache(max_bytes=int(os.getenv("DYNAMIC_TTS_CACHE_MB", 8)) * 2**20)
+
+async def tts_dynamic(text):
+    """PCM for generated text (LLM replies); lines already on disk still come from there."""
+    key = tts_key(text)
+    if key in tts_cache:
+        return await tts_framed(text)
+    return await dynamic_tts_cache.fetch(key, lambda: tts_timed(text))
+
+async def warm_script(retry_sec=5):
+    """Cache and pin every SCRIPT sentence, canned fallbacks first; retries until all are in."""
+    t0 = time.time()
+    missing = list(dict.fromkeys(s for text in (BUSY_PROMPT, STT_RETRY_PROMPT, *SCRIPT)
+                                 for s in split_sentences(text)))
+    tts_cache.pin(tts_key(s) for s in missing)
+    while True:
+        await tts_cache.warm([(tts_key(s), lambda s=s: tts_timed(s)) for s in missing])
+        for s in missing:
+            if tts_key(s) in tts_cache:
+                await tts_framed(s, count=False)
+        missing = [s for s in missing if tts_key(s) not in tts_cache]
+        if not missing:
+            break
+        log.warning(f"⚠️ {len(missing)} script sentences not cached, retrying in {retry_sec}s")
+        await asyncio.sleep(retry_sec)
+    log.info(f"🔥 TTS cache warm in {time.time() - t0:.1f}s | {tts_cache.stats()}")
+
+# ================= PITCH =================
+# A campaign row's pitch template and slot values arrive as JSON in the
+# Exotel CustomField of the call, echoed in the stream's start event.
+# config.py pre-renders into the same pitch tier.
+pitch_cache = TTSCache(**cache_tier("pitch"))
+pitch_renderer = PitchRenderer(pitch_cache, tts_key, tts_timed)
+
+def call_params(start):
+    params = start.get("custom_parameters") or start.get("customField") or {}
+    if isinstance(params, str):
+        try:
+            params = json.loads(params)
+        except ValueError:
+            return {}
+    return params if isinstance(params, dict) else {}
+
+def pitch_synth(values):
+    return lambda sentence: pitch_renderer.render(sentence, values)
+
+@app.api_route("/exoml", methods=["GET", "POST"])
+async def exoml(request: Request):
+    """ExoML streaming the call to this host's /ws.
+
+    Calls placed by config.py point Exotel here. Each key of the call's
+    CustomField JSON becomes a stream parameter, which Exotel sends back as
+    the start event's ``custom_parameters``.
+    """
+    fields = dict(request.query_params)
+    if request.method == "POST":
+        fields.update(await request.form())
+    params = call_params({"customField": fields.get("CustomField") or "{}"})
+    host = request.headers.get("host", "").replace("http://", "").replace("https://", "").strip("/")
+    parameters = "".join(f"\n            <Parameter name={quoteattr(str(k))} value={quoteattr(str(v))} />"
+                         for k, v in params.items())
+    xml = f"""<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+    <Connect>
+        <Stream url={quoteattr(f"wss://{host}/ws")}>{parameters}
+        </Stream>
+    </Connect>
+</Response>"""
+    return Response(content=xml, media_type="application/xml")
+
+# ================= PREFETCH =================
+prefetch_budget = PrefetchBudget(PREFETCH_GLOBAL)
+
+# ================= STREAMING STT =================
+# Vendor name -> backend class (``open(sample_rate, on_partial)``). The fakes
+# in streaming_stt.py invent transcripts and are for tests only.
+STREAMING_BACKENDS = {}
+if STT_MODE not in ("batch", "speculative", "streaming"):
+    raise ValueError(f"STT_MODE={STT_MODE!r}: expected batch, speculative or streaming")
+if STT_MODE == "streaming" and STT_STREAMING_BACKEND not in STREAMING_BACKENDS:
+    raise ValueError(f"STT_MODE=streaming needs STT_STREAMING_BACKEND to name a registered backend "
+                     f"({', '.join(sorted(STREAMING_BACKENDS)) or 'none is bundled'}), "
+                     f"got {STT_STREAMING_BACKEND!r}")
+stt_stats = {"utterances": 0, "requests": 0, "reused": 0, "early_intents": 0,
+             "avoided_noise": 0, "avoided_silence": 0}
+stt_avoided_total = registry.counter(
+    "voicebot_stt_avoided_total", "STT requests a fixed silence window would have made", ("reason",))
+
+def stt_avoided(reason):
+    """A noise burst was dropped, or a second of silence passed, without STT."""
+    stt_stats[f"avoided_{reason}"] += 1
+    stt_avoided_total.inc(reason)
+
+def on_partial(session, text):
+    """Classify a partial transcript and start synthesizing the likely reply."""
+    intent, meta = classify(text)
+    text = dialogue.peek(session, intent, meta)
+    if text is None:
+        return
+    session.early_intent = intent
+    stt_stats["early_intents"] += 1
+    session.prefetch.prefetch(split_sentences(text))
+
+def open_stt(session):
+    stt_stats["utterances"] += 1
+    session.prefetch.prefetch(s for text in dialogue.next_replies(session) for s in split_sentences(text))
+    partial = lambda text: on_partial(session, text)
+    if STT_MODE == "streaming":
+        backend = STREAMING_BACKENDS[STT_STREAMING_BACKEND]()
+        return StreamingSTT(backend, SAMPLE_RATE, partial)
+    interval = SPECULATIVE_STT_SEC if STT_MODE == "speculative" else None
+    return SpeculativeSTT(stt_safe, SAMPLE_RATE * 2, interval, partial)
+
+def close_stt(stt):
+    stt_stats["requests"] += stt.requests
+    stt_stats["reused"] += stt.reused
+
+playback_stats = PlaybackStats()
+
+async def speak(ws, text, session, synth=tts_framed, trace=None, more=None):
+    """Play ``text``, then the sentences ``more`` streams in (an LLM reply)."""
     log.info(f"🗣 BOT → {text[:80]}...")
-    session["bot_speaking"] = True
-    pcm = await asyncio.to_thread(tts, text)
-    for i in range(0, len(pcm), MIN_CHUNK_SIZE):
-        await ws.send_text(json.dumps({"event": "media", "media": {"payload": base64.b64encode(pcm[i:i+MIN_CHUNK_SIZE]).decode()}}))
-    await asyncio.sleep(POST_TTS_DELAY)
-    session["bot_speaking"] = False
+    rec = session.rec
+    if rec is not None and more is None:
+        rec.event("bot", text=text)
+
+    async def send(frame):
+        if isinstance(frame, str):  # pre-encoded by tts_framed
+            await ws.send_text(frame)
+        else:
+            if session.codec is not None:
+                frame = session.codec.outbound(frame)
+            await ws.send_text(media_message(frame))
+        if rec is not None:
+            rec.audio_out(frame)
+        if trace is not None:
+            trace.frame()
+
+    vendor_synth = synth
+    degraded_to_canned = False
+
+    async def synth(sentence):
+        # With TTS down, the rest of the reply is replaced by one canned
+        # apology from cache instead of the caller hearing nothing.
+        nonlocal degraded_to_canned
+        if not degraded_to_canned:
+            try:
+                audio = await vendor_synth(sentence)
+                if not degraded_to_canned:
+                    return audio
+            except (CircuitOpen, httpx.HTTPError) as e:
+                degraded_to_canned = True
+                degraded.inc("tts")
+                log.warning(f"⚠️ TTS unavailable ({e!r}), playing canned audio")
+                return await tts_framed(BUSY_PROMPT)
+        return b""
+
+    if trace is not None:
+        inner = synth
+
+        def synth(sentence):
+            trace.mark("tts_request")
+            return inner(sentence)
+
+    stats = SpeakStats(text)
+    try:
+        await play(send, text, synth, MIN_CHUNK_SIZE, SAMPLE_RATE * 2, PLAYBACK_LEAD, stats, more)
+    finally:
+        if rec is not None and more is not None:
+            rec.event("bot", text=stats.text)  # only known once streamed
+        playback_stats.record(stats)
+        ttfa = f"{stats.ttfa * 1000:.0f}ms" if stats.ttfa is not None else "-"
+        log.info(f"🔊 ttfa={ttfa} total={stats.duration:.2f}s audio={stats.audio_sec:.2f}s "
+                 f"sentences={stats.sentences}{' (interrupted)' if stats.interrupted else ''}")
+
+async def reply(ws, session, texts, end, synth, trace):
+    outcome = "interrupted"
+    try:
+        for text in texts:
+            await speak(ws, text, session, synth, trace, text.rest if isinstance(text, LLMReply) else None)
+        outcome = "complete"
+        if end:
+            await ws.close()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        outcome = "failed"
+        log.error(f"❌ Reply failed: {e}")
+    finally:
+        for text in texts:
+            if isinstance(text, LLMReply):  # not reached before a barge-in
+                await text.aclose()
+        if trace is not None:
+            tracer.finish(trace, outcome)
+        if session.reply is asyncio.current_task():
+            session.bot_speaking = False
+
+def say(ws, session, *texts, end=False, synth=tts_framed):
+    """Start speaking ``texts`` in the background so the caller stays audible.
+
+    Replaces any reply still in flight. ``end`` closes the call afterwards
+    and makes the reply immune to barge-in. ``synth`` turns each sentence
+    into PCM, e.g. a ``pitch_synth`` for a templated pitch. An ``LLMReply``
+    among ``texts`` goes on with the sentences its stream yields. The
+    turn's trace, if any, follows the reply to its last frame.
+    """
+    if session.reply is not None:
+        session.reply.cancel()
+    trace, session.trace = session.trace, None
+    session.bot_speaking = True
+    session.closing = end
+    session.reply = asyncio.create_task(reply(ws, session, texts, end, synth, trace))
+
+async def barge_in(ws, session):
+    session.reply.cancel()
+    session.bot_speaking = False
+    await ws.send_text(json.dumps({"event": "clear", "stream_sid": session.stream_sid}))
+    log.info("✋ Caller barged in, playback cleared")
+
+# ================= STATS =================
+@app.get("/stats")
+async def stats():
+    return {"tts_cache": tts_cache.stats(), "dynamic_tts_cache": dynamic_tts_cache.stats(), "frames": frame_cache.stats(), "playback": playback_stats.summary(),
+            "upstreams": http_client.stats(), "router": router.stats(), "pitch": {**pitch_renderer.stats(), "cache": pitch_cache.stats()}, "loop_lag": loop_monitor.stats(), "stt": stt_stats,
+            "prefetch": prefetch_budget.stats(), "active_calls": len(live_calls), "capacity": capacity.stats(),
+            "recording": recorder.stats() if recorder is not None else None}
+
+# ================= CLUSTER =================
+# Each worker publishes its live calls and a stats snapshot to the shared
+# store, refreshed every WORKER_STATS_SEC with a TTL of three periods, so a
+# dead worker drops out of /cluster on its own.
+store = open_store(STATE_STORE)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+live_calls = {}  # call id -> session
+_writes = set()
+
+def _write_done(task):
+    _writes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        log.warning(f"⚠️ State store write failed: {task.exception()!r}")
+
+def publish(coro):
+    """Fire-and-forget store write; a slow store never holds up a call's audio."""
+    task = asyncio.create_task(coro)
+    _writes.add(task)
+    task.add_done_callback(_write_done)
+
+def call_doc(session):
+    return {"worker": WORKER_ID, "phase": dialogue.phase_name(session),
+            "turns": session.turns, "started": session.started_at}
+
+def publish_call(session):
+    publish(store.set(f"call:{session.call_id}", call_doc(session), ttl=3 * WORKER_STATS_SEC))
+
+def call_started(session):
+    live_calls[session.call_id] = session
+    publish_call(session)
+    publish(store.incr("metric:calls_started"))
+
+def call_ended(session):
+    if live_calls.pop(session.call_id, None) is None:
+        return
+    publish(store.delete(f"call:{session.call_id}"))
+    publish(store.incr("metric:calls_ended"))
+    publish(store.incr("metric:turns", session.turns))
+
+async def publish_worker():
+    while True:
+        try:
+            for session in list(live_calls.values()):
+                publish_call(session)
+            await store.set(f"worker:{WORKER_ID}", {"pid": os.getpid(), "active_calls": len(live_calls),
+                                                   "stats": await stats()}, ttl=3 * WORKER_STATS_SEC)
+        except Exception as e:
+            log.warning(f"⚠️ Worker heartbeat failed: {e!r}")
+        await asyncio.sleep(WORKER_STATS_SEC)
+
+@app.get("/cluster")
+async def cluster():
+    """Calls, workers and counters across every worker sharing STATE_STORE."""
+    nodes = await store.scan("worker:")
+    calls = await store.scan("call:")
+    metrics = {k[len("metric:"):]: v for k, v in (await store.scan("metric:")).items()}
+    phases = {}
+    for call in calls.values():
+        phases[call["phase"]] = phases.get(call["phase"], 0) + 1
+    return {
+        "workers": {k[len("worker:"):]: {"active_calls": w["active_calls"],
+                                         "accepting": w["stats"]["capacity"]["accepting"],
+                                         "loop_lag": w["stats"]["loop_lag"],
+                                         "tts_hit_rate": w["stats"]["tts_cache"]["hit_rate"]}
+                    for k, w in nodes.items()},
+        "active_calls": len(calls),
+        "calls_by_phase": phases,
+        "metrics": metrics,
+    }
+
+# ================= CAPACITY =================
+# Dialers poll this before placing calls routed to this worker. Gemini is
+# left out on purpose: when it is down or slow the router falls back to the
+# rules, FAQ and canned replies, so a call still works and refusing it would
+# only lose the call.
+capacity = CapacityManager([sarvam], lambda: len(live_calls), MAX_CALLS, loop_monitor)
+
+@app.get("/capacity")
+async def capacity_status():
+    status = capacity.stats()
+    return JSONResponse(status, status_code=200 if status["accepting"] else 503)
+
+# ================= READINESS =================
+# A fresh worker first opens its vendor connections, builds the LLM client
+# (importing google.genai in a thread) and caches the scripted audio. GET
+# /ready answers 503 until all three are done, so the platform only routes
+# calls to it once the first call pays no handshake, import or TTS cost.
+readiness = {"pools": False, "llm": False, "script": False}
+ready_sec = None
+
+async def warm_pools(retry_sec=5):
+    names = ["sarvam", "gemini"] if os.getenv("GEMINI_API_KEY") else ["sarvam"]
+    while True:
+        try:
+            await http_client.connect(names, WARM_CONNECTIONS)
+            break
+        except httpx.HTTPError as e:
+            log.warning(f"⚠️ Vendor connections not opened ({e!r}), retrying in {retry_sec}s")
+            await asyncio.sleep(retry_sec)
+    readiness["pools"] = True
+
+async def warm_llm():
+    try:
+        router.llm = await asyncio.to_thread(get_llm_client)
+    except Exception as e:
+        log.error(f"❌ LLM client not loaded, replies skip the LLM tier: {e!r}")
+    readiness["llm"] = True
+
+async def warm_start():
+    global ready_sec
+    await warm_pools()
+    await asyncio.gather(warm_llm(), warm_script())
+    readiness["script"] = True
+    ready_sec = round(time.monotonic() - BOOT, 3)
+    log.info(f"✅ Ready {ready_sec:.2f}s after start")
+
+@app.get("/ready")
+async def ready():
+    ok = all(readiness.values())
+    return JSONResponse({"ready": ok, **readiness, "ready_sec": ready_sec},
+                        status_code=200 if ok else 503)
+
+# ================= RECORDING =================
+# Every call's audio, both ways, and its turns; written by a background
+# thread, read back by call id (Exotel's call SID when it sends one).
+recorder = Recorder(RECORDING_DIR, RECORDING_MAX_PENDING_MB << 20) if RECORDING_DIR else None
+recordings = RecordingIndex(RECORDING_DIR) if RECORDING_DIR else None
+
+def record_turn(trace, outcome):
+    session = live_calls.get(trace.call_id)
+    if session is not None and session.rec is not None:
+        session.rec.event("turn", outcome=outcome, ms=trace.elapsed_ms(), **trace.meta)
+
+tracer.on_finish = record_turn
+registry.gauge("voicebot_recording_pending_bytes", "Recorded audio queued for the writer",
+               lambda: recorder.pending_bytes if recorder is not None else 0)
+registry.gauge("voicebot_recording_dropped", "Recording payloads dropped under backpressure",
+               lambda: recorder.dropped if recorder is not None else 0)
+
+def recordings_denied(request):
+    """Why a recordings request is refused, as a response, or None if it may go on."""
+    if recordings is None or not RECORDINGS_API_TOKEN:
+        return JSONResponse({"error": "recordings API is off"}, status_code=404)
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), RECORDINGS_API_TOKEN.encode()):
+        return JSONResponse({"error": "unauthorized"}, status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return None
+
+@app.get("/recordings/{call_id}")
+async def recording_info(call_id: str, request: Request):
+    if (denied := recordings_denied(request)) is not None:
+        return denied
+
+    def read():
+        rec = recordings.get(call_id)
+        if rec is None:
+            return None
+        return {"call_id": call_id, "encoding": rec.encoding, "summary": rec.summary,
+                "segments": rec.segments, "events": rec.events()}
+
+    info = await asyncio.to_thread(read)
+    if info is None:
+        return JSONResponse({"error": "unknown call"}, status_code=404)
+    return info
+
+@app.get("/recordings/{call_id}/{track}.wav")
+async def recording_audio(call_id: str, track: str, request: Request):
+    if (denied := recordings_denied(request)) is not None:
+        return denied
+    if track not in ("in", "out"):
+        return JSONResponse({"error": "no such recording"}, status_code=404)
+
+    def read():
+        rec = recordings.get(call_id)
+        return rec.wav(track) if rec is not None else None
+
+    wav = await asyncio.to_thread(read)
+    if wav is None:
+        return JSONResponse({"error": "unknown call"}, status_code=404)
+    return Response(wav, media_type="audio/wav")
 
 # ================= WS =================
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+class Session(CallState):
+    """One call: its place in the dialogue plus playback, STT and bookkeeping."""
+
+    __slots__ = ("silence_prompts", "turns", "bot_speaking", "closing", "reply", "stream_sid", "call_id",
+                 "started", "started_at", "codec", "early_intent", "trace", "rec", "prefetch")
+
+    def __init__(self):
+        super().__init__(dialogue.start)
+        self.silence_prompts = 0
+        self.turns = 0
+        self.bot_speaking = False
+        self.closing = False
+        self.reply = None  # task speaking the current reply
+        self.stream_sid = None
+        self.call_id = None
+        self.started = False
+        self.started_at = None
+        self.codec = CallCodec(CODEC_LAWS[MEDIA_ENCODING]) if MEDIA_ENCODING in CODEC_LAWS else None
+        self.early_intent = None
+        self.trace = None  # TurnTrace of the turn awaiting its reply
+        self.rec = None  # CallRecorder
+        self.prefetch = Prefetcher(tts_cache, tts_key, tts_timed, prefetch_budget, PREFETCH_PER_CALL)
+
 @app.websocket("/ws")
 async def ws_handler(ws: WebSocket):
     await ws.accept()
     log.info("🎧 Call connected")
 
-    session = {
-        "phase": "PITCH",
-        "step": 0,
-        "failures": 0,
-        "silence_prompts": 0,
-        "handoff_asked": False,
-        "bot_speaking": False,
-        "started": False,
-        "last_fail_ts": 0
-    }
-
-    buf, speech = b"", b""
-    silence_chunks, speech_chunks = 0, 0
+    session = Session()
+
+    vad = VAD(MIN_CHUNK_SIZE, SPEECH_THRESHOLD)
+    endpoint = Endpointer(vad, FRAME_SEC, MIN_SPEECH_SEC, ENDPOINT_MIN_SILENCE_SEC,
+                          ENDPOINT_MAX_SILENCE_SEC, PRE_ROLL_SEC)
+    frames = FrameAssembler(MIN_CHUNK_SIZE)
+    speech = UtteranceBuffer(MAX_UTTERANCE_SEC * SAMPLE_RATE * 2)
+    barge_chunks = 0
+    stt = None
+
+    def hear(frame):
+        nonlocal stt
+        speech.append(frame)
+        if stt is None:
+            stt = open_stt(session)
+        stt.update(speech.view())
+
+    def forget():
+        nonlocal stt
+        speech.clear()
+        if stt is not None:
+            stt.cancel()
+            close_stt(stt)
+            stt = None
 
     try:
         while True:
             msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(msg.get("code", 1000))
             if "text" not in msg:
                 continue
 
-            data = json.loads(msg["text"])
-
-            if data.get("event") == "start" and not session["started"]:
-                await speak(ws, PITCH_1, session)
-                await speak(ws, PITCH_2, session)
-                session["started"] = True
-                continue
-
-            if data.get("event") != "media" or session["bot_speaking"]:
+            data = loads(msg["text"])
+
+            if data.get("event") == "start" and not session.started:
+                session.started = True
+                start = data.get("start", {})
+                session.stream_sid = data.get("stream_sid") or start.get("stream_sid")
+                session.call_id = session.stream_sid or f"{WORKER_ID}:{id(ws)}"
+                session.started_at = time.time()
+                params = call_params(start)
+                if recorder is not None:
+                    session.rec = recorder.open(start.get("call_sid") or session.call_id, MEDIA_ENCODING,
+                                                   stream_sid=session.stream_sid, params=params)
+                call_started(session)
+                if params.get("pitch"):
+                    say(ws, session, params["pitch"], synth=pitch_synth(params))
+                else:
+                    say(ws, session, *dialogue.opening())
                 continue
 
-            chunk = base64.b64decode(data["media"]["payload"])
-            buf += chunk
-
-            if len(buf) < MIN_CHUNK_SIZE:
+            if data.get("event") != "media":
                 continue
-
-            frame, buf = buf[:MIN_CHUNK_SIZE], buf[MIN_CHUNK_SIZE:]
-
-            if is_speech(frame):
-                speech += frame
-                speech_chunks += 1
-                silence_chunks = 0
-            else:
-                silence_chunks += 1
-
-            if speech_chunks < MIN_SPEECH_CHUNKS and silence_chunks < SILENCE_CHUNKS:
-                continue
-
-            text = await asyncio.to_thread(stt_safe, speech)
-            speech, speech_chunks, silence_chunks = b"", 0, 0
-
-            if not text:
+            payload = data["media"]["payload"]
+            if session.rec is not None:
+                session.rec.audio_in(payload)
+            if session.closing:
                 continue
 
-            intent, meta = classify(text)
-            log.info(f"🗣 USER → {text} | intent={intent}")
-
-            # reset failures on healthy interaction
-            if intent in ["FAQ", "NEXT", "PREVIOUS", "REPEAT", "GREETING", "NEUTRAL"]:
-                session["failures"] = 0
-                session["handoff_asked"] = False
-
-            if intent == "PARTIAL":
-                continue  # wait for completion
+            chunk = base64.b64decode(payload)
+            if session.codec is not None:
+                chunk = session.codec.inbound(chunk)
+
+            ended = reprompt = False
+            for frame in frames.feed(chunk):
+                voiced = vad.is_speech(frame)
+
+                # While the bot talks, only a sustained run of caller speech
+                # counts: it interrupts playback and starts the utterance.
+                if session.bot_speaking:
+                    if not voiced:
+                        forget()
+                        endpoint.reset()
+                        barge_chunks = 0
+                        continue
+                    hear(frame)
+                    barge_chunks += 1
+                    if barge_chunks >= BARGE_IN_CHUNKS:
+                        await barge_in(ws, session)
+                        endpoint.start(barge_chunks)
+                        barge_chunks = 0
+                    continue
 
-            if intent == "FAQ":
-                for keys, ans in FAQS:
-                    if keys == meta:
-                        await speak(ws, ans, session)
-                        await speak(ws, "You can say next, repeat, or previous.", session)
+                event = endpoint.push(frame, voiced)
+                if event is START or event is SPEECH:
+                    for pcm in endpoint.take():
+                        hear(pcm)
+                elif event is NOISE:
+                    stt_avoided("noise")
+                elif event is SILENCE:
+                    stt_avoided("silence")
+                    if endpoint.idle_sec >= SILENCE_REPROMPT_SEC:
+                        reprompt = True
                         break
-                continue
-
-            if session["phase"] == "PITCH":
-                if intent == "YES":
-                    session["phase"] = "STEPS"
-                    await speak(ws, STEPS[0], session)
-                    continue
-                if intent == "NO":
-                    await speak(ws, "Thank you for your time. Have a great day.", session)
+                if event is END or speech.full:
+                    ended = True
                     break
 
-            if intent == "NEXT":
-                session["step"] += 1
-                if session["step"] >= len(STEPS):
-                    await speak(ws, "Your process is complete. Thank you.", session)
-                    break
-                await speak(ws, STEPS[session["step"]], session)
+            # Nothing heard for SILENCE_REPROMPT_SEC: reprompt without STT,
+            # and hang up after MAX_SILENCE_PROMPTS unanswered reprompts.
+            if reprompt:
+                endpoint.reset()
+                if session.trace is not None:
+                    tracer.finish(session.trace, "no_reply")
+                    session.trace = None
+                session.silence_prompts += 1
+                log.info(f"🔇 Caller silent, reprompt {session.silence_prompts}")
+                if session.silence_prompts > MAX_SILENCE_PROMPTS:
+                    say(ws, session, GOODBYE, end=True)
+                else:
+                    say(ws, session, SILENCE_PROMPT)
                 continue
 
-            if intent == "PREVIOUS":
-                session["step"] = max(0, session["step"] - 1)
-                await speak(ws, STEPS[session["step"]], session)
+            if not ended:
                 continue
 
-            if intent == "REPEAT":
-                await speak(ws, STEPS[session["step"]], session)
+            if session.trace is not None:
+                tracer.finish(session.trace, "no_reply")
+            trace = session.trace = tracer.turn(session.call_id)
+            trace.meta["endpoint_ms"] = round(endpoint.window * FRAME_SEC * 1000)
+
+            # With speculative or streaming STT the transcript is usually
+            # already in hand by now; only new audio costs a round trip.
+            trace.mark("stt_request")
+            text = await stt.finish(speech.view()) if stt is not None else ""
+            trace.mark("stt_response")
+            if stt is not None:
+                trace.meta["stt_reused"] = stt.reused > 0
+                close_stt(stt)
+                stt = None
+            speech.clear()
+            endpoint.reset()
+            session.early_intent = None
+
+            if text is None:
+                degraded.inc("stt")
+                session.trace = None
+                tracer.finish(trace, "stt_failed")
+                say(ws, session, STT_RETRY_PROMPT)
                 continue
 
-            if intent == "HUMAN":
-                await speak(ws, "Connecting you to a representative now.", session)
-                break
-
-            # UNKNOWN
-            now = time.time()
-            if now - session["last_fail_ts"] > FAIL_COOLDOWN_SEC:
-                session["failures"] += 1
-                session["last_fail_ts"] = now
+            if not text:
+                session.trace = None
+                tracer.finish(trace, "empty")
+                continue
 
-                if session["failures"] >= MAX_CONFUSION and not session["handoff_asked"]:
-                    session["handoff_asked"] = True
-                    await speak(ws, "Would you like me to connect you to a representative?", session)
-                else:
-                    await speak(ws, "You can say next, repeat, previous, or no.", session)
+            route = await router.route(text, session.stream_sid)
+            intent, meta = route.intent, route.meta
+            trace.mark("classified")
+            trace.meta.update(intent=intent, tier=route.tier)
+            session.turns += 1
+            session.silence_prompts = 0
+            log.info(f"🗣 USER → {text} | intent={intent} tier={route.tier}")
+            if session.rec is not None:
+                session.rec.event("user", text=text, intent=intent, tier=route.tier)
+
+            texts, end = dialogue.step(session, intent, meta, route.text)
+            if isinstance(route.text, LLMReply) and not any(t is route.text for t in texts):
+                await route.text.aclose()
+            if texts:
+                # An LLM reply's first sentence plays while the rest is generated.
+                say(ws, session, *texts, end=end, synth=tts_dynamic if intent == "LLM" else tts_framed)
 
     except WebSocketDisconnect:
         log.info("🔌 Call disconnected")
+    finally:
+        if session.reply is not None:
+            session.reply.cancel()
+        forget()
+        if router.llm is not None:
+            router.llm.end_session(session.stream_sid)
+        if session.trace is not None:
+            tracer.finish(session.trace, "no_reply")
+        tracer.end_call(session.call_id)
+        if session.rec is not None:
+            session.rec.close(turns=session.turns)
+        if session.started:
+            call_ended(session)
 
 # ================= START =================
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=PORT)
+    if WORKERS > 1:
+        workers.serve("server:app", "0.0.0.0", PORT, WORKERS, REUSE_PORT)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=PORT)
@@ -0,0 +1,271 @@
+"""Key-value store for state shared between worker processes.
+
+Values are JSON documents; integers double as counters for ``incr``. Three
+backends sit behind the same async interface, chosen by URL:
+
+* ``memory://``: a dict in this process; fine for a single worker.
+* ``sqlite:///path/state.db``: one WAL-mode file shared by every worker on
+  the host. Queries run in a thread so the event loop never waits on disk.
+* ``redis://host:port/db``: any Redis-compatible server, spoken to over a
+  minimal built-in RESP client. ``mini_redis.py`` is a local stand-in for
+  development and load tests.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class MemoryStore:
+    def __init__(self):
+        self._data = {}  # key -> (json text, expires at or None)
+
+    def _live(self, key):
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.time():
+            del self._data[key]
+            return None
+        return item
+
+    async def get(self, key):
+        item = self._live(key)
+        return json.loads(item[0]) if item else None
+
+    async def get_many(self, keys):
+        return [await self.get(k) for k in keys]
+
+    async def set(self, key, value, ttl=None):
+        self._data[key] = (json.dumps(value), time.time() + ttl if ttl else None)
+
+    async def set_nx(self, key, value, ttl=None):
+        if self._live(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key):
+        self._data.pop(key, None)
+
+    async def incr(self, key, n=1):
+        item = self._live(key)
+        value = (json.loads(item[0]) if item else 0) + n
+        self._data[key] = (json.dumps(value), item[1] if item else None)
+        return value
+
+    async def scan(self, prefix):
+        return {k: json.loads(item[0]) for k in list(self._data)
+                if k.startswith(prefix) and (item := self._live(k)) is not None}
+
+    async def close(self):
+        pass
+
+
+class SQLiteStore:
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _tx(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    async def _run(self, fn, *args):
+        def locked():
+            with self._lock:
+                return fn(*args)
+        return await asyncio.to_thread(locked)
+
+    def _get(self, keys):
+        marks = ",".join("?" * len(keys))
+        rows = self._db.execute(
+            f"SELECT key, value FROM kv WHERE key IN ({marks}) AND (expires IS NULL OR expires > ?)",
+            (*keys, time.time())).fetchall()
+        found = dict(rows)
+        return [json.loads(found[k]) if k in found else None for k in keys]
+
+    def _set(self, key, value, ttl, only_new):
+        now = time.time()
+        expires = now + ttl if ttl else None
+        with self._tx():
+            if only_new and self._db.execute(
+                    "SELECT 1 FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, now)).fetchone():
+                return False
+            self._db.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (key, json.dumps(value), expires))
+            return True
+
+    def _incr(self, key, n):
+        now = time.time()
+        with self._tx():
+            row = self._db.execute("SELECT value, expires FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                                   (key, now)).fetchone()
+            value = (json.loads(row[0]) if row else 0) + n
+            self._db.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)",
+                             (key, json.dumps(value), row[1] if row else None))
+            return value
+
+    def _scan(self, prefix):
+        # Escape LIKE wildcards so the prefix matches literally.
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        rows = self._db.execute(
+            "SELECT key, value FROM kv WHERE key LIKE ? ESCAPE '\\' AND (expires IS NULL OR expires > ?)",
+            (pattern, time.time())).fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    async def get(self, key):
+        return (await self._run(self._get, [key]))[0]
+
+    async def get_many(self, keys):
+        return await self._run(self._get, list(keys)) if keys else []
+
+    async def set(self, key, value, ttl=None):
+        await self._run(self._set, key, value, ttl, False)
+
+    async def set_nx(self, key, value, ttl=None):
+        return await self._run(self._set, key, value, ttl, True)
+
+    async def delete(self, key):
+        await self._run(self._db.execute, "DELETE FROM kv WHERE key = ?", (key,))
+
+    async def incr(self, key, n=1):
+        return await self._run(self._incr, key, n)
+
+    async def scan(self, prefix):
+        return await self._run(self._scan, prefix)
+
+    async def close(self):
+        await self._run(self._db.close)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisStore:
+    """Just enough RESP2 for this interface, over one connection per process."""
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0):
+        self.host, self.port, self.db = host, port, db
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        self._conn = (reader, writer)
+        if self.db:
+            await self._call_locked("SELECT", self.db)
+
+    @staticmethod
+    def _encode(args):
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            a = a if isinstance(a, bytes) else str(a).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(a), a))
+        return b"".join(out)
+
+    async def _reply(self, reader):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("redis connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RedisError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            n = int(body)
+            return None if n < 0 else (await reader.readexactly(n + 2))[:-2].decode()
+        if kind == b"*":
+            n = int(body)
+            return None if n < 0 else [await self._reply(reader) for _ in range(n)]
+        raise RuntimeError(f"bad RESP reply {line!r}")
+
+    async def _call_locked(self, *args):
+        reader, writer = self._conn
+        writer.write(self._encode(args))
+        await writer.drain()
+        return await self._reply(reader)
+
+    async def call(self, *args):
+        async with self._lock:
+            if self._conn is None:
+                await self._connect()
+            try:
+                return await self._call_locked(*args)
+            except RedisError:
+                raise
+            except BaseException:
+                # A reply left unread (error or cancellation) would desync the stream.
+                self._conn[1].close()
+                self._conn = None
+                raise
+
+    async def get(self, key):
+        v = await self.call("GET", key)
+        return json.loads(v) if v is not None else None
+
+    async def get_many(self, keys):
+        if not keys:
+            return []
+        return [json.loads(v) if v is not None else None for v in await self.call("MGET", *keys)]
+
+    async def set(self, key, value, ttl=None):
+        args = ["SET", key, json.dumps(value)]
+        if ttl:
+            args += ["PX", int(ttl * 1000)]
+        await self.call(*args)
+
+    async def set_nx(self, key, value, ttl=None):
+        args = ["SET", key, json.dumps(value), "NX"]
+        if ttl:
+            args += ["PX", int(ttl * 1000)]
+        return await self.call(*args) == "OK"
+
+    async def delete(self, key):
+        await self.call("DEL", key)
+
+    async def incr(self, key, n=1):
+        return await self.call("INCRBY", key, n)
+
+    async def scan(self, prefix):
+        keys, cursor = [], "0"
+        glob = "".join(f"[{c}]" if c in "*?[]\\" else c for c in prefix) + "*"
+        while True:
+            cursor, batch = await self.call("SCAN", cursor, "MATCH", glob, "COUNT", 500)
+            keys += batch
+            if cursor == "0":
+                break
+        return {k: v for k, v in zip(keys, await self.get_many(keys)) if v is not None}
+
+    async def close(self):
+        if self._conn is not None:
+            self._conn[1].close()
+            self._conn = None
+
+
+def open_store(url="memory://"):
+    u = urlparse(url)
+    if u.scheme == "memory":
+        return MemoryStore()
+    if u.scheme == "sqlite":
+        # sqlite:///relative.db or sqlite:////absolute/path.db
+        return SQLiteStore(url[len("sqlite:///"):])
+    if u.scheme == "redis":
+        return RedisStore(u.hostname or "127.0.0.1", u.port or 6379, int(u.path.lstrip("/") or 0))
+    raise ValueError(f"unsupported state store {url!r}")
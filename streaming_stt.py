@@ -0,0 +1,168 @@
+"""Incremental speech-to-text for one utterance at a time.
+
+Two strategies share the ``update(view)`` / ``finish(view)`` interface, where
+``view`` is the utterance-so-far (e.g. ``UtteranceBuffer.view()``):
+
+* ``SpeculativeSTT`` re-submits the growing utterance to a batch STT call
+  every ``interval`` seconds of new audio while the caller is still talking.
+  Each result is a partial transcript; if the last one already covers all
+  the audio when speech ends, it *is* the final transcript and the
+  end-of-utterance round trip is skipped.
+* ``StreamingSTT`` forwards new audio to a streaming-capable backend as it
+  arrives and relays the backend's partials.
+
+``FakeStreamingBackend`` and ``FakeBatchSTT`` stand in for a vendor in tests.
+They make up their transcripts, so server.py never registers them.
+"""
+import asyncio
+
+
+def _discard(task):
+    if not task.cancelled():
+        task.exception()
+
+
+class SpeculativeSTT:
+    def __init__(self, transcribe, bytes_per_sec, interval=0.6, on_partial=None):
+        self.transcribe = transcribe
+        self.step = int(bytes_per_sec * interval) if interval else None  # None: batch only
+        self.on_partial = on_partial
+        self.partial = ""
+        self.requests = 0
+        self.reused = 0
+        self._done_len = 0
+        self._task = None
+        self._task_len = 0
+
+    def update(self, view):
+        n = len(view)
+        if self.step is None or n - max(self._done_len, self._task_len) < self.step:
+            return
+        if self._task is not None and not self._task.done():
+            return  # one speculative request at a time
+        self._task_len = n
+        self._task = asyncio.create_task(self._speculate(view[:n]))
+        self._task.add_done_callback(_discard)
+
+    async def _speculate(self, view):
+        self.requests += 1
+        text = await self.transcribe(view)
+        self._done_len, self.partial = len(view), text
+        if text and self.on_partial:
+            self.on_partial(text)
+        return text
+
+    async def finish(self, view):
+        n = len(view)
+        if self._task is not None and self._task_len == n and not self._task.done():
+            self.reused += 1
+            return await self._task
+        if self._done_len == n:
+            self.reused += 1
+            return self.partial
+        self.cancel()
+        self.requests += 1
+        return await self.transcribe(view)
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+
+class StreamingSTT:
+    def __init__(self, backend, sample_rate, on_partial=None):
+        self.on_partial = on_partial
+        self.partial = ""
+        self.requests = 1
+        self.reused = 0
+        self._sent = 0
+        self._queue = asyncio.Queue()
+        self._session = None
+        self._pump = asyncio.create_task(self._run(backend, sample_rate))
+        self._pump.add_done_callback(_discard)
+
+    def _partial(self, text):
+        self.partial = text
+        if text and self.on_partial:
+            self.on_partial(text)
+
+    async def _run(self, backend, sample_rate):
+        self._session = await backend.open(sample_rate, self._partial)
+        try:
+            while True:
+                chunk = await self._queue.get()
+                if chunk is None:
+                    return await self._session.end()
+                await self._session.send(chunk)
+        finally:
+            # Runs on cancel too, so a barge-in never leaks the backend's socket.
+            close = getattr(self._session, "aclose", None) or getattr(self._session, "close", None)
+            if close is not None:
+                await close()
+
+    def update(self, view):
+        if len(view) > self._sent:
+            self._queue.put_nowait(view[self._sent:])
+            self._sent = len(view)
+
+    async def finish(self, view):
+        self.update(view)
+        self._queue.put_nowait(None)
+        return await self._pump
+
+    def cancel(self):
+        self._pump.cancel()
+
+
+class FakeStreamingBackend:
+    """Streams a scripted transcript back, one word per ``bytes_per_word``."""
+
+    def __init__(self, transcript="yes I am interested", bytes_per_word=6400, latency=0.0):
+        self.transcript = transcript
+        self.bytes_per_word = bytes_per_word
+        self.latency = latency
+
+    async def open(self, sample_rate, on_partial):
+        return _FakeStreamingSession(self, on_partial)
+
+
+class _FakeStreamingSession:
+    def __init__(self, backend, on_partial):
+        self.backend = backend
+        self.on_partial = on_partial
+        self.received = 0
+        self.closed = False
+        self.words = backend.transcript.split()
+
+    def _text(self):
+        n = max(1, self.received // self.backend.bytes_per_word)
+        return " ".join(self.words[:n])
+
+    async def send(self, chunk):
+        before = self._text()
+        self.received += len(chunk)
+        if self._text() != before:
+            self.on_partial(self._text())
+
+    async def end(self):
+        await asyncio.sleep(self.backend.latency)
+        return self.backend.transcript if self.received else ""
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBatchSTT:
+    """Batch STT stand-in: returns as many scripted words as the audio covers."""
+
+    def __init__(self, transcript="yes I am interested", bytes_per_word=6400, latency=0.05):
+        self.transcript = transcript
+        self.bytes_per_word = bytes_per_word
+        self.latency = latency
+        self.calls = 0
+
+    async def __call__(self, pcm):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        words = self.transcript.split()
+        return " ".join(words[:max(1, len(pcm) // self.bytes_per_word)]) if len(pcm) else ""
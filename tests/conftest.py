@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py and server.py read the environment at import; keep their state
+# in a scratch directory and their vendors pointed at test values.
+_tmp = tempfile.mkdtemp()
+os.environ.update(TTS_CACHE_DIR=os.path.join(_tmp, "tts"), CAMPAIGN_DIR=os.path.join(_tmp, "campaigns"),
+                  STATE_STORE="memory://", RECORDING_DIR=os.path.join(_tmp, "recordings"),
+                  RECORDINGS_API_TOKEN="", MEDIA_ENCODING="pcm16",
+                  SARVAM_API_KEY="test", EXOTEL_SID="AC1", EXOTEL_API_KEY="k", EXOTEL_API_TOKEN="t",
+                  EXOTEL_FROM_NUMBER="+910000000000", PUBLIC_HOSTNAME="dialer.test",
+                  VOICEBOT_HOSTNAME="voicebot.test", GEMINI_API_KEY="")
@@ -0,0 +1,55 @@
+from audio_buffer import FrameAssembler, UtteranceBuffer
+
+STREAM = bytes(range(256)) * 40
+
+
+def test_frames_are_split_the_same_whatever_the_chunking():
+    a = FrameAssembler(320, max_chunk=500)
+    frames, pos = [], 0
+    for n in [100, 500, 1, 319, 2000, 3, 640]:  # 2000 exceeds max_chunk, so the storage grows
+        frames += [bytes(f) for f in a.feed(STREAM[pos:pos + n])]
+        pos += n
+    assert b"".join(frames) == STREAM[:len(frames) * 320]
+    assert all(len(f) == 320 for f in frames)
+    assert a.pending == pos - len(frames) * 320
+
+
+def test_unconsumed_frames_come_first_on_the_next_feed():
+    a = FrameAssembler(4)
+    first = next(a.feed(b"abcdefghij"))
+    assert bytes(first) == b"abcd"
+    assert [bytes(f) for f in a.feed(b"kl")] == [b"efgh", b"ijkl"]
+
+
+def test_utterance_buffer_stops_at_its_cap():
+    u = UtteranceBuffer(max_bytes=10, initial_bytes=10)
+    assert u.append(b"abcdef")
+    assert not u.append(b"ghijkl")
+    assert u.full and len(u) == 10
+    assert bytes(u.view()) == b"abcdefghij"
+    u.clear()
+    assert len(u) == 0 and not u.full
+
+
+def test_utterance_buffer_doubles_up_to_its_cap():
+    u = UtteranceBuffer(max_bytes=1000, initial_bytes=100)
+    sizes = []
+    for _ in range(12):
+        u.append(b"x" * 90)
+        sizes.append(u.capacity)
+    assert sizes[0] == 100 and sorted(set(sizes)) == [100, 200, 400, 800, 1000]
+    assert len(u) == 1000 and u.full
+
+
+def test_views_survive_growth_and_stay_valid_until_refilled():
+    u = UtteranceBuffer(max_bytes=1000, initial_bytes=8)
+    u.append(b"hello")
+    before = u.view()
+    u.append(b" world")  # grows: the old view keeps the old storage
+    assert bytes(before) == b"hello"
+    assert bytes(u.view()) == b"hello world"
+    sent = u.view()
+    u.clear()
+    assert bytes(sent) == b"hello world"  # clear alone leaves it intact
+    u.append(b"HELLO")
+    assert bytes(sent[:5]) == b"HELLO"  # refilling reuses the storage
@@ -0,0 +1,154 @@
+import asyncio
+import io
+import os
+import time
+
+from campaign import Campaign, CampaignManager
+from state_store import MemoryStore
+
+CSV = (b"phone_number,pitch,name\n"
+       b"9876543210,Hi {name},Asha\n"
+       b"12345,Hi {name},Bad\n"
+       b"+91 98765 43211,Hi {name},Ravi\n"
+       b"09876543210,Hi {name},Again\n"
+       b"9876543212,Hi {name},Meera\n")
+
+
+def offsets(data=CSV):
+    """Byte offset of each data line."""
+    out, pos = [], 0
+    for line in data.splitlines(keepends=True):
+        out.append(pos)
+        pos += len(line)
+    return out[1:]
+
+
+def dialer(calls, gate=None):
+    async def dial(number, row):
+        calls.append((number, row["name"]))
+        if gate is not None and number in gate:
+            await gate[number].wait()
+        return f"sid-{len(calls)}"
+    return dial
+
+
+def test_runs_every_unique_valid_row_and_ends_at_the_file_end(tmp_path):
+    async def main():
+        calls = []
+        store = MemoryStore()
+        c = await Campaign.create(io.BytesIO(CSV), str(tmp_path), dialer(calls), store, "w1", cps=1000)
+        await c.run()
+        return c, calls, await store.get(c.key)
+
+    c, calls, saved = asyncio.run(main())
+    assert calls == [("+919876543210", "Asha"), ("+919876543211", "Ravi"), ("+919876543212", "Meera")]
+    assert c.counts["invalid"] == 1 and c.counts["duplicates"] == 1 and c.counts["dialed"] == 3
+    assert saved["status"] == "done"
+    assert saved["cursor"] == len(CSV) == os.path.getsize(c.csv_path)
+    assert saved["settled"] == []
+
+
+def test_cursor_waits_for_the_oldest_row_still_dialing(tmp_path):
+    async def main():
+        calls = []
+        gate = {"+919876543210": asyncio.Event()}
+        c = await Campaign.create(io.BytesIO(CSV), str(tmp_path), dialer(calls, gate), MemoryStore(), "w1",
+                                  cps=1000)
+        task = asyncio.create_task(c.run())
+        while len(calls) < 3:
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.01)
+        during = c.state()
+        gate["+919876543210"].set()
+        await task
+        return c, during
+
+    c, during = asyncio.run(main())
+    first, bad, ravi, again, meera = offsets()
+    assert during["cursor"] == first
+    assert during["settled"] == [bad, ravi, again, meera]
+    assert (c.cursor, c.state()["settled"]) == (len(CSV), [])
+
+
+def test_resume_dials_only_unsettled_rows(tmp_path):
+    async def main():
+        calls = []
+        store = MemoryStore()
+        first = await Campaign.create(io.BytesIO(CSV), str(tmp_path), dialer(calls), store, "w1")
+        _, bad, ravi, again, meera = offsets()
+        # Stopped with Asha and the bad row settled, Ravi in flight and Meera settled.
+        state = {**first.state(), "status": "paused", "cursor": ravi, "settled": [meera],
+                 "counts": {**first.counts, "invalid": 1, "dialed": 2}}
+        c = Campaign.from_state(state, str(tmp_path), dialer(calls), store, "w2", cps=1000)
+        await c.run()
+        return c, calls
+
+    c, calls = asyncio.run(main())
+    assert calls == [("+919876543211", "Ravi")]  # the duplicate of Asha is still recognized
+    assert c.counts["duplicates"] == 1 and c.counts["invalid"] == 1 and c.counts["dialed"] == 3
+    assert c.cursor == len(CSV)
+
+
+def numbers(n, start):
+    return b"".join(b"98765%05d,Hi {name},N%d\n" % (start + i, i) for i in range(n))
+
+
+def test_campaigns_share_one_rate_and_one_call_cap(tmp_path):
+    cps, max_active, per_campaign = 50, 3, 15
+
+    async def main():
+        store = MemoryStore()
+        dialed, live, peak = [], set(), [0]
+
+        def manager(owner):
+            async def dial(number, row):
+                sid = f"{owner}-{number}"
+                dialed.append(time.monotonic())
+                live.add(sid)
+                peak[0] = max(peak[0], len(live))
+                asyncio.get_running_loop().call_later(0.02, hang_up, sid)
+                return sid
+
+            def hang_up(sid):
+                live.discard(sid)
+                asyncio.create_task(managers[owner].call_ended(sid))
+
+            return CampaignManager(store, owner, str(tmp_path / owner), dial, cps=cps, max_active=max_active)
+
+        managers = {}
+        for owner in ("w1", "w2"):
+            os.makedirs(tmp_path / owner)
+            managers[owner] = manager(owner)
+            managers[owner].limit.poll = 0.005  # so the cap, not polling, bounds the rate
+        # Two campaigns on one worker and one on another, all dialing at once.
+        campaigns = [await managers["w1"].create(io.BytesIO(numbers(per_campaign, 0))),
+                     await managers["w1"].create(io.BytesIO(numbers(per_campaign, 100))),
+                     await managers["w2"].create(io.BytesIO(numbers(per_campaign, 200)))]
+        await asyncio.gather(*(c._task for c in campaigns))
+        while live:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+        return sorted(dialed), peak[0], await store.get("campaign-active")
+
+    dialed, peak, active = asyncio.run(main())
+    assert len(dialed) == 3 * per_campaign
+    window = 10
+    for i in range(len(dialed) - window):
+        # Each dial owns a distinct 1/cps slot; allow one slot of timer slack.
+        assert dialed[i + window] - dialed[i] >= (window - 1) / cps
+    assert peak <= max_active
+    assert active == 0
+
+
+def test_slots_held_by_a_dead_manager_are_returned(tmp_path):
+    async def main():
+        store = MemoryStore()
+        dead = CampaignManager(store, "w1", str(tmp_path), dialer([]), max_active=2)
+        await dead.limit.acquire()
+        await dead.limit.acquire()
+        alive = CampaignManager(store, "w2", str(tmp_path), dialer([]), max_active=2)
+        await alive.resume_all()  # w1 never refreshed its heartbeat
+        await alive.limit.acquire()
+        return await store.get("campaign-active"), await store.get("campaign-held:w1")
+
+    assert asyncio.run(main()) == (1, None)
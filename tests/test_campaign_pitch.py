@@ -0,0 +1,63 @@
+"""A campaign row from config.py's dialer to the pitch audio server.py sends."""
+import asyncio
+import base64
+import json
+import xml.etree.ElementTree as ET
+from urllib.parse import parse_qs
+
+import httpx
+from fastapi.testclient import TestClient
+
+import config
+import http_client
+import server
+import tts_api
+from audio_encoding import pcm_to_wav
+from pitch import segments
+
+ROW = {"pitch": "Hi {name}, you are approved for {amount} rupees.", "name": "Asha & Co", "amount": "50000"}
+
+
+def speech(text):
+    return bytes([len(text) % 251]) * (len(text) * 64)
+
+
+def sarvam(request):
+    text = json.loads(request.content)["text"]
+    wav = pcm_to_wav(speech(text), tts_api.SAMPLE_RATE)
+    return httpx.Response(200, json={"audios": [base64.b64encode(wav).decode()]})
+
+
+def test_dialed_row_plays_its_personalized_pitch():
+    dialed = []
+
+    def exotel(request):
+        dialed.append({k: v[0] for k, v in parse_qs(request.content.decode()).items()})
+        return httpx.Response(200, json={"Call": {"Sid": "CA1"}})
+
+    for name, handler in (("sarvam", sarvam), ("exotel", exotel)):
+        u = http_client.upstream(name)
+        u._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=u.base_url)
+
+    assert asyncio.run(config.dial_campaign_row("+919876543210", ROW)) == "CA1"
+    call = dialed[0]
+    assert call["Url"] == "https://voicebot.test/exoml"
+
+    client = TestClient(server.app)
+    r = client.post("/exoml", data={"CallSid": "CA1", "CustomField": call["CustomField"]},
+                    headers={"host": "voicebot.test"})
+    stream = ET.fromstring(r.text).find("Connect/Stream")
+    assert stream.get("url") == "wss://voicebot.test/ws"
+    params = {p.get("name"): p.get("value") for p in stream.findall("Parameter")}
+    assert params == ROW
+
+    expected = b"".join(speech(t) for t in segments(ROW["pitch"], ROW))
+    audio = b""
+    with client.websocket_connect("/ws") as ws:
+        ws.send_text(json.dumps({"event": "start", "start": {"stream_sid": "S1", "call_sid": "CA1",
+                                                             "custom_parameters": params}}))
+        while len(audio) < len(expected):
+            msg = json.loads(ws.receive_text())
+            if msg["event"] == "media":
+                audio += base64.b64decode(msg["media"]["payload"])
+    assert audio == expected
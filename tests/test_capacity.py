@@ -0,0 +1,98 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from capacity import CLOSED, HALF_OPEN, OPEN, Breaker, CapacityManager, WorkerFleet
+from state_store import MemoryStore
+
+
+def upstream(name, **breaker):
+    return SimpleNamespace(name=name, breaker=Breaker(name, **breaker), waiting=0, in_flight=0,
+                           max_concurrency=16)
+
+
+def trip(breaker):
+    for _ in range(breaker.min_requests):
+        breaker.record(0.01, False)
+    assert breaker.state == OPEN
+
+
+def test_breaker_opens_on_failures():
+    b = Breaker("v", min_requests=4, window=4)
+    for _ in range(3):
+        b.record(0.01, False)
+    assert b.state == CLOSED
+    b.record(0.01, False)
+    assert b.state == OPEN
+    assert not b.allow()
+
+
+def test_breaker_half_opens_after_cooldown_without_requests():
+    b = Breaker("v", min_requests=2, cooldown=0.05)
+    trip(b)
+    assert b.current_state() == OPEN
+    time.sleep(0.06)
+    assert b.current_state() == HALF_OPEN
+    assert b.allow()  # the probe
+    b.record(0.01, True)
+    assert b.current_state() == CLOSED
+
+
+def test_manager_recovers_after_cooldown():
+    exotel = upstream("exotel", min_requests=2, cooldown=0.05)
+    manager = CapacityManager([exotel], lambda: 0, max_calls=10, probe_call_sec=60)
+    trip(exotel.breaker)
+    assert manager.admit() == "exotel circuit open"
+
+    time.sleep(0.06)
+    assert manager.check() is None
+    assert manager.admit() is None  # the probe call
+    assert manager.admit() == "exotel circuit half_open"  # one probe call at a time
+
+    assert exotel.breaker.allow()
+    exotel.breaker.record(0.01, True)
+    assert manager.admit() is None
+    assert manager.admit() is None
+    assert manager.stats()["accepting"]
+
+
+def test_manager_refuses_at_max_calls_and_when_saturated():
+    sarvam = upstream("sarvam")
+    calls = [0]
+    manager = CapacityManager([sarvam], lambda: calls[0], max_calls=2)
+    assert manager.admit() is None
+    calls[0] = 2
+    assert manager.admit() == "max calls"
+    calls[0] = 0
+    sarvam.waiting = 1
+    assert manager.admit() == "sarvam saturated"
+    assert manager.refused == {"max calls": 1, "sarvam saturated": 1}
+
+
+def heartbeat(active_calls, accepting):
+    return {"pid": 1, "active_calls": active_calls, "stats": {"capacity": {"accepting": accepting}}}
+
+
+def test_fleet_admission_counts_the_workers_calls():
+    async def main():
+        store = MemoryStore()
+        fleet = WorkerFleet(store)
+        manager = CapacityManager([upstream("exotel")], fleet.active_calls, max_calls=5, fleet=fleet)
+        await fleet.refresh()
+        refused = [manager.admit()]  # no worker has published yet
+        await store.set("worker:a", heartbeat(2, True))
+        await store.set("worker:b", heartbeat(2, False))
+        await fleet.refresh()
+        refused.append(manager.admit())
+        await store.set("worker:b", heartbeat(3, False))
+        await fleet.refresh()
+        refused.append(manager.admit())
+        await store.set("worker:a", heartbeat(1, False))
+        await store.set("worker:b", heartbeat(1, False))
+        await fleet.refresh()
+        refused.append(manager.admit())
+        return refused, manager.stats()["fleet"]
+
+    refused, stats = asyncio.run(main())
+    assert refused == ["no worker accepting", None, "max calls", "no worker accepting"]
+    assert stats == {"workers": 2, "accepting": 0, "active_calls": 2}
@@ -0,0 +1,78 @@
+import pytest
+
+from dialogue import Dialogue
+
+FAQS = {"emi": "The EMI depends on the tenure."}
+
+
+@pytest.fixture
+def dialogue():
+    return Dialogue.from_file(faqs=FAQS)
+
+
+def say(dialogue, *names):
+    return tuple(dialogue.prompts[n] for n in names)
+
+
+def test_walks_the_pitch_and_steps_to_the_end(dialogue):
+    state = dialogue.new_state()
+    assert dialogue.opening() == say(dialogue, "PITCH_1", "PITCH_2")
+    assert dialogue.step(state, "YES") == (say(dialogue, "STEP_1"), False)
+    assert dialogue.step(state, "NEXT") == (say(dialogue, "STEP_2"), False)
+    assert dialogue.step(state, "PREVIOUS") == (say(dialogue, "STEP_1"), False)
+    assert dialogue.step(state, "DONE") == (say(dialogue, "STEP_2"), False)
+    assert dialogue.step(state, "REPEAT") == (say(dialogue, "STEP_2"), False)
+    assert dialogue.step(state, "NEXT") == (say(dialogue, "STEP_3"), False)
+    assert dialogue.step(state, "NEXT") == (say(dialogue, "COMPLETE"), True)
+    assert dialogue.phase_name(state) == "COMPLETE"
+
+
+def test_no_during_the_pitch_ends_the_call(dialogue):
+    state = dialogue.new_state()
+    assert dialogue.step(state, "NO") == (say(dialogue, "GOODBYE"), True)
+
+
+def test_shared_transitions_apply_in_every_phase(dialogue):
+    state = dialogue.new_state()
+    dialogue.step(state, "YES")
+    assert dialogue.step(state, "FAQ", "emi") == ((FAQS["emi"], dialogue.prompts["MENU"]), False)
+    assert dialogue.step(state, "LLM", reply="A reply.") == (("A reply.",), False)
+    assert dialogue.step(state, "PARTIAL") == ((), False)
+    assert dialogue.phase_name(state) == "STEP_1"
+    assert dialogue.step(state, "HUMAN") == (say(dialogue, "HANDOFF"), True)
+
+
+def test_confusion_offers_a_handoff_after_max_misses(dialogue):
+    state = dialogue.new_state()
+    fallback, offer = (dialogue.fallback,), (dialogue.offer,)
+    assert dialogue.step(state, "GIBBERISH") == (fallback, False)
+    assert dialogue.step(state, "UNKNOWN") == ((), False)  # inside the cooldown
+    for expected in (fallback, offer, fallback):
+        state.last_fail -= dialogue.cooldown + 1
+        assert dialogue.step(state, "UNKNOWN") == (expected, False)
+    dialogue.step(state, "REPEAT")  # a reset intent clears the count
+    assert (state.failures, state.handoff_asked) == (0, False)
+    assert dialogue.phase_name(state) == "PITCH"
+
+
+def test_peek_does_not_move_the_call(dialogue):
+    state = dialogue.new_state()
+    assert dialogue.peek(state, "YES") == dialogue.prompts["STEP_1"]
+    assert dialogue.peek(state, "UNKNOWN") is None
+    assert dialogue.phase_name(state) == "PITCH"
+
+
+def test_next_replies_cover_the_phase_transitions(dialogue):
+    replies = dialogue.next_replies(dialogue.new_state())
+    for text in (*say(dialogue, "STEP_1", "GOODBYE", "PITCH_2", "HANDOFF"), FAQS["emi"]):
+        assert text in replies
+
+
+def test_unknown_references_are_rejected():
+    spec = {"prompts": {"A": "a", "FALLBACK": "f", "HANDOFF_OFFER": "h"},
+            "phases": {"START": {"say": ["A"], "on": {"YES": "NOWHERE"}}}}
+    with pytest.raises(ValueError, match="NOWHERE"):
+        Dialogue(spec)
+    spec["phases"]["START"] = {"say": ["MISSING"]}
+    with pytest.raises(ValueError, match="MISSING"):
+        Dialogue(spec)
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+from endpoint import END, NOISE, SILENCE, SPEECH, START, Endpointer
+
+FRAME_SEC = 0.1  # so min voiced is 3 frames, pre-roll 2, window 4..10 frames, starting at 6
+
+
+def endpointer(threshold=520):
+    return Endpointer(SimpleNamespace(threshold=threshold, min_threshold=520), FRAME_SEC)
+
+
+def run(ep, pattern):
+    """Push one frame per character ("x" voiced, "." quiet); return the events and audio taken."""
+    events, audio = [], []
+    for i, c in enumerate(pattern):
+        event = ep.push(bytes([i]), c == "x")
+        if event in (START, SPEECH):
+            audio += [f[0] for f in ep.take()]
+        if event is not None:
+            events.append((i, event))
+    return events, audio
+
+
+def test_utterance_keeps_pre_roll_and_inner_pauses_but_not_trailing_silence():
+    events, audio = run(endpointer(), "....xxx..xx......")
+    assert events == [(6, START), (9, SPEECH), (10, SPEECH), (15, END)]  # a 2-frame pause shrinks the window to 5
+    assert audio == [2, 3, 4, 5, 6, 7, 8, 9, 10]
+
+
+def test_short_burst_is_noise():
+    assert run(endpointer(), "xx......")[0] == [(7, NOISE)]
+
+
+def test_silence_events_count_idle_time():
+    ep = endpointer()
+    events, _ = run(ep, "." * 25)
+    assert events == [(9, SILENCE), (19, SILENCE)]
+    assert abs(ep.idle_sec - 2.5) < 1e-9
+
+
+def test_window_adapts_to_the_caller_and_to_a_noisy_line():
+    ep = endpointer()
+    assert ep.window == 6
+    run(ep, "xxx.x.x.x.x.x")  # one-frame pauses pull the average gap down
+    assert ep.window == ep.min_window == 4
+    slow = endpointer()
+    run(slow, "xxx" + ".....x" * 7)  # long pauses between words stretch it
+    assert slow.window == slow.max_window == 10
+    assert endpointer(threshold=520 * 2).window == 8  # noisy: 0.2 s more
+
+
+def test_barge_in_start_continues_the_utterance():
+    ep = endpointer()
+    ep.start(3)
+    assert ep.push(b"\x00", True) is SPEECH
@@ -0,0 +1,58 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+
+from codec import CallCodec
+from framing import EncodedAudio, FrameCache, loads, media_message
+
+PCM = np.arange(-4000, 4000, 5, dtype="<i2").tobytes()  # 3200 bytes
+FRAME, RATE = 640, 32000
+
+
+def test_media_message_is_what_json_dumps_gives():
+    payload = bytes(range(256))
+    expected = json.dumps({"event": "media", "media": {"payload": base64.b64encode(payload).decode()}})
+    assert media_message(payload) == expected
+    assert loads(expected)["media"]["payload"] == base64.b64encode(payload).decode()
+
+
+@pytest.mark.parametrize("encoding", ["pcm16", "ulaw", "alaw", "pcm8"])
+def test_encoded_frames_match_per_frame_encoding(encoding):
+    audio = EncodedAudio.encode(PCM + b"\x01\x00" * 10, encoding, FRAME, RATE)
+    law = {"ulaw": "ulaw", "alaw": "alaw", "pcm8": "pcm"}.get(encoding)
+    codec = CallCodec(law) if law else None
+    pcm = PCM + b"\x01\x00" * 10
+    expected = [media_message(codec.outbound(pcm[o:o + FRAME]) if codec else pcm[o:o + FRAME])
+                for o in range(0, len(pcm), FRAME)]
+    assert audio.messages == expected
+    secs = [sec for _, sec in audio.frames()]
+    assert secs == [FRAME / RATE] * 5 + [20 / RATE]
+
+
+def test_cache_serves_memory_then_disk(tmp_path):
+    cache = FrameCache(str(tmp_path), max_bytes=10**6)
+    assert cache.get("k", "ulaw") is None
+    audio = cache.put("k", "ulaw", PCM, FRAME, RATE)
+    cache.store("k", "ulaw", audio)
+    assert cache.get("k", "ulaw") is audio
+
+    restarted = FrameCache(str(tmp_path))
+    loaded = restarted.get("k", "ulaw")
+    assert loaded.messages == audio.messages
+    assert (loaded.frame_sec, loaded.last_sec) == (audio.frame_sec, audio.last_sec)
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.get("k", "alaw") is None  # one file per wire encoding
+
+
+def test_memory_is_bounded_least_recently_used_first():
+    one = EncodedAudio.encode(PCM, "pcm16", FRAME, RATE).nbytes
+    cache = FrameCache(max_bytes=2 * one)
+    for key in "abc":
+        cache.put(key, "pcm16", PCM, FRAME, RATE)
+        if key == "b":
+            cache.get("a", "pcm16")
+    assert cache.get("b", "pcm16") is None
+    assert cache.get("a", "pcm16") is not None and cache.get("c", "pcm16") is not None
+    assert cache.stats()["bytes"] == 2 * one
@@ -0,0 +1,84 @@
+import asyncio
+
+import httpx
+import pytest
+
+from capacity import OPEN, CircuitOpen
+from http_client import Upstream
+
+
+def vendor(handler, **kwargs):
+    u = Upstream("v", "https://vendor.test", backoff=0.001, **kwargs)
+    u._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=u.base_url)
+    return u
+
+
+def scripted(*outcomes):
+    """A handler answering each request with the next status, or raising the next error."""
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        outcome = outcomes[min(len(seen), len(outcomes)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome)
+    return handler, seen
+
+
+def test_transient_failures_are_retried():
+    handler, seen = scripted(503, httpx.ReadError("reset"), 200)
+    resp = asyncio.run(vendor(handler).get("/x"))
+    assert resp.status_code == 200 and len(seen) == 3
+
+
+def test_gives_up_after_the_retries():
+    handler, seen = scripted(502)
+    resp = asyncio.run(vendor(handler, retries=2).get("/x"))
+    assert resp.status_code == 502 and len(seen) == 3
+
+
+def test_non_idempotent_calls_retry_only_connection_errors():
+    handler, seen = scripted(httpx.ConnectError("refused"), 503)
+    resp = asyncio.run(vendor(handler).post("/call", idempotent=False))
+    assert resp.status_code == 503 and len(seen) == 2  # the 503 may have placed the call
+
+    handler, seen = scripted(httpx.ReadError("reset"))
+    with pytest.raises(httpx.ReadError):
+        asyncio.run(vendor(handler).post("/call", idempotent=False))
+    assert len(seen) == 1
+
+
+def test_breaker_opens_and_then_fails_fast():
+    handler, seen = scripted(500)
+    u = vendor(handler, retries=0)
+    u.breaker.min_requests = 4
+
+    async def main():
+        for _ in range(4):
+            await u.get("/x")
+        with pytest.raises(CircuitOpen):
+            await u.get("/x")
+
+    asyncio.run(main())
+    assert u.breaker.state == OPEN and len(seen) == 4
+    assert u.breaker.rejected == 1
+
+
+def test_concurrency_is_capped():
+    peak, active = [0], [0]
+
+    async def main():
+        async def handler(request):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+            return httpx.Response(200)
+
+        u = vendor(handler, max_concurrency=3)
+        await asyncio.gather(*(u.get("/x") for _ in range(10)))
+        return u
+
+    u = asyncio.run(main())
+    assert peak[0] == 3 and u.in_flight == 0 and u.waiting == 0
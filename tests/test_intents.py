@@ -0,0 +1,43 @@
+import pytest
+
+from intents import IntentEngine, normalize
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return IntentEngine.from_file()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Yes, please!", ("YES", None)),
+    ("not interested", ("NO", None)),  # the longer phrase wins over "interested"
+    ("I know", ("UNKNOWN", None)),  # "no" does not match inside "know"
+    ("no problem", ("YES", None)),
+    ("what", ("PARTIAL", None)),  # exact: only the whole utterance
+    ("what is the emi", ("FAQ", "emi")),
+    ("what are the processing charges", ("FAQ", "processing")),
+    ("how much loan can i get", ("FAQ", "limit")),
+    ("how much time will it take", ("UNKNOWN", None)),  # "how much" alone is not about money
+    ("I want to talk to a human, no more of this", ("HUMAN", None)),  # priority, not position
+    ("Okay.", ("NEUTRAL", None)),
+    ("go back", ("PREVIOUS", None)),
+    ("  ", ("EMPTY", None)),
+    ("tell me about the weather", ("UNKNOWN", None)),
+])
+def test_classify(engine, text, expected):
+    assert engine.classify(text) == expected
+
+
+def test_normalize_collapses_punctuation_and_case():
+    assert normalize("  Don't   STOP, now!! ") == "don't stop now"
+
+
+def test_prefix_rule_only_matches_at_the_start():
+    engine = IntentEngine([{"intent": "CALLBACK", "match": "prefix", "phrases": ["call me"]}])
+    assert engine.classify("call me later") == ("CALLBACK", None)
+    assert engine.classify("please call me later") == ("UNKNOWN", None)
+
+
+def test_unknown_match_kind_is_rejected():
+    with pytest.raises(ValueError):
+        IntentEngine([{"intent": "X", "match": "fuzzy", "phrases": ["x"]}])
@@ -0,0 +1,44 @@
+import asyncio
+import base64
+import json
+
+import httpx
+
+import http_client
+import tts_api
+from audio_encoding import pcm_to_wav
+from pitch import PitchRenderer, segments
+from tts_cache import TTSCache
+
+
+def speech(text):
+    """A distinct, text-length dependent PCM payload per text."""
+    return bytes([len(text) % 251]) * (len(text) * 64)
+
+
+def sarvam(request):
+    text = json.loads(request.content)["text"]
+    wav = pcm_to_wav(speech(text), tts_api.SAMPLE_RATE)
+    return httpx.Response(200, json={"audios": [base64.b64encode(wav).decode()]})
+
+
+def test_rendered_pitch_is_the_sum_of_its_segments_pcm(tmp_path):
+    async def main():
+        u = http_client.upstream("sarvam")
+        u._client = httpx.AsyncClient(transport=httpx.MockTransport(sarvam), base_url=u.base_url)
+        try:
+            renderer = PitchRenderer(TTSCache(str(tmp_path)), tts_api.tts_key, tts_api.tts)
+            template = "Hi {name}, you are approved for {amount} rupees."
+            values = {"name": "Asha", "amount": "50000"}
+            pcm = await renderer.render(template, values)
+            again = await renderer.render(template, values)
+        finally:
+            await u.aclose()
+        return pcm, again
+
+    pcm, again = asyncio.run(main())
+    parts = segments("Hi {name}, you are approved for {amount} rupees.", {"name": "Asha", "amount": "50000"})
+    assert pcm == b"".join(speech(t) for t in parts)
+    assert len(pcm) == sum(len(speech(t)) for t in parts)
+    assert b"RIFF" not in pcm
+    assert again == pcm  # served from the cache
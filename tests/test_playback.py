@@ -0,0 +1,176 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import server
+from playback import PlaybackStats, SpeakStats, play, split_sentences
+
+RATE = 1000  # bytes per second, so a 100-byte frame is 0.1 s of audio
+FRAME = 100
+
+
+def sender(sent):
+    async def send(frame):
+        sent.append((time.perf_counter(), frame))
+    return send
+
+
+def synth_of(log, delay=0.0, size=200):
+    async def synth(sentence):
+        log.append((time.perf_counter(), sentence))
+        await asyncio.sleep(delay)
+        return sentence[0].encode() * size
+    return synth
+
+
+def test_split_sentences():
+    assert split_sentences("Hi there.  How are you? Fine!") == ["Hi there.", "How are you?", "Fine!"]
+    assert split_sentences("  ") == []
+
+
+def test_frames_are_paced_at_real_time_with_a_lead():
+    async def main():
+        sent = []
+        t0 = time.perf_counter()
+        stats = await play(sender(sent), "One. Two.", synth_of([]), FRAME, RATE, lead=0.1)
+        return t0, sent, stats
+
+    t0, sent, stats = asyncio.run(main())
+    assert b"".join(f for _, f in sent) == b"O" * 200 + b"T" * 200
+    assert (stats.sentences, stats.audio_sec) == (2, 0.4)
+    start = sent[0][0]
+    for i, (t, _) in enumerate(sent):
+        assert t - start >= i * FRAME / RATE - 0.1 - 0.01  # never more than `lead` ahead
+    assert stats.duration >= 0.4 - 0.01  # returns once the last frame has played
+    assert stats.ttfa is not None and stats.ttfa < 0.05
+
+
+def test_next_sentence_is_synthesized_while_the_current_one_plays():
+    async def main():
+        sent, requests = [], []
+        await play(sender(sent), "One. Two. Three.", synth_of(requests, delay=0.05), FRAME, RATE, lead=0.0)
+        return sent, requests
+
+    sent, requests = asyncio.run(main())
+    first_frame = sent[0][0]
+    assert [s for _, s in requests] == ["One.", "Two.", "Three."]
+    assert requests[1][0] < sent[1][0]  # requested before "One." has finished going out
+    # Pipelined: no gap for synthesis between sentences.
+    assert sent[-1][0] - first_frame < 0.6 - 0.1 + 0.04
+
+
+def test_framed_audio_is_sent_as_given():
+    class Framed:
+        def frames(self):
+            return iter([("msg-1", 0.01), ("msg-2", 0.01)])
+
+    async def synth(sentence):
+        return Framed()
+
+    sent = []
+    asyncio.run(play(sender(sent), "Hello.", synth, FRAME, RATE))
+    assert [f for _, f in sent] == ["msg-1", "msg-2"]
+
+
+def test_playback_stats_summary():
+    stats = PlaybackStats()
+    stats.record(SpeakStats("a", ttfa=0.1))
+    stats.record(SpeakStats("b", ttfa=0.3, interrupted=True))
+    assert stats.summary() == {"utterances": 2, "interrupted": 1, "ttfa_avg": 0.2, "ttfa_max": 0.3,
+                               "ttfa_recent_p95": 0.3}
+
+
+def test_recent_ttfa_forgets_old_utterances():
+    stats = PlaybackStats()
+    stats.record(SpeakStats("slow", ttfa=2.0))
+    for _ in range(20):
+        stats.record(SpeakStats("fast", ttfa=0.1), keep=20)
+    assert stats.summary()["ttfa_max"] == 2.0
+    assert stats.summary()["ttfa_recent_p95"] == 0.1
+
+
+def test_cancelling_stops_at_a_frame_boundary_and_keeps_the_prefetch():
+    async def main():
+        sent, requests = [], []
+        stats = SpeakStats("One. Two.")
+        synth = synth_of(requests, delay=0.05)
+        task = asyncio.create_task(play(sender(sent), stats.text, synth, FRAME, RATE, lead=0.0, stats=stats))
+        while not sent:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        count = len(sent)
+        await asyncio.sleep(0.1)  # the prefetched "Two." finishes, unsent
+        return stats, sent, count, requests
+
+    stats, sent, count, requests = asyncio.run(main())
+    assert stats.interrupted and stats.sentences == 1
+    assert len(sent) == count == 1
+    assert [s for _, s in requests] == ["One.", "Two."]
+
+
+def test_barge_in_cancels_the_reply_and_clears_playback():
+    class WS:
+        def __init__(self):
+            self.sent = []
+
+        async def send_text(self, text):
+            self.sent.append(json.loads(text))
+
+    async def main():
+        ws, sent = WS(), []
+        session = SimpleNamespace(stream_sid="S1", bot_speaking=True, reply=None)
+        session.reply = asyncio.create_task(play(sender(sent), "One. Two.", synth_of([]), FRAME, RATE))
+        await asyncio.sleep(0.05)
+        await server.barge_in(ws, session)
+        await asyncio.gather(session.reply, return_exceptions=True)
+        return ws, session, len(sent)
+
+    ws, session, frames = asyncio.run(main())
+    assert session.reply.cancelled() and not session.bot_speaking
+    assert ws.sent == [{"event": "clear", "stream_sid": "S1"}]
+    assert frames < 4
+
+
+async def stream(sentences, delay, closed=None):
+    try:
+        for sentence in sentences:
+            await asyncio.sleep(delay)
+            yield sentence
+    finally:
+        if closed is not None:
+            closed.append(True)
+
+
+def test_streamed_sentences_play_as_they_arrive():
+    async def main():
+        sent, requests = [], []
+        stats = await play(sender(sent), "One.", synth_of(requests), FRAME, RATE, lead=0.0,
+                           more=stream(["Two.", "Three."], 0.05))
+        return sent, requests, stats
+
+    sent, requests, stats = asyncio.run(main())
+    assert b"".join(f for _, f in sent) == b"O" * 200 + b"T" * 400
+    assert [s for _, s in requests] == ["One.", "Two.", "Three."]
+    assert (stats.text, stats.sentences) == ("One. Two. Three.", 3)
+    assert requests[1][0] < sent[1][0]  # "Two." arrived and was requested while "One." played
+
+
+def test_cancelling_closes_the_stream():
+    async def main():
+        sent, closed = [], []
+        stats = SpeakStats("One.")
+        task = asyncio.create_task(play(sender(sent), "One.", synth_of([]), FRAME, RATE, stats=stats,
+                                        more=stream(["Two."], 10.0, closed)))
+        while not sent:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return stats, closed
+
+    stats, closed = asyncio.run(main())
+    assert stats.interrupted and closed == [True]
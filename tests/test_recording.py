@@ -0,0 +1,70 @@
+import asyncio
+import base64
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+import server
+from recording import INDEX_FILE, Recorder, RecordingIndex
+
+
+def test_concurrent_refresh_indexes_each_line_once(tmp_path):
+    path = os.path.join(tmp_path, INDEX_FILE)
+    index = RecordingIndex(str(tmp_path))
+    calls, per_call = 20, 50
+    start = threading.Barrier(9)
+
+    def write():
+        start.wait()
+        with open(path, "ab") as f:
+            for i in range(per_call):
+                for c in range(calls):
+                    f.write(json.dumps({"call_id": f"call-{c}", "seq": i}).encode() + b"\n")
+                f.flush()
+
+    def read():
+        start.wait()
+        for _ in range(200):
+            index.refresh()
+
+    open(path, "wb").close()
+    with ThreadPoolExecutor(9) as pool:
+        futures = [pool.submit(write)] + [pool.submit(read) for _ in range(8)]
+        for f in futures:
+            f.result()
+    index.refresh()
+
+    assert index._offset == os.path.getsize(path)
+    assert sorted(index.calls()) == sorted(f"call-{c}" for c in range(calls))
+    for c in range(calls):
+        assert [e["seq"] for e in index._entries[f"call-{c}"]] == list(range(per_call))
+
+
+def test_reused_call_id_starts_a_new_recording(tmp_path):
+    async def main():
+        recorder = Recorder(str(tmp_path))
+        for audio in (b"\x01\x00" * 80, b"\x02\x00" * 40):
+            rec = recorder.open("CA1", "pcm16")
+            rec.audio_in(base64.b64encode(audio).decode())
+            rec.close(reason="hangup")
+            await recorder.flush()
+        await recorder.close()
+
+    asyncio.run(main())
+    assert sorted(os.listdir(tmp_path)) == ["CA1", "CA1~2", INDEX_FILE]
+    rec = RecordingIndex(str(tmp_path)).get("CA1")
+    assert rec.name == "CA1~2" and [s["seq"] for s in rec.segments] == [1]
+    assert rec.pcm("in")[0] == b"\x02\x00" * 40
+
+
+def test_recordings_need_the_bearer_token(monkeypatch):
+    client = TestClient(server.app)
+    assert client.get("/recordings/CA1").status_code == 404  # off without a token
+    monkeypatch.setattr(server, "RECORDINGS_API_TOKEN", "s3cret")
+    assert client.get("/recordings/CA1").status_code == 401
+    assert client.get("/recordings/CA1/in.wav", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    r = client.get("/recordings/CA1", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 404 and r.json() == {"error": "unknown call"}
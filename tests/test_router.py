@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from intents import IntentEngine
+from llm_service import GeminiService, StubModel
+from router import FAQIndex, ResponseRouter
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return IntentEngine.from_file()
+
+
+@pytest.fixture(scope="module")
+def faq_index():
+    return FAQIndex.from_file()
+
+
+def route(router, text):
+    return asyncio.run(router.route(text, "call-1"))
+
+
+def test_rules_tier_answers_keywords(engine, faq_index):
+    model = StubModel()
+    router = ResponseRouter(engine, faq_index, GeminiService(model))
+    r = route(router, "yes go ahead")
+    assert (r.tier, r.intent) == ("rules", "YES")
+    assert model.calls == 0
+
+
+def test_semantic_tier_matches_faq_paraphrases(engine, faq_index):
+    model = StubModel()
+    router = ResponseRouter(engine, faq_index, GeminiService(model))
+    r = route(router, "what happens if i miss a payment")
+    assert (r.tier, r.intent, r.meta) == ("semantic", "FAQ", "interest")
+    assert model.calls == 0
+
+
+def test_llm_tier_answers_the_rest(engine, faq_index):
+    model = StubModel({"is this a scam": "No, Rupeek is RBI registered."})
+    router = ResponseRouter(engine, faq_index, GeminiService(model))
+    r = route(router, "Is this a scam?")
+    assert (r.tier, r.intent, r.text) == ("llm", "LLM", "No, Rupeek is RBI registered.")
+    assert router.stats()["llm"]["hits"] == 1
+
+
+def test_slow_llm_falls_back(engine, faq_index):
+    model = StubModel(token_delay=0.2)
+    router = ResponseRouter(engine, faq_index, GeminiService(model), llm_deadline=0.05)
+    r = route(router, "tell me a story about dragons")
+    assert (r.tier, r.intent) == ("fallback", "UNKNOWN")
+
+
+def test_no_model_falls_back(engine, faq_index):
+    router = ResponseRouter(engine, faq_index, None)
+    r = route(router, "tell me a story about dragons")
+    assert (r.tier, r.intent) == ("fallback", "UNKNOWN")
+    stats = router.stats()
+    assert stats["calls"] == 1 and stats["fallback"]["hit_rate"] == 1.0
+
+
+def test_match_never_reaches_the_llm(engine, faq_index):
+    model = StubModel()
+    router = ResponseRouter(engine, faq_index, GeminiService(model))
+    assert router.match("tell me a story about dragons") is None
+    assert model.calls == 0
+
+
+def test_llm_deadline_applies_to_the_first_sentence(engine, faq_index):
+    reply = "Yes we do. It takes about ten minutes at the branch. Bring your gold and an ID."
+    model = StubModel({"tell me about dragons": reply}, token_delay=0.02)
+    router = ResponseRouter(engine, faq_index, GeminiService(model), llm_deadline=0.15)
+
+    async def main():
+        r = await router.route("tell me about dragons", "call-1")
+        return r, [s async for s in r.text.rest]
+
+    r, rest = asyncio.run(main())  # the whole reply takes 0.34 s, the first sentence 0.06 s
+    assert (r.tier, r.text) == ("llm", "Yes we do.")
+    assert rest == ["It takes about ten minutes at the branch.", "Bring your gold and an ID."]
+
+
+def test_abandoned_reply_stream_is_closed(engine, faq_index):
+    closed = []
+
+    class Model(StubModel):
+        async def stream(self, contents):
+            try:
+                async for token in super().stream(contents):
+                    yield token
+            finally:
+                closed.append(True)
+
+    router = ResponseRouter(engine, faq_index, GeminiService(Model(default="One. Two. Three.")))
+
+    async def main():
+        r = await router.route("tell me about dragons", "call-1")
+        await r.text.aclose()
+
+    asyncio.run(main())
+    assert closed == [True]
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from mini_redis import MiniRedis
+from state_store import MemoryStore, RedisStore, SQLiteStore, open_store
+
+BACKENDS = ["memory", "sqlite", "redis"]
+
+
+def run(backend, tmp_path, test):
+    """Run ``test(store)`` against a fresh store of ``backend``; redis is a MiniRedis on a free port."""
+    async def main():
+        server = None
+        if backend == "memory":
+            store = MemoryStore()
+        elif backend == "sqlite":
+            store = SQLiteStore(str(tmp_path / "state.db"))
+        else:
+            server = await MiniRedis().serve("127.0.0.1", 0)
+            store = RedisStore("127.0.0.1", server.sockets[0].getsockname()[1])
+        try:
+            return await test(store)
+        finally:
+            await store.close()
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_values_round_trip_as_json(backend, tmp_path):
+    async def test(store):
+        await store.set("a", {"n": 1, "s": "é", "l": [1, None]})
+        await store.set("b", 2)
+        await store.delete("b")
+        return await store.get("a"), await store.get("b"), await store.get_many(["a", "zz"])
+
+    a, b, many = run(backend, tmp_path, test)
+    assert a == {"n": 1, "s": "é", "l": [1, None]} and b is None
+    assert many == [a, None]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_set_nx_and_ttl(backend, tmp_path):
+    async def test(store):
+        first = await store.set_nx("lease", "w1", ttl=0.2)
+        second = await store.set_nx("lease", "w2", ttl=0.2)
+        await asyncio.sleep(0.3)
+        return first, second, await store.get("lease"), await store.set_nx("lease", "w2", ttl=1)
+
+    assert run(backend, tmp_path, test) == (True, False, None, True)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_incr_counts_and_keeps_the_ttl(backend, tmp_path):
+    async def test(store):
+        counts = [await store.incr("c"), await store.incr("c", 5), await store.incr("c", -2)]
+        await store.set("t", 1, ttl=0.2)
+        counts.append(await store.incr("t"))
+        await asyncio.sleep(0.3)
+        return counts, await store.get("c"), await store.get("t")
+
+    assert run(backend, tmp_path, test) == ([1, 6, 4, 2], 4, None)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_scan_matches_a_literal_prefix(backend, tmp_path):
+    async def test(store):
+        for key in ("worker:1", "worker:2", "worker*x", "call:1"):
+            await store.set(key, key)
+        await store.set("worker:gone", 0, ttl=0.1)
+        await asyncio.sleep(0.2)
+        return await store.scan("worker:"), await store.scan("worker*")
+
+    workers, star = run(backend, tmp_path, test)
+    assert workers == {"worker:1": "worker:1", "worker:2": "worker:2"}
+    assert star == {"worker*x": "worker*x"}  # glob characters are not wildcards
+
+
+def test_open_store_picks_the_backend(tmp_path):
+    assert isinstance(open_store("memory://"), MemoryStore)
+    assert isinstance(open_store(f"sqlite:///{tmp_path}/s.db"), SQLiteStore)
+    assert isinstance(open_store("redis://localhost:6380/2"), RedisStore)
+    with pytest.raises(ValueError):
+        open_store("etcd://x")
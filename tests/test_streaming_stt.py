@@ -0,0 +1,112 @@
+import asyncio
+
+from streaming_stt import FakeBatchSTT, FakeStreamingBackend, SpeculativeSTT, StreamingSTT
+
+BYTES_PER_SEC = 32000
+WORD = 6400  # bytes of audio per scripted word
+
+
+def test_speculative_reuses_a_partial_that_covers_the_utterance():
+    async def main():
+        stt = FakeBatchSTT(bytes_per_word=WORD, latency=0.01)
+        partials = []
+        s = SpeculativeSTT(stt, BYTES_PER_SEC, interval=0.2, on_partial=partials.append)
+        audio = bytes(4 * WORD)
+        s.update(audio[:WORD // 2])  # under one interval of audio: nothing sent
+        assert s._task is None
+        s.update(audio)
+        await s._task
+        text = await s.finish(audio)
+        return stt, s, partials, text
+
+    stt, s, partials, text = asyncio.run(main())
+    assert text == "yes I am interested"
+    assert partials == [text]
+    assert (stt.calls, s.requests, s.reused) == (1, 1, 1)
+
+
+def test_speculative_joins_the_request_in_flight():
+    async def main():
+        stt = FakeBatchSTT(bytes_per_word=WORD, latency=0.05)
+        s = SpeculativeSTT(stt, BYTES_PER_SEC, interval=0.2)
+        audio = bytes(2 * WORD)
+        s.update(audio)
+        return stt, s, await s.finish(audio)
+
+    stt, s, text = asyncio.run(main())
+    assert text == "yes I"
+    assert (stt.calls, s.reused) == (1, 1)
+
+
+def test_speculative_transcribes_again_when_more_audio_arrived():
+    async def main():
+        stt = FakeBatchSTT(bytes_per_word=WORD, latency=0.01)
+        s = SpeculativeSTT(stt, BYTES_PER_SEC, interval=0.2)
+        audio = bytes(3 * WORD)
+        s.update(audio[:2 * WORD])
+        await s._task
+        return stt, s, await s.finish(audio)
+
+    stt, s, text = asyncio.run(main())
+    assert text == "yes I am"
+    assert (stt.calls, s.requests, s.reused) == (2, 2, 0)
+
+
+def test_speculative_cancel_stops_the_request_in_flight():
+    async def main():
+        stt = FakeBatchSTT(latency=1.0)
+        s = SpeculativeSTT(stt, BYTES_PER_SEC, interval=0.2)
+        s.update(bytes(2 * WORD))
+        task = s._task
+        s.cancel()
+        await asyncio.sleep(0)
+        return task
+
+    assert asyncio.run(main()).cancelled()
+
+
+def test_batch_mode_sends_one_request_at_the_end():
+    async def main():
+        stt = FakeBatchSTT(bytes_per_word=WORD, latency=0.0)
+        s = SpeculativeSTT(stt, BYTES_PER_SEC, interval=None)
+        audio = bytes(4 * WORD)
+        for n in range(WORD, len(audio) + 1, WORD):
+            s.update(audio[:n])
+        return stt, await s.finish(audio)
+
+    stt, text = asyncio.run(main())
+    assert (stt.calls, text) == (1, "yes I am interested")
+
+
+def test_streaming_sends_each_byte_once_and_relays_partials():
+    async def main():
+        backend = FakeStreamingBackend(bytes_per_word=WORD)
+        partials = []
+        s = StreamingSTT(backend, 16000, partials.append)
+        audio = bytes(4 * WORD)
+        for n in range(WORD // 2, len(audio), WORD // 2):
+            s.update(audio[:n])
+        text = await s.finish(audio)
+        return s, partials, text
+
+    s, partials, text = asyncio.run(main())
+    assert text == "yes I am interested"
+    assert s._session.received == 4 * WORD
+    assert partials == ["yes I", "yes I am", "yes I am interested"]
+    assert s.requests == 1
+    assert s._session.closed
+
+
+def test_streaming_cancel_stops_the_pump_and_closes_the_session():
+    async def main():
+        s = StreamingSTT(FakeStreamingBackend(), 16000)
+        s.update(bytes(WORD))
+        while s._session is None or not s._session.received:
+            await asyncio.sleep(0)
+        s.cancel()
+        await asyncio.gather(s._pump, return_exceptions=True)
+        return s
+
+    s = asyncio.run(main())
+    assert s._pump.cancelled()
+    assert s._session.closed
@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+from tts_cache import DISK_SHARES, TTSCache, cache_key, disk_tier
+
+
+def key(text):
+    return cache_key(text, "en-IN", None, 16000, None)
+
+
+def pcm_files(path):
+    return sorted(os.listdir(path))
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=0, max_disk_bytes=3000)
+    for text in ("a", "b", "c"):
+        cache.put(key(text), bytes(1000))
+    assert len(pcm_files(tmp_path)) == 3
+    assert cache.get(key("a")) is not None  # read from disk: now the most recent
+    cache.put(key("d"), bytes(1000))
+
+    assert key("b") not in cache
+    for text in ("a", "c", "d"):
+        assert key(text) in cache
+    assert cache.stats()["disk"] == {"files": 3, "pinned": 0, "bytes": 3000, "max_bytes": 3000, "evicted": 1}
+
+
+def test_budget_applies_to_files_from_an_earlier_run(tmp_path):
+    first = TTSCache(str(tmp_path))
+    for i, text in enumerate(("old", "mid", "new")):
+        first.put(key(text), bytes(1000))
+        os.utime(first._path(key(text)), (1000 + i, 1000 + i))
+
+    cache = TTSCache(str(tmp_path), max_disk_bytes=2000)
+    assert key("old") not in cache
+    assert key("mid") in cache and key("new") in cache
+    assert cache.stats()["disk"]["bytes"] == 2000
+
+
+def test_fetch_stores_exactly_the_synthesized_pcm(tmp_path):
+    pcm = bytes(range(256)) * 4
+
+    async def synth():
+        return pcm
+
+    cache = TTSCache(str(tmp_path))
+    assert asyncio.run(cache.fetch(key("hello"), synth)) == pcm
+    with open(cache._path(key("hello")), "rb") as f:
+        assert f.read() == pcm
+
+
+def test_pinned_files_are_never_evicted(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=0, max_disk_bytes=3000)
+    cache.pin([key("busy"), key("hello")])  # before they are written
+    for text in ("busy", "hello", "a", "b", "c"):
+        cache.put(key(text), bytes(1000))
+    assert key("busy") in cache and key("hello") in cache
+    assert key("c") in cache and key("a") not in cache and key("b") not in cache
+    assert cache.stats()["disk"]["pinned"] == 2
+
+
+def test_tiers_split_the_cap_into_their_own_directories(tmp_path):
+    tiers = [disk_tier(str(tmp_path), name, 1000) for name in DISK_SHARES]
+    assert len({d for d, _ in tiers}) == len(tiers)
+    assert sum(cap for _, cap in tiers) <= 1000
+
+
+def test_warm_up_is_left_out_of_the_hit_rate(tmp_path):
+    async def synth():
+        return bytes(100)
+
+    async def main():
+        cache = TTSCache(str(tmp_path))
+        await cache.warm([(key("a"), synth), (key("b"), synth)])
+        await cache.warm([(key("a"), synth)])
+        await cache.fetch(key("a"), synth)
+        await cache.fetch(key("c"), synth)
+        return cache.stats()
+
+    stats = asyncio.run(main())
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
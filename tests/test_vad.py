@@ -0,0 +1,72 @@
+import numpy as np
+
+from vad import NOISE_MARGIN, SPEECH_THRESHOLD, VAD, BatchVAD, energy, rms, zero_crossing_rate
+
+RATE = 16000
+
+
+def tone(amplitude, freq=200.0, n=1600):
+    t = np.arange(n) / RATE
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype("<i2").tobytes()
+
+
+def hiss(amplitude, n=1600, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(-amplitude, amplitude, n, dtype=np.int16).astype("<i2").tobytes()
+
+
+def test_measures_match_plain_python():
+    pcm = hiss(3000)
+    x = np.frombuffer(pcm, dtype="<i2").tolist()
+    assert abs(energy(pcm) - sum(abs(v) for v in x) / len(x)) < 1e-3
+    assert abs(rms(pcm) - (sum(v * v for v in x) / len(x)) ** 0.5) < 1e-2
+    crossings = sum((a < 0) != (b < 0) for a, b in zip(x, x[1:]))
+    assert zero_crossing_rate(pcm) == crossings / (len(x) - 1)
+    assert energy(b"") == rms(b"") == zero_crossing_rate(b"") == 0.0
+
+
+def test_voiced_tone_is_speech_and_silence_or_hiss_is_not():
+    vad = VAD()
+    assert vad.is_speech(tone(4000))
+    assert not vad.is_speech(bytes(3200))
+    assert not vad.is_speech(hiss(4000))  # loud, but crosses zero on every other sample
+
+
+def test_floor_rises_with_line_noise_and_keeps_hum_out():
+    vad = VAD()
+    hum = tone(1500, freq=100)
+    # A steady hum louder than the fixed threshold reads as speech at first...
+    assert vad.is_speech(hum)
+    for _ in range(2000):
+        vad.is_speech(hum)
+    # ...until the floor has crept up to it; then only louder speech gets through.
+    assert not vad.is_speech(hum)
+    assert vad.threshold > SPEECH_THRESHOLD
+    assert vad.is_speech(tone(1500 * NOISE_MARGIN * 1.5))
+
+
+def test_frames_larger_than_the_scratch_space_are_measured():
+    vad = VAD(frame_bytes=320)
+    assert vad.is_speech(tone(4000, n=4000))
+    assert abs(vad.energy - energy(tone(4000, n=4000))) < 1e-2
+
+
+def test_batch_matches_per_call_detectors():
+    frames = [tone(4000), bytes(3200), hiss(4000), tone(700), tone(300)]
+    batch = BatchVAD(len(frames))
+    single = [VAD() for _ in frames]
+    for _ in range(3):
+        for row, pcm in enumerate(frames):
+            batch.load(row, pcm)
+        speech, energies, zcrs = batch.classify()
+        assert speech.tolist() == [v.is_speech(pcm) for v, pcm in zip(single, frames)]
+        assert np.allclose(energies, [v.energy for v in single])
+        assert np.allclose(zcrs, [v.zcr for v in single])
+
+
+def test_batch_classifies_a_subset_of_rows():
+    batch = BatchVAD(3)
+    batch.load(0, bytes(3200))
+    batch.load(2, tone(4000))
+    speech, _, _ = batch.classify([2, 0])
+    assert speech.tolist() == [True, False]
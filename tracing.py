@@ -0,0 +1,116 @@
+"""Per-turn latency tracing.
+
+A ``TurnTrace`` collects ``perf_counter`` timestamps for the stages of one
+conversational turn, in order:
+
+    speech_end → stt_request → stt_response → classified
+               → tts_request → first_frame → last_frame
+
+Stages a turn never reached are simply absent (a cached reply makes no TTS
+request; a barge-in has no last frame). On ``Tracer.finish`` the trace feeds
+two histograms: time from end of speech to each stage, and time since the
+previous stage. Marking a stage is one clock read and a dict store.
+
+With ``dump_dir`` set, every finished turn of a call is also kept until the
+call ends. If the call's slowest turn took at least ``slow_sec``, the turns
+are written to ``<dump_dir>/<call id>.json`` for debugging slow calls.
+``on_finish(trace, outcome)``, if set, also sees every finished turn (the
+call recorder uses it).
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+
+log = logging.getLogger("voicebot")
+
+STAGES = ("speech_end", "stt_request", "stt_response", "classified",
+          "tts_request", "first_frame", "last_frame")
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class TurnTrace:
+    __slots__ = ("call_id", "marks", "meta")
+
+    def __init__(self, call_id):
+        self.call_id = call_id
+        self.marks = {}
+        self.meta = {}
+
+    def mark(self, stage):
+        """Timestamp ``stage`` unless it already has one."""
+        if stage not in self.marks:
+            self.marks[stage] = time.perf_counter()
+
+    def frame(self):
+        """An outbound audio frame was sent."""
+        now = time.perf_counter()
+        if "first_frame" not in self.marks:
+            self.marks["first_frame"] = now
+        self.marks["last_frame"] = now
+
+    def elapsed_ms(self):
+        """Milliseconds from end of speech to each stage reached."""
+        t0 = self.marks["speech_end"]
+        return {s: round((self.marks[s] - t0) * 1000, 1) for s in STAGES if s in self.marks}
+
+
+class Tracer:
+    def __init__(self, registry, dump_dir=None, slow_sec=0.0, keep_turns=200, on_finish=None):
+        self.since_speech = registry.histogram(
+            "voicebot_turn_stage_seconds", "Time from end of caller speech to each turn stage", ("stage",))
+        self.step = registry.histogram(
+            "voicebot_turn_step_seconds", "Time from the previous turn stage to this one", ("stage",))
+        self.turns = registry.counter("voicebot_turns_total", "Turns traced, by outcome", ("outcome",))
+        self.dump_dir = dump_dir
+        self.slow_sec = slow_sec
+        self.keep_turns = keep_turns
+        self.on_finish = on_finish
+        self._calls = {}  # call id -> finished turns, only when dumping
+
+    def turn(self, call_id):
+        trace = TurnTrace(call_id)
+        trace.mark("speech_end")
+        return trace
+
+    def finish(self, trace, outcome):
+        marks = trace.marks
+        t0 = marks["speech_end"]
+        prev = t0
+        for stage in STAGES[1:]:
+            t = marks.get(stage)
+            if t is None:
+                continue
+            self.since_speech.observe(t - t0, stage)
+            self.step.observe(t - prev, stage)
+            prev = t
+        self.turns.inc(outcome)
+        if self.dump_dir is not None:
+            turns = self._calls.setdefault(trace.call_id, [])
+            if len(turns) < self.keep_turns:
+                turns.append({"outcome": outcome, **trace.meta, "ms": trace.elapsed_ms()})
+        if self.on_finish is not None:
+            self.on_finish(trace, outcome)
+
+    def end_call(self, call_id):
+        turns = self._calls.pop(call_id, None)
+        if not turns:
+            return
+        slowest = max(max(t["ms"].values()) for t in turns)
+        if slowest < self.slow_sec * 1000:
+            return
+        path = os.path.join(self.dump_dir, f"{_UNSAFE.sub('_', str(call_id))}.json")
+        doc = {"call_id": call_id, "slowest_ms": slowest, "turns": turns}
+        asyncio.get_running_loop().run_in_executor(None, self._write, path, doc)
+
+    @staticmethod
+    def _write(path, doc):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(doc, f, indent=1)
+        except OSError as e:
+            log.warning(f"⚠️ Trace dump failed: {e}")
@@ -0,0 +1,42 @@
+"""The voicebot's Sarvam TTS request and cache key.
+
+Shared by server.py, which speaks the audio, and the campaign pre-renderer
+in config.py, which fills the same on-disk TTS cache ahead of the calls, so
+both must agree on every parameter that changes the audio. The voice is read
+from the environment on each call so a ``.env`` loaded after import applies.
+"""
+import base64
+import os
+
+import http_client
+from audio_encoding import wav_to_pcm
+from tts_cache import cache_key
+
+TTS_LANGUAGE = "en-IN"
+SAMPLE_RATE = 16000
+
+
+def voice():
+    return os.getenv("TTS_SPEAKER"), os.getenv("TTS_MODEL")
+
+
+def tts_key(text):
+    speaker, model = voice()
+    return cache_key(text, TTS_LANGUAGE, speaker, SAMPLE_RATE, model)
+
+
+async def tts(text):
+    """16 kHz PCM for ``text``; Sarvam's WAV header is stripped."""
+    speaker, model = voice()
+    body = {"text": text, "target_language_code": TTS_LANGUAGE, "speech_sample_rate": str(SAMPLE_RATE)}
+    if speaker:
+        body["speaker"] = speaker
+    if model:
+        body["model"] = model
+    r = await http_client.upstream("sarvam").post(
+        "/text-to-speech",
+        headers={"api-subscription-key": os.getenv("SARVAM_API_KEY") or ""},
+        json=body,
+    )
+    r.raise_for_status()
+    return wav_to_pcm(base64.b64decode(r.json()["audios"][0]), SAMPLE_RATE)
@@ -0,0 +1,252 @@
+"""Two-tier cache of synthesized speech.
+
+Entries are raw PCM keyed by ``(text, language, speaker, sample_rate, model)``.
+The memory tier is a byte-bounded LRU; the disk tier keeps one ``.pcm`` file
+per key and serves it through ``mmap`` so a warm restart loads the script
+without reading every file up front. ``DiskBudget`` caps the disk tier's
+bytes, removing the least recently used files first; pinned files (the
+script) are never removed. Concurrent requests for the same key share a
+single synthesis.
+
+Each kind of cached audio lives in its own subdirectory of the cache root
+with its own share of the disk cap (``disk_tier``), so the tiers together
+stay within it and churn in one cannot evict another's files.
+"""
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger("voicebot")
+
+
+# Part of every key. Entries from before TTS audio was stored without its WAV
+# header hash differently and are never read.
+PCM_FORMAT = "pcm16"
+
+# Share of the disk cap for each subdirectory of the cache root: the call
+# script and canned prompts, their pre-encoded frames, campaign pitch segments.
+DISK_SHARES = {"script": 0.25, "frames": 0.25, "pitch": 0.5}
+
+
+def cache_key(text, language, speaker, sample_rate, model):
+    return (text, language, speaker or "", int(sample_rate), model or "", PCM_FORMAT)
+
+
+def disk_tier(cache_dir, name, max_disk_bytes):
+    """``(directory, byte cap)`` of tier ``name`` under a cache root capped at ``max_disk_bytes``."""
+    return os.path.join(cache_dir, name), int(max_disk_bytes * DISK_SHARES[name])
+
+
+class DiskBudget:
+    """Byte cap on the files with one suffix in a cache directory.
+
+    Files already there are counted at start, oldest first by mtime. ``use``
+    records a write or read; reads also bump the mtime, so the order survives
+    a restart. Pinned files count against the cap but are never removed.
+    Workers sharing a directory each enforce the cap over the files they
+    know of. Methods may be called from worker threads.
+    """
+
+    def __init__(self, cache_dir, suffix, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evicted = 0
+        self._files = OrderedDict()  # path -> size, least recently used first
+        self._pinned = {}  # path -> size (0 until written), never evicted
+        self._lock = threading.Lock()
+        found = []
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(suffix) and entry.is_file():
+                    st = entry.stat()
+                    found.append((st.st_mtime, entry.path, st.st_size))
+        for _, path, size in sorted(found):
+            self._files[path] = size
+            self.bytes += size
+        with self._lock:
+            self._evict()
+
+    def use(self, path, size, touch=False):
+        with self._lock:
+            if path in self._pinned:
+                self.bytes += size - self._pinned[path]
+                self._pinned[path] = size
+            else:
+                self.bytes += size - self._files.pop(path, 0)
+                self._files[path] = size
+            self._evict()
+        if touch:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    def pin(self, path):
+        """Keep ``path``, written already or not, out of eviction."""
+        with self._lock:
+            if path not in self._pinned:
+                self._pinned[path] = self._files.pop(path, 0)
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self._files) > 1:
+            path, size = self._files.popitem(last=False)
+            self.bytes -= size
+            self.evicted += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        return {"files": len(self._files) + sum(1 for size in self._pinned.values() if size),
+                "pinned": len(self._pinned), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "evicted": self.evicted}
+
+
+class TTSCache:
+    def __init__(self, cache_dir=None, max_bytes=64 * 1024 * 1024, max_disk_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._mem = OrderedDict()
+        self._mem_bytes = 0
+        self._inflight = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._disk = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk = DiskBudget(cache_dir, ".pcm", max_disk_bytes)
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pcm")
+
+    def _remember(self, key, pcm):
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old)
+        self._mem[key] = pcm
+        self._mem_bytes += len(pcm)
+        while self._mem_bytes > self.max_bytes and len(self._mem) > 1:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= len(evicted)
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                pcm = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (FileNotFoundError, ValueError):
+            # ValueError: empty file, which mmap refuses.
+            return None
+        self._disk.use(path, len(pcm), touch=True)
+        return pcm
+
+    def _store(self, key, pcm):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(pcm)
+        os.replace(tmp, path)
+        self._disk.use(path, len(pcm))
+
+    def __contains__(self, key):
+        """Whether ``key`` is cached or being synthesized; not counted in stats."""
+        return (key in self._mem or key in self._inflight
+                or bool(self.cache_dir) and os.path.exists(self._path(key)))
+
+    def pin(self, keys):
+        """Never evict the disk files of ``keys`` (the call script)."""
+        if self._disk is not None:
+            for key in keys:
+                self._disk.pin(self._path(key))
+
+    def get(self, key, count=True):
+        """Cached PCM for ``key`` or None; never synthesizes.
+
+        ``count=False`` leaves the lookup out of the hit rate (warm-up).
+        """
+        pcm = self._mem.get(key)
+        if pcm is not None:
+            self._mem.move_to_end(key)
+            self.hits += count
+            return pcm
+        pcm = self._load(key)
+        if pcm is not None:
+            self.disk_hits += count
+            self._remember(key, pcm)
+        return pcm
+
+    def put(self, key, pcm):
+        self._store(key, pcm)
+        self._remember(key, pcm)
+
+    async def fetch(self, key, synth, count=True):
+        """Cached PCM for ``key``, calling ``await synth()`` on a miss.
+
+        The synthesis runs as its own task, so a caller that is cancelled
+        (e.g. by barge-in) still leaves the result in the cache.
+        """
+        pcm = self.get(key, count)
+        if pcm is not None:
+            return pcm
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += count
+            task = asyncio.ensure_future(self._fill(key, synth))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._settle(key, t))
+        return await asyncio.shield(task)
+
+    async def _fill(self, key, synth):
+        pcm = await synth()
+        try:
+            await asyncio.to_thread(self._store, key, pcm)
+        except OSError as e:
+            log.warning(f"⚠️ TTS cache write failed: {e}")
+        self._remember(key, pcm)
+        return pcm
+
+    def _settle(self, key, task):
+        del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    async def warm(self, items, concurrency=4):
+        """Make sure every ``(key, synth)`` pair is cached; failures are logged.
+
+        Not counted in the hit rate.
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(key, synth):
+            async with sem:
+                try:
+                    await self.fetch(key, synth, count=False)
+                except Exception as e:
+                    log.error(f"❌ TTS warm failed for '{key[0][:40]}': {e}")
+
+        await asyncio.gather(*(one(k, s) for k, s in items))
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._mem),
+            "bytes": self._mem_bytes,
+            "disk": self._disk.stats() if self._disk is not None else None,
+        }
@@ -0,0 +1,143 @@
+"""Voice activity detection for 16-bit little-endian mono PCM.
+
+Frames are read through ``np.frombuffer`` views, so the sample data is never
+copied or walked by the interpreter. Per-call ``VAD`` objects keep their own
+scratch arrays and an adaptive noise floor; ``BatchVAD`` classifies one frame
+from each of many calls in a single vectorized pass.
+"""
+import numpy as np
+
+# Mean |sample| below which a frame is never speech, whatever the floor says.
+SPEECH_THRESHOLD = 520
+# A frame is speech when its energy clears the noise floor by this factor.
+NOISE_MARGIN = 3.0
+# Floor tracking: fast EMA on quiet frames, slow creep on voiced ones so a
+# sudden rise in line noise cannot latch the detector open forever.
+FLOOR_ALPHA = 0.05
+FLOOR_RISE = 0.002
+# Broadband hiss crosses zero on roughly every other sample; voiced speech
+# stays well below this.
+MAX_ZCR = 0.4
+
+
+def samples(pcm):
+    """int16 view of a PCM buffer (bytes, bytearray or memoryview), no copy."""
+    return np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2)
+
+
+def energy(pcm):
+    """Mean absolute amplitude, the same measure the old ``is_speech`` used."""
+    x = samples(pcm)
+    return float(np.abs(x, dtype=np.float32).mean()) if len(x) else 0.0
+
+
+def rms(pcm):
+    x = samples(pcm)
+    if not len(x):
+        return 0.0
+    f = x.astype(np.float32)
+    return float(np.sqrt(np.dot(f, f) / len(f)))
+
+
+def zero_crossing_rate(pcm):
+    """Fraction of adjacent sample pairs that change sign."""
+    x = samples(pcm)
+    if len(x) < 2:
+        return 0.0
+    s = np.signbit(x)
+    return np.count_nonzero(s[1:] != s[:-1]) / (len(x) - 1)
+
+
+class VAD:
+    """Per-call detector with preallocated scratch space and a noise floor."""
+
+    __slots__ = ("min_threshold", "floor", "energy", "zcr", "_abs", "_sign", "_cross")
+
+    def __init__(self, frame_bytes=3200, min_threshold=SPEECH_THRESHOLD):
+        self.min_threshold = float(min_threshold)
+        self.floor = self.min_threshold / NOISE_MARGIN
+        self.energy = 0.0
+        self.zcr = 0.0
+        self._alloc(frame_bytes // 2)
+
+    def _alloc(self, n):
+        self._abs = np.empty(n, np.float32)
+        self._sign = np.empty(n, np.bool_)
+        self._cross = np.empty(max(n - 1, 1), np.bool_)
+
+    @property
+    def threshold(self):
+        return max(self.min_threshold, self.floor * NOISE_MARGIN)
+
+    def measure(self, pcm):
+        """Update ``energy`` and ``zcr`` for one frame without allocating."""
+        x = samples(pcm)
+        n = len(x)
+        if n > len(self._abs):
+            self._alloc(n)
+        if n < 2:
+            self.energy = self.zcr = 0.0
+            return
+        a = self._abs[:n]
+        np.abs(x, out=a, dtype=np.float32)
+        self.energy = float(a.sum()) / n
+        s = self._sign[:n]
+        np.signbit(x, out=s)
+        c = self._cross[:n - 1]
+        np.not_equal(s[1:], s[:-1], out=c)
+        self.zcr = np.count_nonzero(c) / (n - 1)
+
+    def is_speech(self, pcm):
+        self.measure(pcm)
+        speech = self.energy > self.threshold and self.zcr < MAX_ZCR
+        if speech:
+            self.floor += FLOOR_RISE * (self.energy - self.floor)
+        else:
+            self.floor += FLOOR_ALPHA * (self.energy - self.floor)
+        return speech
+
+
+class BatchVAD:
+    """Classify one frame per call for many calls at once.
+
+    Each call owns a row of a shared int16 matrix; ``load`` copies its latest
+    frame into that row and ``classify`` scores every row together.
+    """
+
+    def __init__(self, max_calls, frame_bytes=3200, min_threshold=SPEECH_THRESHOLD):
+        n = frame_bytes // 2
+        self.min_threshold = float(min_threshold)
+        self.frames = np.zeros((max_calls, n), np.int16)
+        self.floors = np.full(max_calls, self.min_threshold / NOISE_MARGIN, np.float32)
+        self._abs = np.empty((max_calls, n), np.float32)
+        self._sign = np.empty((max_calls, n), np.bool_)
+        self._cross = np.empty((max_calls, n - 1), np.bool_)
+
+    def load(self, row, pcm):
+        x = samples(pcm)
+        self.frames[row, :len(x)] = x
+        self.frames[row, len(x):] = 0
+
+    def reset(self, row):
+        self.floors[row] = self.min_threshold / NOISE_MARGIN
+
+    def classify(self, rows=None):
+        """Return (speech mask, energies, zcrs) for ``rows`` (default: all)."""
+        if rows is None:
+            x, a, s, c, floors = self.frames, self._abs, self._sign, self._cross, self.floors
+        else:
+            x = self.frames[rows]
+            a, s, c = self._abs[:len(x)], self._sign[:len(x)], self._cross[:len(x)]
+            floors = self.floors[rows]
+        n = x.shape[1]
+        np.abs(x, out=a, dtype=np.float32)
+        energies = a.sum(axis=1) / n
+        np.signbit(x, out=s)
+        np.not_equal(s[:, 1:], s[:, :-1], out=c)
+        zcrs = np.count_nonzero(c, axis=1) / (n - 1)
+        thresholds = np.maximum(self.min_threshold, floors * NOISE_MARGIN)
+        speech = (energies > thresholds) & (zcrs < MAX_ZCR)
+        floors += np.where(speech, FLOOR_RISE, FLOOR_ALPHA) * (energies - floors)
+        if rows is not None:
+            self.floors[rows] = floors
+        return speech, energies, zcrs
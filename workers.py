@@ -0,0 +1,60 @@
+"""Run an ASGI app in several worker processes on one port.
+
+Two modes, both one event loop per process so audio decoding, VAD and JSON
+for concurrent calls spread over every core:
+
+* shared listener (default): uvicorn's own supervisor binds the port once and
+  the workers accept from the inherited socket.
+* ``reuse_port``: each worker binds its own ``SO_REUSEPORT`` socket and the
+  kernel spreads new connections across them, which avoids the thundering
+  herd of a shared accept queue. Linux and BSD only.
+
+Workers share nothing in memory: point ``STATE_STORE`` at SQLite or Redis so
+campaigns, live calls and metrics aggregate across them.
+"""
+import logging
+import multiprocessing
+import signal
+import socket
+
+import uvicorn
+
+log = logging.getLogger("voicebot")
+
+
+def _listener(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def _worker(app, host, port):
+    sock = _listener(host, port)
+    uvicorn.Server(uvicorn.Config(app, host=host, port=port)).run(sockets=[sock])
+
+
+def serve(app, host="0.0.0.0", port=10000, workers=1, reuse_port=False):
+    """Block serving ``app`` (an ``"module:attr"`` string) from ``workers`` processes."""
+    if not reuse_port:
+        uvicorn.run(app, host=host, port=port, workers=workers)
+        return
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("SO_REUSEPORT is not supported on this platform")
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_worker, args=(app, host, port), daemon=False) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    log.info(f"🧵 {workers} workers on {host}:{port} (SO_REUSEPORT) | pids {[p.pid for p in procs]}")
+
+    def stop(signum, frame):
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for p in procs:
+        p.join()